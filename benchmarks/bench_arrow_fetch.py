@@ -0,0 +1,148 @@
+"""
+Benchmark: SnowflakeConnector.query_to_dataframe tuple path vs Arrow paths.
+
+A fake cursor serves a wide, profile-shaped extract from Arrow IPC bytes, the way the
+connector receives result chunks: fetchall() converts them to Python tuples, fetch_pandas_all()
+/ fetch_arrow_all() convert column-wise. Each mode runs in its own process and reports fetch
+time and peak RSS.
+
+Usage:
+  python benchmarks/bench_arrow_fetch.py --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from process_memory import peak_rss_mb
+
+MODES = ["tuples", "arrow", "arrow_dtypes", "arrow_table"]
+
+
+def make_ipc(rows: int) -> bytes:
+    import pyarrow as pa
+    from synthetic_profiles import make_profile
+    import random
+
+    rng = random.Random(7)
+    samples = [make_profile(rng)["overall_profile"] for _ in range(1000)]
+    columns = {
+        "CONSUMER_ID": pa.array(range(rows), pa.int64()),
+        "CUISINE_PREFERENCES": pa.array([samples[i % 1000]["cuisine_preferences"] for i in range(rows)]),
+        "FOOD_PREFERENCES": pa.array([samples[i % 1000]["food_preferences"] for i in range(rows)]),
+        "TASTE_PREFERENCE": pa.array([samples[i % 1000]["taste_preference"] for i in range(rows)]),
+        "DIETARY": pa.array([samples[i % 1000]["dietary_preferences"]["preferred_dietary_preference"]
+                             for i in range(rows)]),
+        "PROMO_USAGE_PCT": pa.array([(i % 100) / 100 for i in range(rows)], pa.float64()),
+        "ORDERS_90D": pa.array([i % 37 for i in range(rows)], pa.int64()),
+        "LAST_ORDER_AT": pa.array([1_700_000_000_000 + i for i in range(rows)], pa.timestamp('ms')),
+    }
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=100_000)
+    return sink.getvalue().to_pybytes()
+
+
+class ArrowResultCursor:
+    """Serves one Arrow IPC result like the Snowflake cursor does."""
+
+    def __init__(self, path):
+        self.path = path
+        self.description = None
+
+    def _table(self):
+        import pyarrow as pa
+        # Read (copy) the chunks like a network download; no memory-map shortcut
+        with pa.OSFile(self.path) as source:
+            return pa.ipc.open_stream(source).read_all()
+
+    def execute(self, query, params=None):
+        import pyarrow as pa
+        with pa.OSFile(self.path) as source:
+            schema = pa.ipc.open_stream(source).schema
+        self.description = [(name,) for name in schema.names]
+
+    def fetchall(self):
+        table = self._table()
+        columns = [column.to_pylist() for column in table.columns]
+        del table
+        return list(zip(*columns))
+
+    def fetch_pandas_all(self):
+        return self._table().to_pandas()
+
+    def fetch_arrow_all(self, force_return_table=False):
+        return self._table()
+
+    def close(self):
+        pass
+
+
+class ArrowResultConnection:
+    def __init__(self, path):
+        self.path = path
+
+    def cursor(self):
+        return ArrowResultCursor(self.path)
+
+    def close(self):
+        pass
+
+
+def run_mode(mode: str, path: str):
+    from snowflake_connector import SnowflakeConnector
+
+    sf = SnowflakeConnector(config={})
+    sf.connection = ArrowResultConnection(path)
+    sf.cursor = sf.connection.cursor()
+    query = "SELECT * FROM PROFILE_EXTRACT"
+    start = time.perf_counter()
+    if mode == "tuples":
+        result = sf.query_to_dataframe(query, use_arrow=False)
+    elif mode == "arrow":
+        result = sf.query_to_dataframe(query)
+    elif mode == "arrow_dtypes":
+        result = sf.query_to_dataframe(query, dtype_backend='pyarrow')
+    else:
+        result = sf.query_to_arrow(query)
+    seconds = time.perf_counter() - start
+    peak = peak_rss_mb()
+    print(json.dumps({"mode": mode, "rows": len(result), "seconds": seconds, "peak_mb": peak}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Arrow vs tuple fetch paths")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.path)
+        return
+
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "result.arrows")
+        with open(path, 'wb') as f:
+            f.write(make_ipc(args.rows))
+        print(f"{args.rows:,} rows x 8 columns ({os.path.getsize(path) / 2**20:.0f} MB as Arrow)")
+        print(f"{'mode':<14} {'seconds':>8} {'peak RSS MB':>12}")
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--path", path],
+                check=True, capture_output=True, text=True,
+            ).stdout.strip().splitlines()[-1]
+            result = json.loads(out)
+            print(f"{mode:<14} {result['seconds']:>8.2f} {result['peak_mb']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: batch_generate.run_batch scaling with worker processes (no Snowflake).
+
+Usage:
+  python benchmarks/bench_batch_workers.py --consumers 200000 --workers 1 2 4 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification_generator'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from batch_generate import open_sink, run_batch
+from synthetic_profiles import iter_profiles
+
+
+def synthetic_chunks(consumers: int, chunk_size: int):
+    rows = []
+    for consumer_id, profile in enumerate(iter_profiles(consumers)):
+        rows.append((consumer_id, json.dumps(profile)))
+        if len(rows) >= chunk_size:
+            yield rows, {"last_consumer_id": rows[-1][0]}
+            rows = []
+    if rows:
+        yield rows, {"last_consumer_id": rows[-1][0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch generation across worker counts")
+    parser.add_argument("--consumers", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs available")
+    baseline = None
+    reference = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in args.workers:
+            path = os.path.join(tmp, f"out_{workers}.csv")
+            sink = open_sink(path, 'csv')
+            start = time.perf_counter()
+            run_batch(synthetic_chunks(args.consumers, args.chunk_size), sink, 'csv', workers=workers)
+            sink.close()
+            seconds = time.perf_counter() - start
+
+            with open(path, 'rb') as f:
+                content = f.read()
+            reference = reference or content
+            baseline = baseline or seconds
+            print(f"workers={workers:<3} {seconds:7.2f}s  {args.consumers / seconds:10,.0f} consumers/s  "
+                  f"speedup {baseline / seconds:4.1f}x  identical_output={content == reference}")
+
+
+if __name__ == "__main__":
+    main()
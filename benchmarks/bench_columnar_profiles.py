@@ -0,0 +1,139 @@
+"""
+Benchmark: batch generation from PROFILE JSON rows vs a columnar profile snapshot.
+
+Builds an Arrow snapshot (columnar_profiles.py) of synthetic profiles, then generates the same
+chunks both ways: PROFILE JSON rows (batch_generate.generate_chunk) and memory-mapped
+categorical frames (generate_from_frame). Times exclude CSV encoding. Outputs must be identical,
+including a --snapshot style run_batch with worker processes.
+
+A second, high-cardinality snapshot (every consumer's food and price text distinct) checks that
+a chunk's categoricals carry only that chunk's values: generating from it must cost about the
+same per chunk as from plain object columns, not grow with the size of the file.
+
+Usage:
+  python benchmarks/bench_columnar_profiles.py --consumers 200000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification_generator'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from batch_generate import encode_chunk, generate_chunk, generate_from_frame, open_sink, run_batch, stream_snapshot
+from columnar_profiles import ColumnarProfiles, profile_records, write_columnar_snapshot
+from notification_generator import NotificationGenerator
+from synthetic_profiles import iter_profiles
+
+LOCALES = [("en-US", "en"), ("es-US", "es"), ("fr-CA", "fr"), ("en-CA", "en"), (None, None)]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark columnar profile snapshots")
+    parser.add_argument("--consumers", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--high-cardinality", type=int, default=100_000,
+                        help="Consumers in the all-distinct snapshot (0 skips it)")
+    args = parser.parse_args()
+
+    rows = [(i, json.dumps(profile)) for i, profile in enumerate(iter_profiles(args.consumers))]
+    rng = random.Random(3)
+    locales = {i: rng.choice(LOCALES) for i in range(args.consumers)}
+    json_mb = sum(len(profile_json) for _, profile_json in rows) / 2**20
+    generator = NotificationGenerator()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "profiles.arrow")
+        start = time.perf_counter()
+        write_columnar_snapshot(profile_records(rows, locales), path)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        snapshot = ColumnarProfiles(path)
+        open_ms = 1000 * (time.perf_counter() - start)
+        assert len(snapshot) == args.consumers
+        assert snapshot.table.column("dd_user_locale")[:100].to_pylist() == [locales[i][0] for i in range(100)]
+
+        chunks = [(start, min(start + args.chunk_size, args.consumers))
+                  for start in range(0, args.consumers, args.chunk_size)]
+        # Timed without output encoding (identical for both, and it dominates CSV runs)
+        start = time.perf_counter()
+        json_frames = [generate_chunk(generator, rows[a:b], 82, 10) for a, b in chunks]
+        json_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        snapshot_frames = [generate_from_frame(generator, snapshot.frame(a, b), 82, 10) for a, b in chunks]
+        snapshot_s = time.perf_counter() - start
+        snapshot.close()
+        from_json = [encode_chunk(df, 'csv') for df in json_frames]
+        identical = from_json == [encode_chunk(df, 'csv') for df in snapshot_frames]
+
+        # Workers map the snapshot themselves; only row ranges cross the process boundary
+        output = os.path.join(tmp, "notifications.csv")
+        sink = open_sink(output, 'csv')
+        try:
+            run_batch(stream_snapshot(path, args.chunk_size), sink, 'csv', 82, 10, args.workers)
+        finally:
+            sink.close()
+        with open(output, 'rb') as f:
+            workers_identical = f.read().split(b'\n', 1)[1] == b''.join(from_json)
+
+        print(f"{args.consumers:,} consumers: PROFILE JSON {json_mb:.1f} MB, "
+              f"snapshot {os.path.getsize(path) / 2**20:.1f} MB (built in {build_s:.1f}s, opened in {open_ms:.1f} ms)")
+        print(f"PROFILE JSON rows + generate:              {json_s:.2f}s "
+              f"({args.consumers / json_s:,.0f} consumers/s)")
+        print(f"columnar snapshot + generate:              {snapshot_s:.2f}s "
+              f"({args.consumers / snapshot_s:,.0f} consumers/s, {json_s / snapshot_s:.1f}x)")
+        print(f"identical_output={identical} run_batch(--snapshot, workers={args.workers}) "
+              f"identical_output={workers_identical}")
+
+        high_cardinality_ok = True
+        if args.high_cardinality:
+            high_cardinality_ok = bench_high_cardinality(generator, args.high_cardinality, tmp)
+    return 0 if identical and workers_identical and high_cardinality_ok else 1
+
+
+def bench_high_cardinality(generator: NotificationGenerator, consumers: int, tmp: str,
+                           chunk_size: int = 5000, chunks: int = 5) -> bool:
+    """Chunks of an all-distinct snapshot vs the same rows as object columns."""
+    rows = []
+    for i, profile in enumerate(iter_profiles(consumers, seed=11)):
+        overall = profile["overall_profile"]
+        overall["food_preferences"] += f" (order {i})"
+        overall["price_sensitivity"] += f" ({i % 97}% of {i} orders)"
+        rows.append((i, json.dumps(profile)))
+    path = os.path.join(tmp, "high_cardinality.arrow")
+    write_columnar_snapshot(profile_records(rows), path)
+    snapshot = ColumnarProfiles(path)
+    ranges = [(a, a + chunk_size) for a in range(0, min(consumers, chunk_size * chunks), chunk_size)]
+
+    start = time.perf_counter()
+    frames = [snapshot.frame(a, b) for a, b in ranges]
+    categorical = [generate_from_frame(generator, frame, 82, 10) for frame in frames]
+    categorical_s = time.perf_counter() - start
+    snapshot.close()
+    objects = [frame.astype({c: object for c in frame.columns if c != "consumer_id"}) for frame in frames]
+    start = time.perf_counter()
+    plain = [generate_from_frame(generator, frame, 82, 10) for frame in objects]
+    object_s = time.perf_counter() - start
+
+    most_categories = max(len(frame["food_preferences"].cat.categories) for frame in frames)
+    identical = [encode_chunk(df, 'csv') for df in categorical] == [encode_chunk(df, 'csv') for df in plain]
+    n = len(ranges)
+    print(f"high cardinality ({consumers:,} distinct values per column): "
+          f"{1000 * categorical_s / n:.0f} ms per {chunk_size:,}-row chunk from the snapshot, "
+          f"{1000 * object_s / n:.0f} ms from object columns; at most {most_categories:,} categories per chunk")
+    ok = identical and most_categories <= chunk_size and categorical_s < 3 * object_s
+    if not ok:
+        print(f"FAIL: high-cardinality chunks (identical={identical}) carry or evaluate the whole file's dictionary")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(main())
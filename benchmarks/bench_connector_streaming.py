@@ -0,0 +1,125 @@
+"""
+Benchmark: memory of SnowflakeConnector.query_to_dataframe vs iter_rows / iter_dataframes.
+
+A fake connection generates rows lazily (profile-sized JSON strings), so the only large
+allocations are the connector's. Each mode runs in its own process; RSS is sampled as the
+result is consumed and peak RSS is reported. Streaming modes should stay flat.
+
+Usage:
+  python benchmarks/bench_connector_streaming.py --rows 2000000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from process_memory import peak_rss_mb
+
+MODES = ["fetchall", "iter_rows", "iter_dataframes"]
+PROFILE = json.dumps({"overall_profile": {"cuisine_preferences": "Chinese, Thai, Mexican " * 8,
+                                          "food_preferences": "noodles, tacos, rice bowls " * 8}})
+
+
+class FakeCursor:
+    description = [("CONSUMER_ID",), ("PROFILE",)]
+
+    def __init__(self, rows):
+        self.total = rows
+        self.produced = 0
+        self.closed = False
+
+    def execute(self, query, params=None):
+        self.produced = 0
+
+    def _take(self, n):
+        n = min(n, self.total - self.produced)
+        start = self.produced
+        self.produced += n
+        # Distinct string objects per row, like real fetches
+        return [(i, PROFILE + ' ' * (i % 3)) for i in range(start, start + n)]
+
+    def fetchmany(self, size):
+        return self._take(size)
+
+    def fetchall(self):
+        return self._take(self.total)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self):
+        return FakeCursor(self.rows)
+
+    def close(self):
+        pass
+
+
+def rss_mb() -> float:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def run_mode(mode: str, rows: int, batch_size: int):
+    from snowflake_connector import SnowflakeConnector
+
+    sf = SnowflakeConnector(config={})
+    sf.connection = FakeConnection(rows)
+    sf.cursor = sf.connection.cursor()
+    samples = []
+    seen = 0
+    start = time.perf_counter()
+    if mode == "fetchall":
+        df = sf.query_to_dataframe("SELECT CONSUMER_ID, PROFILE FROM FAKE")
+        seen = len(df)
+        samples.append(rss_mb())
+        del df
+    elif mode == "iter_rows":
+        for i, _ in enumerate(sf.iter_rows("SELECT CONSUMER_ID, PROFILE FROM FAKE", batch_size=batch_size)):
+            if i % (rows // 10 or 1) == 0:
+                samples.append(rss_mb())
+            seen += 1
+    else:
+        for df in sf.iter_dataframes("SELECT CONSUMER_ID, PROFILE FROM FAKE", batch_size=batch_size):
+            seen += len(df)
+            samples.append(rss_mb())
+    seconds = time.perf_counter() - start
+    peak = peak_rss_mb()
+    print(json.dumps({"mode": mode, "rows": seen, "seconds": seconds, "peak_mb": peak,
+                      "samples_mb": [round(s) for s in samples[:: max(1, len(samples) // 10)]]}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming fetch memory")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.rows, args.batch_size)
+        return
+
+    print(f"{args.rows:,} rows of ~{len(PROFILE)} byte profiles, batch size {args.batch_size:,}")
+    print(f"{'mode':<16} {'seconds':>8} {'peak RSS MB':>12}  RSS samples while consuming (MB)")
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--rows", str(args.rows), "--batch-size", str(args.batch_size)],
+            check=True, capture_output=True, text=True,
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(out)
+        print(f"{mode:<16} {result['seconds']:>8.2f} {result['peak_mb']:>12.0f}  {result['samples_mb']}")
+
+
+if __name__ == "__main__":
+    main()
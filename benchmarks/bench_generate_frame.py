@@ -0,0 +1,57 @@
+"""
+Benchmark: per-profile generate_notifications loop vs columnar generate_frame.
+
+Usage:
+  python benchmarks/bench_generate_frame.py --sizes 100000 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification_generator'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pandas as pd
+
+from notification_generator import NotificationGenerator, FRAME_OUTPUT_COLUMNS
+from synthetic_profiles import make_profiles
+
+
+def per_profile_frame(generator, profiles, min_score, max_count):
+    rows = []
+    for consumer_id, profile in enumerate(profiles):
+        for rank, notif in enumerate(generator.generate_notifications(profile, min_score, max_count), 1):
+            rows.append((consumer_id, rank, notif['score'], notif['title'], notif['body'],
+                         notif['keyword'], notif['url'], notif['image_url']))
+    return pd.DataFrame(rows, columns=FRAME_OUTPUT_COLUMNS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generate_frame against the per-profile loop")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--min-score", type=int, default=82)
+    parser.add_argument("--max-count", type=int, default=10)
+    args = parser.parse_args()
+
+    generator = NotificationGenerator()
+    for size in args.sizes:
+        profiles = make_profiles(size)
+        profiles_df = NotificationGenerator.profiles_to_frame(profiles, range(size))
+
+        start = time.perf_counter()
+        expected = per_profile_frame(generator, profiles, args.min_score, args.max_count)
+        loop_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = generator.generate_frame(profiles_df, args.min_score, args.max_count)
+        frame_s = time.perf_counter() - start
+
+        identical = expected.to_csv(index=False) == actual.to_csv(index=False)
+        print(f"{size:>9,} profiles | loop {loop_s:7.2f}s | frame {frame_s:7.2f}s | "
+              f"speedup {loop_s / frame_s:5.1f}x | rows {len(actual):,} | identical={identical}")
+
+
+if __name__ == "__main__":
+    main()
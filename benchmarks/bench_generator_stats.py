@@ -0,0 +1,126 @@
+"""
+Benchmark: cost of generator stats (generator_stats.py), and that recording changes nothing.
+
+Generates the same synthetic profiles with stats off and on, per consumer (generate_from_fields)
+and as frames (generate_frame). Outputs must be identical, both paths must report the same
+filter counts and rule hits, and run_batch with worker processes must merge to the same totals.
+Prints the per-consumer stage breakdown.
+
+Usage:
+  python benchmarks/bench_generator_stats.py --consumers 50000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification_generator'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from batch_generate import open_sink, run_batch
+from generation_memo import GenerationMemo
+from notification_generator import NotificationGenerator
+from notification_service import NotificationService
+from profile_features import ProfileFeatures
+from profile_source import ProfileSource
+from synthetic_profiles import branch_profiles
+
+COMPARED = ["consumers", "notifications", "empty_results", "filters", "rules"]
+
+
+def best_time(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark generator stats recording")
+    parser.add_argument("--consumers", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    generator = NotificationGenerator()
+    profiles = branch_profiles(args.consumers)
+    fields = [generator.extract_profile_fields(p) for p in profiles]
+    ok = True
+
+    off_s, expected = best_time(lambda: [generator.generate_from_fields(f) for f in fields])
+    generator.enable_stats()
+    on_s, recorded = best_time(lambda: [generator.generate_from_fields(f) for f in fields], repeat=1)
+    per_consumer = generator.stats_snapshot()
+    if recorded != expected:
+        print("FAIL: generate_from_fields output changed with stats enabled")
+        ok = False
+
+    generator.disable_stats()
+    frame = NotificationGenerator.profiles_to_frame(profiles)
+    frame_off_s, frame_expected = best_time(lambda: generator.generate_frame(frame))
+    generator.enable_stats()
+    frame_on_s, frame_recorded = best_time(lambda: generator.generate_frame(frame), repeat=1)
+    per_frame = generator.stats_snapshot()
+    generator.disable_stats()
+    if not frame_recorded.equals(frame_expected):
+        print("FAIL: generate_frame output changed with stats enabled")
+        ok = False
+    if any(per_consumer[key] != per_frame[key] for key in COMPARED):
+        print("FAIL: generate_from_fields and generate_frame disagree on counts")
+        ok = False
+
+    n = len(fields)
+    print(f"generate_from_fields: off {1e6 * off_s / n:.2f} us/consumer, on {1e6 * on_s / n:.2f} us/consumer "
+          f"({on_s / off_s - 1:+.0%})")
+    print(f"generate_frame:       off {frame_off_s:.3f}s, on {frame_on_s:.3f}s ({frame_on_s / frame_off_s - 1:+.0%})")
+    section = per_consumer["stages"]["generate_from_fields"]
+    print("stage share (per consumer): " + ", ".join(f"{k} {v:.0%}" for k, v in section["share"].items()))
+    print("filters: " + ", ".join(f"{k} {v['in']:,}->{v['out']:,}" for k, v in per_consumer["filters"].items()))
+    print("top rules: " + ", ".join(f"{r['keyword']} {r['hit_rate']:.0%}" for r in per_consumer["rules"][:5]))
+
+    # Batch workers record in their own processes; run_batch merges the per-chunk snapshots
+    rows = [(i, json.dumps(p)) for i, p in enumerate(profiles)]
+    chunks = [(rows[i:i + 5000], {"last_consumer_id": rows[min(i + 5000, n) - 1][0]}) for i in range(0, n, 5000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = open_sink(os.path.join(tmp, "out.csv"), 'csv')
+        try:
+            totals = run_batch(iter(chunks), sink, 'csv', workers=args.workers, stats=True)
+        finally:
+            sink.close()
+    batch = totals["generator_stats"]
+    if any(batch[key] != per_frame[key] for key in COMPARED) or batch["stages"]["generate_frame"]["calls"] != len(chunks):
+        print(f"FAIL: run_batch(workers={args.workers}) stats differ from a single generate_frame")
+        ok = False
+
+    # The MCP tool: off until enabled, counts memo misses, reset starts over
+    class NoProfiles(ProfileSource):
+        def fetch_one(self, consumer_id):
+            return None
+
+        def fetch_many(self, consumer_ids):
+            return []
+
+    service = NotificationService(generator, GenerationMemo(generator), source=NoProfiles())
+    assert service.generator_stats()["enabled"] is False
+    service.generator_stats(enable=True)
+    for f in fields[:100]:
+        service.build_response(0, ProfileFeatures(*f), 82, 10)
+    report = service.generator_stats(reset=True)
+    misses = report["generation_memo"]["misses"]
+    if report["consumers"] != misses or service.generator_stats()["consumers"] != 0:
+        print("FAIL: get_generator_stats counts or reset are wrong")
+        ok = False
+    service.generator_stats(enable=False)
+    service.close()
+
+    if ok:
+        print("identical output and matching counts with stats on; get_generator_stats enable/reset: ok")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Benchmark: bitmask guardrail engine vs the pre-1.4 string-scanning guardrails.
+
+Also checks compound words: a word starting with a blocked term ("cheeseburger", "meatball",
+"buttermilk") is blocked, while "veggie", "meatless" and "eggplant" pass. Exits non-zero otherwise.
+
+Usage:
+  python benchmarks/bench_guardrails.py --profiles 20000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification_generator'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from notification_generator import NotificationGenerator
+from guardrails import DIET_VEGAN, DIET_VEGETARIAN, candidate_conflicts, content_conflicts, profile_mask
+from synthetic_profiles import make_profiles
+
+
+def legacy_passes_dietary_guardrail(notification, dietary_pref):
+    """Previous implementation, kept here as the comparison baseline."""
+    if not dietary_pref or dietary_pref.lower() in ['none', 'no preference']:
+        return True
+    dietary_lower = dietary_pref.lower()
+    content = f"{notification['title']} {notification['body']} {notification['keyword']}".lower()
+    if 'vegetarian' in dietary_lower:
+        meat_keywords = ['meat', 'chicken', 'beef', 'pork', 'bacon', 'sausage', 'steak', 'turkey']
+        if any(meat in content for meat in meat_keywords):
+            return False
+    if 'vegan' in dietary_lower:
+        animal_products = ['meat', 'chicken', 'beef', 'dairy', 'cheese', 'egg', 'milk', 'bacon', 'butter']
+        if any(product in content for product in animal_products):
+            return False
+    if 'pescatarian' in dietary_lower:
+        meats = ['chicken', 'beef', 'pork', 'bacon', 'sausage', 'steak', 'turkey', 'lamb']
+        if any(meat in content for meat in meats):
+            return False
+    return True
+
+
+def legacy_passes_mild_spicy_guardrail(notification, taste_pref):
+    if not taste_pref:
+        return True
+    taste_lower = taste_pref.lower()
+    if 'mild' in taste_lower and 'spicy' in taste_lower:
+        content = f"{notification['title']} {notification['body']} {notification['keyword']}".lower()
+        if 'spicy' in content:
+            return False
+    return True
+
+
+# (copy, guardrail bit, blocked?)
+COMPOUND_CASES = [
+    ("Cheeseburgers near you", DIET_VEGAN, True),
+    ("Meatball subs", DIET_VEGETARIAN, True),
+    ("Buttermilk pancakes", DIET_VEGAN, True),
+    ("Eggnog season", DIET_VEGAN, True),
+    ("Steakhouse favorites", DIET_VEGETARIAN, True),
+    ("Veggie bowls", DIET_VEGAN, False),
+    ("Meatless Monday", DIET_VEGETARIAN, False),
+    ("Eggplant parm", DIET_VEGAN, False),
+    ("Butternut squash soup", DIET_VEGAN, False),
+]
+
+
+def check_compound_words() -> bool:
+    ok = True
+    for text, bit, blocked in COMPOUND_CASES:
+        if bool(content_conflicts(text, '', '') & bit) != blocked:
+            print(f"FAIL: {text!r} should {'' if blocked else 'not '}be blocked")
+            ok = False
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark guardrail filtering")
+    parser.add_argument("--profiles", type=int, default=20000)
+    args = parser.parse_args()
+
+    generator = NotificationGenerator()
+    candidates = [generator._build_rule_notification(rule) for rule in generator.rules.rules]
+    conflicts = [candidate_conflicts(c) for c in candidates]
+    prefs = []
+    for profile in make_profiles(args.profiles):
+        overall = profile['overall_profile']
+        prefs.append((overall['dietary_preferences']['preferred_dietary_preference'], overall['taste_preference'].lower()))
+    checks = len(prefs) * len(candidates)
+
+    start = time.perf_counter()
+    legacy = [legacy_passes_dietary_guardrail(c, d) and legacy_passes_mild_spicy_guardrail(c, t)
+              for d, t in prefs for c in candidates]
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    methods = [generator.passes_dietary_guardrail(c, d) and generator.passes_mild_spicy_guardrail(c, t)
+               for d, t in prefs for c in candidates]
+    methods_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    masks = []
+    for d, t in prefs:
+        guard = profile_mask(d, t)
+        masks.extend(not (conflict & guard) for conflict in conflicts)
+    masks_s = time.perf_counter() - start
+
+    print(f"{checks:,} candidate checks ({len(prefs):,} profiles x {len(candidates)} candidates)")
+    print(f"  legacy string scans   {legacy_s:7.3f}s  ({checks / legacy_s:,.0f} checks/s)")
+    print(f"  passes_* methods      {methods_s:7.3f}s  ({checks / methods_s:,.0f} checks/s)")
+    print(f"  precomputed bitmasks  {masks_s:7.3f}s  ({checks / masks_s:,.0f} checks/s)")
+    print(f"  identical decisions: {legacy == methods == masks}")
+
+    ok = check_compound_words()
+    print(f"compound words ({len(COMPOUND_CASES)} cases): {'ok' if ok else 'FAIL'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+"""
+Micro-benchmarks for the generator's hot functions, with stored baselines for PR comparison.
+
+Each case runs one function over a fixed, seeded set of inputs (synthetic_profiles.branch_profiles
+reaches every rule, dietary/taste guardrail and both price branches; copy inputs come from the
+catalog plus crafted edge cases), and reports:
+
+  ops/s       best of --repeat short timed samples
+  relative    calls per run of a fixed reference loop timed alongside (median of paired samples); comparisons use this, so a
+              machine that is uniformly faster or slower right now does not read as a change
+  peak B/call tracemalloc peak of one call, results discarded (the call's working allocation)
+  kept B/op   bytes still allocated after a pass, per call (caches, leaks)
+
+Runs fully offline. To compare a branch against main:
+
+  python benchmarks/bench_hot_functions.py --against main                # times both trees here, now
+  python benchmarks/bench_hot_functions.py --save-baseline               # write baselines/hot_functions.json
+  python benchmarks/bench_hot_functions.py --compare                     # check against the stored baseline
+
+Comparisons exit 1 when a case loses more than --tolerance of its relative speed, or its peak allocation
+grows by more than --tolerance. --against is the reliable one: the stored baseline is only
+meaningful on the machine (and Python) that wrote it.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines", "hot_functions.json")
+LOCALES = [("en-US", "en"), ("es-US", "es"), ("fr-CA", "fr"), ("en-CA", "en"), ("", "")]
+
+# Copy that trips each validate_notification issue (and the keyword-append branches)
+EDGE_COPY = [
+    ("A title that is much too long for a push", "Fresh bowls near you"),
+    ("Bowls near you", "x" * 141),
+    ("Bowls near you!", "Fresh bowls near you"),
+    ("Bowls near you.", "Fresh bowls near you"),
+    ("#Bowls", "Fresh bowls near you"),
+    ("Bowls on DoorDash", "Fresh bowls near you"),
+    ("Bowls near you", "Mouthwatering bowls near you"),
+    ("Bowls near you", "Bowls for dinner tonight"),
+    ("Bowls near you", "Authentic bowls near you"),
+]
+KEYWORD_BODIES = [
+    ("poke", "Fresh poke bowls near you"),
+    ("poke", "Fresh bowls near you"),
+    ("poke", "y" * 134),
+    ("poke", "y" * 138),
+    ("poke", "y" * 140),
+    ("", "Fresh bowls near you"),
+]
+
+
+def build_cases(profile_count: int) -> Dict[str, Tuple[Callable[[], None], int]]:
+    """name -> (one pass over the case's inputs, calls per pass). Cases the tree lacks are skipped."""
+    import guardrails
+    from notification_generator import NotificationGenerator
+    from synthetic_profiles import branch_profiles, make_profile, uncovered_branches
+
+    generator = NotificationGenerator()
+    profiles = branch_profiles(profile_count)
+    missing = uncovered_branches(generator, profiles)
+    if missing:
+        raise SystemExit(f"synthetic profiles miss branches: {sorted(missing)}")
+    fields = [generator.extract_profile_fields(p) for p in profiles]
+    candidates = [entry.as_notification() for entry in generator.catalog.ranked]
+    copy = [(c["title"], c["body"]) for c in candidates] + EDGE_COPY
+    keyword_bodies = [(rule["keyword"], body) for rule in generator.rules.rules for body in rule["bodies"]]
+    keyword_bodies += KEYWORD_BODIES
+    localize_inputs = [(t, b, loc, lang) for t, b in copy for loc, lang in LOCALES]
+    triples = [(c["title"], c["body"], c["keyword"]) for c in candidates]
+    masks = [(f[3], f[2]) for f in fields]
+    pairs = [(c, f[3], f[2]) for f in fields[:32] for c in candidates]
+
+    def over(fn, inputs):
+        def run():
+            for args in inputs:
+                fn(*args)
+        return run, len(inputs)
+
+    cases = {
+        "generate_notifications": over(generator.generate_notifications, [(p,) for p in profiles]),
+        "generate_from_fields": over(generator.generate_from_fields, [(f,) for f in fields]),
+        "validate_notification": over(generator.validate_notification, copy),
+        "localize_copy": over(generator.localize_copy, localize_inputs),
+        "_ensure_keyword_in_body": over(generator._ensure_keyword_in_body, keyword_bodies),
+        "guardrails.profile_mask": over(guardrails.profile_mask, masks),
+        # Uncached: the scan itself, as on a catalog rebuild
+        "guardrails.content_conflicts": over(guardrails.content_conflicts.__wrapped__, triples),
+    }
+
+    def passes(candidate, dietary, taste):
+        generator.passes_dietary_guardrail(candidate, dietary) and generator.passes_mild_spicy_guardrail(candidate, taste)
+    cases["passes_guardrails"] = over(passes, pairs)
+
+    try:
+        from profile_features import decode_profile
+    except ImportError:
+        pass
+    else:
+        import random
+        rng = random.Random(5)
+        blobs = [json.dumps(make_profile(rng, full=True), sort_keys=True) for _ in range(64)]
+        cases["decode_profile"] = over(decode_profile, [(b,) for b in blobs])
+    return cases
+
+
+def reference_work():
+    """Fixed pure-Python work (string, dict and list operations) that case timings are normalized by."""
+    seen = {}
+    for i in range(200):
+        word = "Spicy Noodles %d" % (i % 17)
+        seen[word.lower()] = seen.get(word.lower(), 0) + len(word.split())
+    return seen
+
+
+def samples_per_run(run: Callable[[], None], sample_time: float) -> int:
+    passes = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(passes):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= sample_time / 2:
+            return max(1, round(passes * sample_time / elapsed))
+        passes *= 2
+
+
+def measure(run: Callable[[], None], calls: int, repeat: int, min_time: float) -> Dict:
+    run()  # warm caches and lazily compiled patterns
+    # Many short samples, keeping the fastest: the least disturbed by other load on the machine.
+    # Each sample is paired with an adjacent reference sample, so `relative` (the median ratio)
+    # cancels out shifts in machine speed.
+    sample_time = min_time / repeat
+    passes = samples_per_run(run, sample_time)
+    ref_passes = samples_per_run(reference_work, sample_time / 4)
+
+    def timed(fn, n):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter() - start) / n
+
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        best, ratios = float("inf"), []
+        for _ in range(repeat):
+            sample = timed(run, passes)
+            ratios.append(timed(reference_work, ref_passes) / sample)
+            best = min(best, sample)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        run()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "ops_per_s": round(calls / best, 1),
+        # Calls per reference_work run: comparable across runs even when the machine's speed shifts
+        "relative": round(calls * statistics.median(ratios), 4),
+        "peak_bytes_per_call": max(0, peak - before),
+        "kept_bytes_per_op": round(max(0, after - before) / calls, 1),
+    }
+
+
+def run_suite(profile_count: int, repeat: int, min_time: float, only: Optional[List[str]]) -> Dict:
+    results = {}
+    for name, (run, calls) in build_cases(profile_count).items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        results[name] = measure(run, calls, repeat, min_time)
+    return results
+
+
+def environment() -> Dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                             text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        rev = ""
+    return {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system(),
+            "cpu_count": os.cpu_count(), "git_rev": rev, "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def print_results(results: Dict):
+    print(f"{'case':<30} {'ops/s':>12} {'relative':>10} {'peak B/call':>12} {'kept B/op':>10}")
+    for name, r in results.items():
+        print(f"{name:<30} {r['ops_per_s']:>12,.0f} {r['relative']:>10.3f} {r['peak_bytes_per_call']:>12,} "
+              f"{r['kept_bytes_per_op']:>10,.1f}")
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float, label: str) -> bool:
+    """Print baseline vs current per case; False when any case regressed beyond tolerance."""
+    ok = True
+    print(f"\n{'case':<30} {label + ' ops/s':>16} {'ops/s':>12} {'relative':>9} {'peak B/call':>18}")
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<30} {'n/a':>16} {r['ops_per_s']:>12,.0f}")
+            continue
+        # Judged on the normalized speed; raw ops/s are shown for reference
+        change = r["relative"] / base["relative"] - 1
+        peak = f"{base['peak_bytes_per_call']:,} -> {r['peak_bytes_per_call']:,}"
+        flags = []
+        if change < -tolerance:
+            flags.append("SLOWER")
+        # Allocation sizes are deterministic; a small absolute slack absorbs interpreter noise
+        if r["peak_bytes_per_call"] > base["peak_bytes_per_call"] * (1 + tolerance) + 256:
+            flags.append("MORE ALLOC")
+        ok = ok and not flags
+        print(f"{name:<30} {base['ops_per_s']:>16,.0f} {r['ops_per_s']:>12,.0f} {change:>+8.1%} {peak:>18} "
+              f"{' '.join(flags)}")
+    return ok
+
+
+def best_of(runs: List[Dict]) -> Dict:
+    """Per case, the run with the highest relative speed (allocations are the same in every run)."""
+    merged = {}
+    for results in runs:
+        for name, r in results.items():
+            if name not in merged or r["relative"] > merged[name]["relative"]:
+                merged[name] = r
+    return merged
+
+
+def export_ref(ref: str, dest: str) -> str:
+    """Extract notification_generator/ at a git ref into dest; returns the code directory."""
+    archive = os.path.join(dest, "ref.tar")
+    with open(archive, "wb") as f:
+        subprocess.run(["git", "archive", ref, "notification_generator"], cwd=REPO_DIR, stdout=f, check=True)
+    with tarfile.open(archive) as tar:
+        tar.extractall(dest, filter="data")
+    return os.path.join(dest, "notification_generator")
+
+
+def run_in_subprocess(code_dir: str, args, out: str) -> Dict:
+    """Results for the generator code in code_dir, timed by this script in a fresh interpreter."""
+    cmd = [sys.executable, os.path.abspath(__file__), "--code-dir", code_dir, "--profiles", str(args.profiles),
+           "--repeat", str(args.repeat), "--min-time", str(args.min_time), "--json", out]
+    subprocess.run(cmd + (["--only"] + args.only if args.only else []), check=True, stdout=subprocess.DEVNULL)
+    with open(out) as f:
+        return json.load(f)["results"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the generator's hot functions")
+    parser.add_argument("--profiles", type=int, default=512, help="Synthetic profiles per pass")
+    parser.add_argument("--repeat", type=int, default=25, help="Timed samples per case (the best counts)")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds of timed samples per case")
+    parser.add_argument("--only", nargs="+", help="Run cases whose name contains any of these")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Write results as a baseline")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, help="Compare against a baseline file")
+    parser.add_argument("--against", help="Git ref to time on this machine and compare against, e.g. main")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="With --against: alternate ref/current runs this many times, best of each")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed fractional regression")
+    parser.add_argument("--json", help="Also write results to this file")
+    parser.add_argument("--code-dir", default=os.path.join(REPO_DIR, "notification_generator"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, args.code_dir)
+    sys.path.insert(0, BENCH_DIR)
+
+    ref_results = None
+    if args.against:
+        # Alternate the two trees so drift in machine speed hits both alike
+        with tempfile.TemporaryDirectory() as tmp:
+            ref_dir = export_ref(args.against, tmp)
+            ref_runs, runs = [], []
+            for i in range(args.rounds):
+                ref_runs.append(run_in_subprocess(ref_dir, args, os.path.join(tmp, f"ref{i}.json")))
+                runs.append(run_in_subprocess(args.code_dir, args, os.path.join(tmp, f"current{i}.json")))
+        ref_results, results = best_of(ref_runs), best_of(runs)
+    else:
+        results = run_suite(args.profiles, args.repeat, args.min_time, args.only)
+    document = {"environment": environment(), "results": results}
+    print_results(results)
+
+    for path in filter(None, (args.json, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(document, f, indent=2)
+            f.write("\n")
+        if path == args.save_baseline:
+            print(f"\nbaseline written to {path}")
+
+    ok = True
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        env, base_env = document["environment"], baseline.get("environment", {})
+        if (env["python"], env["machine"]) != (base_env.get("python"), base_env.get("machine")):
+            print(f"\nnote: baseline is from Python {base_env.get('python')} on {base_env.get('machine')}; "
+                  f"timings are not directly comparable")
+        ok = compare(results, baseline["results"], args.tolerance, f"base@{base_env.get('git_rev') or '?'}") and ok
+    if ref_results is not None:
+        ok = compare(results, ref_results, args.tolerance, args.against) and ok
+    if not ok:
+        print(f"\nFAIL: regression beyond {args.tolerance:.0%}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Benchmark: PROFILE JSON decode time per consumer, whole-document json.loads vs decode_profile.
+
+Profiles are production-shaped (synthetic_profiles full=True: overall_profile plus per-cuisine
+detail, store affinity and ordering patterns) and serialized with sorted keys, the way Snowflake
+returns VARIANT objects, so overall_profile sits in the middle of the text. Every decoded
+ProfileFeatures must equal extract_profile_fields of the fully parsed profile.
+
+Usage:
+  python benchmarks/bench_profile_decoding.py --consumers 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification_generator'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from notification_generator import NotificationGenerator
+from profile_features import JSON_BACKEND, ProfileFeatures, _loads, decode_profile
+from synthetic_profiles import iter_profiles
+
+
+def timed(fn, blobs):
+    start = time.perf_counter()
+    out = [fn(blob) for blob in blobs]
+    return time.perf_counter() - start, out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark PROFILE JSON decoding")
+    parser.add_argument("--consumers", type=int, default=20_000)
+    args = parser.parse_args()
+
+    extract = NotificationGenerator.extract_profile_fields
+    ok = True
+    print(f"JSON backend: {JSON_BACKEND}")
+    print(f"{'profiles':<10} {'avg bytes':>9} {'json.loads':>11} {JSON_BACKEND + ' full':>12} "
+          f"{'decode_profile':>15} {'speedup':>8}")
+    for label, full in (("compact", False), ("full", True)):
+        blobs = [json.dumps(p, sort_keys=True) for p in iter_profiles(args.consumers, full=full)]
+        avg_bytes = sum(map(len, blobs)) / len(blobs)
+
+        stdlib_s, expected = timed(lambda blob: ProfileFeatures(*extract(json.loads(blob))), blobs)
+        backend_s, _ = timed(lambda blob: ProfileFeatures(*extract(_loads(blob))), blobs)
+        decode_s, decoded = timed(decode_profile, blobs)
+        if decoded != expected:
+            print(f"FAIL: decode_profile differs from a full parse for {label} profiles")
+            ok = False
+
+        per = 1e6 / len(blobs)
+        print(f"{label:<10} {avg_bytes:>9.0f} {stdlib_s * per:>9.1f}us {backend_s * per:>10.1f}us "
+              f"{decode_s * per:>13.1f}us {stdlib_s / decode_s:>7.1f}x")
+
+    # A nested key with the same name must not be mistaken for the top-level one
+    nested = json.dumps({"history": {"overall_profile": {"cuisine_preferences": "wrong"}},
+                         "overall_profile": {"cuisine_preferences": "Thai"}, "pad": "x" * 4096})
+    # ... nor decoded when it is the only one (no top-level key: empty profile)
+    nested_only = json.dumps({"history": {"note": 'a\\"{', "overall_profile": {"cuisine_preferences": "wrong"}},
+                              "pad": "x" * 4096})
+    if decode_profile(nested).cuisine_preferences != "Thai" or decode_profile(nested_only) != ProfileFeatures():
+        print("FAIL: nested overall_profile key was decoded")
+        ok = False
+    if decode_profile(None) != ProfileFeatures():
+        print("FAIL: a NULL PROFILE should decode as an empty profile")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Benchmark: point and batch lookups against a local profile snapshot (profile_source.py).
+
+Builds a SQLite snapshot of synthetic profiles, then times fetch_one for random consumers
+(p50/p99) and fetch_many for batch-sized chunks. Point lookups must stay under a millisecond.
+Also checks the Snowflake source falls back to the snapshot when the warehouse fails, and that
+the notification service generates end to end from the snapshot with no Snowflake at all.
+
+Usage:
+  python benchmarks/bench_profile_source.py --consumers 200000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification_generator'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from generation_memo import GenerationMemo
+from notification_generator import NotificationGenerator
+from notification_service import NotificationService
+from profile_queries import ProfileQueries
+from profile_source import FallbackProfileSource, SnapshotProfileSource, SnowflakeProfileSource, build_snapshot
+from synthetic_profiles import iter_profiles
+
+
+class DownPool:
+    """A Snowflake pool during a warehouse incident."""
+
+    def run(self, fn):
+        raise RuntimeError("warehouse unavailable")
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {}
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark local snapshot profile lookups")
+    parser.add_argument("--consumers", type=int, default=200_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "profiles.db")
+        start = time.perf_counter()
+        rows = ((i, json.dumps(profile)) for i, profile in enumerate(iter_profiles(args.consumers)))
+        count = build_snapshot(rows, path)
+        build_s = time.perf_counter() - start
+        print(f"built snapshot of {count:,} profiles in {build_s:.1f}s ({os.path.getsize(path) / 2**20:.0f} MB)")
+
+        source = SnapshotProfileSource(path, chunk_size=args.batch)
+        rng = random.Random(11)
+        ids = [rng.randrange(args.consumers) for _ in range(args.lookups)]
+        source.fetch_one(ids[0])  # open the connection outside the timing
+
+        timings = []
+        for consumer_id in ids:
+            t = time.perf_counter()
+            row = source.fetch_one(consumer_id)
+            timings.append(time.perf_counter() - t)
+            assert row and row[0] == consumer_id
+        p50, p99 = percentile(timings, 50) * 1e6, percentile(timings, 99) * 1e6
+        print(f"fetch_one:  p50 {p50:.0f} us, p99 {p99:.0f} us over {args.lookups:,} random lookups")
+
+        batches = [ids[i:i + args.batch] for i in range(0, len(ids), args.batch)]
+        t = time.perf_counter()
+        fetched = sum(len(source.fetch_many(batch)) for batch in batches)
+        batch_s = time.perf_counter() - t
+        print(f"fetch_many: {1e3 * batch_s / len(batches):.2f} ms per {args.batch}-id batch "
+              f"({1e6 * batch_s / fetched:.1f} us/profile)")
+        assert source.fetch_one(args.consumers + 1) is None
+
+        # Warehouse incident: the Snowflake source answers from the snapshot
+        fallback = FallbackProfileSource(SnowflakeProfileSource(DownPool(), ProfileQueries('FAKE')), source)
+        assert fallback.fetch_one(ids[0])[0] == ids[0]
+        assert len(fallback.fetch_many(ids[:10])) == len(set(ids[:10]))
+        assert fallback.stats()["fallbacks"] == 2
+
+        # End to end with no Snowflake: the service generates straight from the snapshot
+        generator = NotificationGenerator()
+        service = NotificationService(generator, GenerationMemo(generator), source=source, max_concurrency=4)
+
+        async def generate():
+            single = await service.generate_consumer_notifications(str(ids[1]))
+            batch = await service.generate_notifications_batch([str(i) for i in ids[:50]] + ["abc"])
+            return single, batch
+
+        single, batch = asyncio.run(generate())
+        service.close()
+        source.close()
+        assert single["status"] == "success", single
+        assert batch["count"] == len(set(ids[:50])) and batch["error_count"] == 1, batch["errors"]
+        print("fallback during warehouse failure and offline generation: ok")
+
+        if p50 >= 1000:
+            print(f"FAIL: point lookup p50 {p50:.0f} us is not sub-millisecond")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Benchmark: generate_consumer_notifications response size and encoding time per format/projection.
+
+Builds responses the way the MCP server does (memoized generation + enrichment) for synthetic
+profiles, then serializes them. Time covers building the response and encoding it.
+
+Usage:
+  python benchmarks/bench_response_encoding.py --consumers 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification_generator'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from generation_memo import GenerationMemo
+from notification_generator import NotificationGenerator
+from notification_service import (
+    NOTIFICATION_FIELDS,
+    OPTIONAL_RESPONSE_FIELDS,
+    NotificationService,
+    normalize_fields,
+    serialize_response,
+)
+from synthetic_profiles import make_profiles
+
+MODES = [
+    ("pretty", None),
+    ("compact", None),
+    ("ndjson", None),
+    ("compact", ["title", "body", "url"]),
+    ("ndjson", ["title", "body", "url"]),
+    ("compact", ["keyword", "score"]),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response encodings")
+    parser.add_argument("--consumers", type=int, default=20_000)
+    args = parser.parse_args()
+
+    profiles = make_profiles(args.consumers)
+    generator = NotificationGenerator()
+    service = NotificationService(generator, GenerationMemo(generator), pool=None, max_concurrency=1)
+    # Warm the memo so every mode measures the same (cached) generation cost
+    for profile in profiles:
+        service.build_response(0, profile, 80, 10)
+
+    # Full projection is the original response, byte for byte
+    everything = normalize_fields(NOTIFICATION_FIELDS + OPTIONAL_RESPONSE_FIELDS)
+    for i, profile in enumerate(profiles[:1000]):
+        full = service.build_response(i, profile, 80, 10)
+        assert json.dumps(full, indent=2, ensure_ascii=False) == \
+            serialize_response(service.build_response(i, profile, 80, 10, everything))
+
+    print(f"{args.consumers} consumers, min_score=80, max_count=10")
+    print(f"{'format':<8} {'fields':<22} {'bytes/resp':>10} {'vs pretty':>9} {'us/resp':>9}")
+    baseline_bytes = None
+    for output_format, fields in MODES:
+        projection = normalize_fields(fields)
+        total_bytes = 0
+        start = time.perf_counter()
+        for i, profile in enumerate(profiles):
+            text = serialize_response(service.build_response(i, profile, 80, 10, projection), output_format)
+            total_bytes += len(text.encode('utf-8'))
+        seconds = time.perf_counter() - start
+        baseline_bytes = baseline_bytes or total_bytes
+        label = ','.join(fields) if fields else 'all'
+        print(f"{output_format:<8} {label:<22} {total_bytes / args.consumers:>10.0f} "
+              f"{total_bytes / baseline_bytes:>8.0%} {1e6 * seconds / args.consumers:>9.1f}")
+    service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark: sequential query_to_dataframe vs SnowflakeConnector.run_many.
+
+A fake connection runs each query on a timer (its duration is given in the SQL text,
+e.g. "SELECT 1 /* 0.8s */"), supporting execute_async, query status polling and
+get_results_from_sfqid. Sequential wall time is the sum of the durations; run_many should
+approach the slowest one. Also checks per-query timeouts cancel the query.
+
+Usage:
+  python benchmarks/bench_run_many.py --queries 8
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+RUNNING, SUCCESS, FAILED = "RUNNING", "SUCCESS", "FAILED"
+_DURATION = re.compile(r'/\* ([\d.]+)s \*/')
+
+
+class FakeWarehouse:
+    def __init__(self):
+        self.queries = {}  # sfqid -> (sql, finish time)
+        self.cancelled = set()
+
+    def start(self, sql) -> str:
+        sfqid = str(uuid.uuid4())
+        self.queries[sfqid] = (sql, time.monotonic() + float(_DURATION.search(sql).group(1)))
+        return sfqid
+
+
+class FakeCursor:
+    def __init__(self, warehouse):
+        self.warehouse = warehouse
+        self.sfqid = None
+        self.description = None
+        self._rows = []
+
+    def execute(self, query, params=None):
+        if query.startswith("SELECT SYSTEM$CANCEL_QUERY"):
+            self.warehouse.cancelled.add(params[0])
+            return self
+        # Blocking execute: wait out the query
+        self.sfqid = self.warehouse.start(query)
+        time.sleep(max(0.0, self.warehouse.queries[self.sfqid][1] - time.monotonic()))
+        self._load(query)
+        return self
+
+    def execute_async(self, query, params=None):
+        self.sfqid = self.warehouse.start(query)
+
+    def get_results_from_sfqid(self, sfqid):
+        self._load(self.warehouse.queries[sfqid][0])
+
+    def _load(self, sql):
+        if "FAIL" in sql:
+            raise RuntimeError("SQL compilation error")
+        self.description = [("N",), ("SQL",)]
+        self._rows = [(i, sql) for i in range(100)]
+
+    def fetchall(self):
+        return self._rows
+
+    def fetch_pandas_all(self):
+        import pandas as pd
+        return pd.DataFrame(self._rows, columns=[d[0] for d in self.description])
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, warehouse):
+        self.warehouse = warehouse
+
+    def cursor(self):
+        return FakeCursor(self.warehouse)
+
+    def get_query_status_throw_if_error(self, sfqid):
+        sql, finish = self.warehouse.queries[sfqid]
+        if sfqid in self.warehouse.cancelled:
+            raise RuntimeError(f"Query {sfqid} was cancelled")
+        if time.monotonic() < finish:
+            return RUNNING
+        if "FAIL" in sql:
+            raise RuntimeError("SQL compilation error")
+        return SUCCESS
+
+    def is_still_running(self, status):
+        return status == RUNNING
+
+    def close(self):
+        pass
+
+
+def make_connector():
+    from snowflake_connector import SnowflakeConnector
+
+    sf = SnowflakeConnector(config={})
+    warehouse = FakeWarehouse()
+    sf.connection = FakeConnection(warehouse)
+    sf.cursor = sf.connection.cursor()
+    return sf, warehouse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent async queries")
+    parser.add_argument("--queries", type=int, default=8)
+    parser.add_argument("--slowest", type=float, default=1.0, help="Slowest query duration in seconds")
+    args = parser.parse_args()
+
+    from snowflake_connector import QueryTimeout
+
+    durations = [args.slowest * (i + 1) / args.queries for i in range(args.queries)]
+    queries = [f"SELECT {i} /* {d:.3f}s */" for i, d in enumerate(durations)]
+    sf, warehouse = make_connector()
+
+    start = time.perf_counter()
+    sequential = [sf.query_to_dataframe(q) for q in queries]
+    sequential_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    concurrent = sf.run_many(queries, poll_interval=0.05)
+    concurrent_s = time.perf_counter() - start
+
+    assert [len(df) for df in concurrent] == [len(df) for df in sequential]
+    assert all(df["SQL"].iloc[0] == q for df, q in zip(concurrent, queries)), "results out of order"
+    print(f"{args.queries} queries, durations {durations[0]:.2f}s..{durations[-1]:.2f}s (sum {sum(durations):.2f}s)")
+    print(f"sequential query_to_dataframe: {sequential_s:.2f}s")
+    print(f"run_many:                      {concurrent_s:.2f}s")
+    assert concurrent_s < args.slowest * 1.5 + 0.3, "run_many should take about as long as the slowest query"
+
+    # Named queries, per-query timeout and failures
+    results = sf.run_many({
+        "fast": "SELECT 1 /* 0.1s */",
+        "slow": ("SELECT 2 /* 5s */", None, 0.3),
+        "broken": "SELECT FAIL /* 0.1s */",
+    }, poll_interval=0.05, return_exceptions=True)
+    assert len(results["fast"]) == 100
+    assert isinstance(results["slow"], QueryTimeout)
+    assert isinstance(results["broken"], RuntimeError)
+    assert len(warehouse.cancelled) == 1, "the timed out query should be cancelled"
+
+    # Without return_exceptions the first failure raises and the rest are cancelled
+    warehouse.cancelled.clear()
+    try:
+        sf.run_many(["SELECT FAIL /* 0.05s */", "SELECT 3 /* 5s */", "SELECT 4 /* 5s */"], poll_interval=0.05)
+        raise AssertionError("expected the failing query to raise")
+    except RuntimeError:
+        pass
+    assert len(warehouse.cancelled) == 2, "still-running queries should be cancelled on failure"
+    print("timeouts, failures and cancellation: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark: concurrent MCP tool calls against a slow (fake) Snowflake connection.
+
+Each fake query sleeps --latency seconds. Reports the wall time of N concurrent generate calls
+against serial (N * latency) and ideal (ceil(N / concurrency) * latency), how long
+validate_notification takes while fetches are in flight, repeat bursts served from the profile
+cache, a stale entry served while revalidating, bursts for one consumer, and one
+generate_notifications_batch call. The interleaving and coalescing guarantees are tested in
+tests/test_notification_service.py.
+
+Usage:
+  python benchmarks/bench_server_concurrency.py --calls 16 --latency 0.2 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification_generator'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from connection_pool import SnowflakeConnectionPool
+from generation_memo import GenerationMemo
+from notification_generator import NotificationGenerator
+from notification_service import NotificationService
+from synthetic_profiles import make_profiles
+
+
+QUERIES = []
+# Consumer id the fake warehouse fails on
+FAILING_ID = 999_999
+
+
+class SlowCursor:
+    def __init__(self, profiles, latency):
+        self.profiles = profiles
+        self.latency = latency
+        self.rows = []
+
+    def execute(self, query, params=None):
+        QUERIES.append(query)
+        time.sleep(self.latency)
+        ids = [int(p) for p in params] if params else [int(query.rsplit('=', 1)[1])]
+        if FAILING_ID in ids:
+            raise RuntimeError("warehouse unavailable")
+        self.rows = [(i, json.dumps(self.profiles[i])) for i in ids if 0 <= i < len(self.profiles)]
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class SlowConnection:
+    def __init__(self, profiles, latency):
+        self.profiles = profiles
+        self.latency = latency
+
+    def cursor(self):
+        return SlowCursor(self.profiles, self.latency)
+
+    def is_closed(self):
+        return False
+
+    def close(self):
+        pass
+
+
+async def run(args):
+    profiles = make_profiles(args.calls)
+    generator = NotificationGenerator()
+    pool = SnowflakeConnectionPool(lambda: SlowConnection(profiles, args.latency),
+                                   min_size=0, max_size=args.concurrency)
+    service = NotificationService(generator, GenerationMemo(generator), pool,
+                                  max_concurrency=args.concurrency, table='FAKE')
+
+    async def timed_validate():
+        await asyncio.sleep(args.latency / 4)
+        start = time.perf_counter()
+        service.validate_notification("Taco time", "Tacos and burritos from top Mexican spots near you")
+        return time.perf_counter() - start, service.metrics()["snowflake_io"]["in_flight"]
+
+    start = time.perf_counter()
+    results, (validate_seconds, in_flight) = await asyncio.gather(
+        asyncio.gather(*(service.generate_consumer_notifications(i) for i in range(args.calls))),
+        timed_validate(),
+    )
+    wall = time.perf_counter() - start
+
+    # Repeat burst is served from the profile cache without touching the warehouse
+    queries_before = len(QUERIES)
+    start = time.perf_counter()
+    await asyncio.gather(*(service.generate_consumer_notifications(i) for i in range(args.calls)))
+    cached_wall = time.perf_counter() - start
+    cached_queries = len(QUERIES) - queries_before
+
+    # Expired entries are still served immediately and refreshed in the background
+    service.profile_cache.ttl = 0
+    start = time.perf_counter()
+    stale = await service.generate_consumer_notifications(0)
+    stale_wall = time.perf_counter() - start
+    await asyncio.gather(*service._background)
+    service.profile_cache.ttl = 300
+    refreshes = service.profile_cache.stats()["refreshes"]
+
+    # Bursts for one consumer: one query per burst, errors reach every waiter
+    service.invalidate_profiles()
+    queries_before = len(QUERIES)
+    burst = await asyncio.gather(
+        *(service.generate_consumer_notifications(0, 80, 10) for _ in range(args.calls)),
+        *(service.generate_consumer_notifications(0, 90, 3) for _ in range(args.calls)),
+    )
+    burst_queries = len(QUERIES) - queries_before
+    coalescing = service.metrics()["coalescing"]
+    queries_before = len(QUERIES)
+    failed = await asyncio.gather(*(service.generate_consumer_notifications(FAILING_ID) for _ in range(args.calls)))
+    failed_queries = len(QUERIES) - queries_before
+
+    # One call for all consumers plus an unknown and a malformed id: ceil(calls / chunk) IN queries
+    service.invalidate_profiles()
+    service.source.queries.chunk_size = max(1, args.calls // 2)
+    start = time.perf_counter()
+    batch = await service.generate_notifications_batch(list(range(args.calls)) + [args.calls + 1, "1; DROP TABLE x"])
+    batch_wall = time.perf_counter() - start
+    service.close()
+    pool.close()
+
+    serial = args.calls * args.latency
+    ideal = math.ceil(args.calls / args.concurrency) * args.latency
+    print(f"{args.calls} calls x {args.latency * 1000:.0f} ms fetch, concurrency {args.concurrency}")
+    print(f"  wall {wall:.2f}s (serial would be {serial:.2f}s, ideal {ideal:.2f}s)")
+    print(f"  validate_notification answered in {validate_seconds * 1000:.2f} ms with {in_flight} fetches in flight")
+    print(f"  pool peak in use: {pool.stats()['peak_in_use']}, query shapes: "
+          f"{sorted(service.source.queries.stats()['shapes'])}")
+    print(f"  repeat burst from profile cache: {cached_wall * 1000:.2f} ms, {cached_queries} queries")
+    print(f"  stale entry served in {stale_wall * 1000:.2f} ms, {refreshes} background refresh(es)")
+    print(f"  burst of {2 * args.calls} calls for one consumer: {burst_queries} query, "
+          f"{coalescing['generation']['coalesced']} generations and "
+          f"{coalescing['profile_fetch']['coalesced']} fetches coalesced")
+    print(f"  failing burst of {args.calls}: {failed_queries} query, "
+          f"{sum(r['status'] == 'error' for r in failed)} errors returned")
+    print(f"  generate_notifications_batch: {batch['count']} consumers, {batch['error_count']} errors "
+          f"in {batch_wall:.2f}s")
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time concurrent tool calls against a slow Snowflake connection")
+    parser.add_argument("--calls", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
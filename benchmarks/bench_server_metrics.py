@@ -0,0 +1,164 @@
+"""
+Benchmark: server latency histograms and Prometheus exposition (server_metrics.py).
+
+Drives the notification service against a slow fake warehouse (bench_server_concurrency.py)
+the way notification_server.call_tool does: every call timed per tool, responses serialized
+under the serialize phase. Checks that every phase (connect, query, decode, generate,
+serialize) is recorded, that the query p50 lands in the bucket holding the fake latency, that
+failed calls and per-consumer batch errors are counted, that the text exposition is well formed
+(cumulative buckets, +Inf == count), and that the HTTP endpoint and metrics file serve it.
+Reports the cost of one observation.
+
+Usage:
+  python benchmarks/bench_server_metrics.py --calls 64 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification_generator'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_server_concurrency import FAILING_ID, SlowConnection
+from connection_pool import SnowflakeConnectionPool
+from generation_memo import GenerationMemo
+from notification_generator import NotificationGenerator
+from notification_service import NotificationService, serialize_response
+from server_metrics import PHASES, LatencyMetrics, MetricsExporter
+from synthetic_profiles import make_profiles
+
+SAMPLE = re.compile(r'^([a-z_]+)(\{[^}]*\})? (\S+)$')
+
+
+def parse_exposition(text: str) -> dict:
+    """{(name, labels): value}; raises on any malformed line."""
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('#'):
+            assert re.match(r'^# (HELP|TYPE) [a-z_]+ .+$', line), line
+            continue
+        match = SAMPLE.match(line)
+        assert match, f"malformed sample line: {line!r}"
+        samples[(match.group(1), match.group(2) or '')] = float(match.group(3))
+    return samples
+
+
+def check_histograms(samples: dict) -> bool:
+    """Buckets are cumulative and non-decreasing, and +Inf equals _count, for every series."""
+    series = {}
+    for (name, labels), value in samples.items():
+        if name.endswith('_bucket'):
+            le = re.search(r'le="([^"]+)"', labels).group(1)
+            key = (name[:-len('_bucket')], re.sub(r',?le="[^"]+"', '', labels))
+            series.setdefault(key, []).append((float(le), value))
+    for (base, labels), buckets in series.items():
+        counts = [value for _, value in sorted(buckets)]
+        if counts != sorted(counts) or counts[-1] != samples[(base + '_count', labels)]:
+            return False
+    return bool(series)
+
+
+async def run(args) -> bool:
+    profiles = make_profiles(args.calls)
+    generator = NotificationGenerator()
+    pool = SnowflakeConnectionPool(lambda: SlowConnection(profiles, args.latency), min_size=0, max_size=4)
+    latency = LatencyMetrics()
+    service = NotificationService(generator, GenerationMemo(generator), pool, max_concurrency=4, table='FAKE',
+                                  latency=latency)
+
+    async def call_tool(name, coro_fn):
+        # What notification_server.call_tool / respond do around each tool
+        with latency.tool(name) as call:
+            result = await coro_fn()
+            if result["status"] != "success":
+                call.error()
+            call.error("consumer", result.get("error_count", 0))
+            with latency.phase("serialize"):
+                serialize_response(result)
+
+    await asyncio.gather(*(call_tool("generate_consumer_notifications",
+                                     lambda i=i: service.generate_consumer_notifications(i))
+                           for i in range(args.calls)))
+    await call_tool("generate_consumer_notifications", lambda: service.generate_consumer_notifications(FAILING_ID))
+    service.invalidate_profiles()
+    await call_tool("generate_notifications_batch",
+                    lambda: service.generate_notifications_batch(list(range(args.calls)) + ["abc", args.calls + 5]))
+    service.close()
+
+    snapshot = service.metrics()["latency"]
+    ok = True
+    for phase in PHASES:
+        if not snapshot["phases"].get(phase, {}).get("count"):
+            print(f"FAIL: no {phase} timings recorded")
+            ok = False
+    tool = snapshot["tools"]["generate_consumer_notifications"]
+    query = snapshot["phases"]["query"]
+    print(f"generate_consumer_notifications: {tool['count']} calls, p50 {tool['p50_ms']:.1f} ms, "
+          f"p99 {tool['p99_ms']:.1f} ms")
+    for phase in PHASES:
+        p = snapshot["phases"][phase]
+        print(f"  {phase:<10} n={p['count']:<4} p50 {p['p50_ms']:8.3f} ms  p99 {p['p99_ms']:8.3f} ms")
+    buckets = latency.buckets
+    upper = next(b for b in buckets if b >= args.latency)
+    lower = max([b for b in buckets if b < args.latency], default=0.0)
+    if not lower * 1000 <= query["p50_ms"] <= upper * 1000 * 1.5:
+        print(f"FAIL: query p50 {query['p50_ms']} ms is not near the fake latency {1000 * args.latency} ms")
+        ok = False
+    errors = snapshot["errors"]
+    expected_errors = {"generate_consumer_notifications": {"error_response": 1},
+                       "generate_notifications_batch": {"consumer": 2}}
+    if errors != expected_errors:
+        print(f"FAIL: error counters {errors} != {expected_errors}")
+        ok = False
+
+    text = latency.render_prometheus()
+    samples = parse_exposition(text)
+    if not check_histograms(samples):
+        print("FAIL: exposition histograms are not cumulative / consistent")
+        ok = False
+    key = ('notification_tool_errors_total', '{error="consumer",tool="generate_notifications_batch"}')
+    if samples.get(key) != 2:
+        print(f"FAIL: missing or wrong {key}")
+        ok = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "metrics.prom")
+        exporter = MetricsExporter(latency, port=0, path=path, interval=0.05).start()
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics", timeout=5) as response:
+                served = response.read().decode('utf-8')
+                content_type = response.headers["Content-Type"]
+            time.sleep(0.2)
+        finally:
+            exporter.close()
+        with open(path, encoding='utf-8') as f:
+            written = f.read()
+    if served != text or written != text or not content_type.startswith("text/plain; version=0.0.4"):
+        print("FAIL: HTTP endpoint or metrics file differs from render_prometheus()")
+        ok = False
+    print(f"exposition: {len(samples)} samples, served over HTTP and written to file")
+
+    n = 200_000
+    start = time.perf_counter()
+    for _ in range(n):
+        latency.observe_phase("decode", 0.0001)
+    print(f"observe cost: {1e9 * (time.perf_counter() - start) / n:.0f} ns")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark server latency metrics")
+    parser.add_argument("--calls", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake Snowflake query latency (s)")
+    args = parser.parse_args()
+    return 0 if asyncio.run(run(args)) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Benchmark: notification_validation.py vs the previous per-word validate_notification.
+
+Loads the title/body (and localized title/body) columns of the example CSVs and scales them up.
+Every row must give the same result as the previous implementation (kept below as
+reference_validate), as must seeded adversarial strings: banned words in mixed case, overlapping
+("breakfastempting"), next to non-ASCII letters that case-fold to ASCII, and over the length
+limits. Then times a row-by-row audit with each validator and validate_frame over the whole
+frame, both on the scaled examples (repeated copy) and with every row made distinct.
+
+Usage:
+  python benchmarks/bench_validation.py --rows 500000
+"""
+
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+from typing import Dict
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification_generator'))
+
+from notification_validation import (HYPERBOLIC_WORDS, ISSUES, MEAL_TIME_WORDS, issue_codes, validate_frame,
+                                     validate_notification)
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'examples')
+COLUMN_PAIRS = [("title", "body"), ("title_localized", "body_localized")]
+
+
+def reference_validate(title: str, body: str) -> Dict:
+    """validate_notification before notification_validation.py."""
+    issues = []
+
+    if len(title) >= 35:
+        issues.append(f"Title too long: {len(title)}/35 characters")
+    if len(body) > 140:
+        issues.append(f"Body too long: {len(body)}/140 characters")
+
+    if '!' in title or '!' in body:
+        issues.append("Contains exclamation points")
+    if title and title[-1] in '.,:;' and title[-1] != '?':
+        issues.append("Title has end punctuation")
+    if '#' in title or '#' in body:
+        issues.append("Contains hashtags")
+    if 'DoorDash' in title or 'DoorDash' in body:
+        issues.append("Mentions DoorDash")
+
+    hyperbolic = ['mouthwatering', 'scrumptious', 'tantalizing', 'tempting', 'indulge', 'savor']
+    if any(word in title.lower() or word in body.lower() for word in hyperbolic):
+        issues.append("Contains overly salesy language")
+
+    meal_times = ['breakfast', 'brunch', 'lunch', 'dinner']
+    if any(meal in title.lower() or meal in body.lower() for meal in meal_times):
+        issues.append("Infers meal time")
+
+    if 'authentic' in title.lower() or 'authentic' in body.lower():
+        issues.append("Uses 'authentic' descriptor")
+
+    return {
+        "is_valid": len(issues) == 0,
+        "title_length": len(title),
+        "body_length": len(body),
+        "issues": issues
+    }
+
+
+def load_examples() -> pd.DataFrame:
+    frames = []
+    for path in sorted(glob.glob(os.path.join(EXAMPLES, 'notifications_*.csv'))):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        for title, body in COLUMN_PAIRS:
+            if title in df.columns:
+                frames.append(df[[title, body]].set_axis(["title", "body"], axis=1))
+    return pd.concat(frames, ignore_index=True)
+
+
+def adversarial(count: int, seed: int = 7) -> pd.DataFrame:
+    rng = random.Random(seed)
+    words = list(HYPERBOLIC_WORDS + MEAL_TIME_WORDS) + ['authentic', 'DoorDash', 'doordash', 'Doordash']
+    fillers = ['Tacos', ' ', 'near you', '!', '#', '.', ',', '?', ':', ';', 'Ké', 'K', 'ſ', 'İ',
+               'é', '🍜', 'savory', 'breakfastempting', 'lunchauthentic', 'DINNER', 'Scʀumptious']
+
+    def text(max_parts: int) -> str:
+        parts = []
+        for _ in range(rng.randint(0, max_parts)):
+            part = rng.choice(words) if rng.random() < 0.3 else rng.choice(fillers)
+            # Random case per character, sometimes the Kelvin sign / long s / dotted I instead
+            part = ''.join(rng.choice([c.lower(), c.upper(), c]) for c in part)
+            part = part.replace('k', rng.choice(['k', 'K'])).replace('s', rng.choice(['s', 'ſ']))
+            part = part.replace('I', rng.choice(['I', 'İ']))
+            parts.append(part)
+        return ''.join(parts)
+
+    return pd.DataFrame({"title": [text(6) for _ in range(count)], "body": [text(30) for _ in range(count)]})
+
+
+def scale(df: pd.DataFrame, rows: int, distinct: bool) -> pd.DataFrame:
+    scaled = df.iloc[[i % len(df) for i in range(rows)]].reset_index(drop=True)
+    if distinct:
+        # A row number in each body keeps the rules' outcome but defeats per-distinct-value reuse
+        scaled["body"] = scaled["body"] + pd.Series([f" {i}" for i in range(rows)])
+    return scaled
+
+
+def best_time(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def check(df: pd.DataFrame, label: str) -> bool:
+    ok = True
+    expected = [reference_validate(t, b) for t, b in zip(df["title"], df["body"])]
+    actual = [validate_notification(t, b) for t, b in zip(df["title"], df["body"])]
+    mismatches = [i for i, (e, a) in enumerate(zip(expected, actual)) if e != a]
+    if mismatches:
+        i = mismatches[0]
+        print(f"FAIL ({label}): {len(mismatches)} rows differ, e.g. {df.iloc[i].tolist()!r}: "
+              f"{expected[i]} != {actual[i]}")
+        ok = False
+    # Message -> code (length messages by their prefix)
+    codes = {message.split(':')[0]: code for code, message in ISSUES.values()}
+    frame = validate_frame(df)
+    if (frame["is_valid"].tolist() != [e["is_valid"] for e in expected]
+            or frame["issue_codes"].tolist() != [';'.join(codes[m.split(':')[0]] for m in e["issues"]) for e in expected]
+            or [issue_codes(int(mask)) for mask in frame["issues"]] != [c.split(';') if c else [] for c in frame["issue_codes"]]
+            or frame["title_length"].tolist() != [e["title_length"] for e in expected]
+            or frame["body_length"].tolist() != [e["body_length"] for e in expected]):
+        print(f"FAIL ({label}): validate_frame disagrees with validate_notification")
+        ok = False
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the compiled notification validator")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--adversarial", type=int, default=50_000)
+    args = parser.parse_args()
+
+    examples = load_examples()
+    ok = check(examples, "examples") and check(adversarial(args.adversarial), "adversarial")
+    flagged = int((~validate_frame(examples)["is_valid"]).sum())
+    print(f"{len(examples):,} example rows ({flagged} flagged) and {args.adversarial:,} adversarial rows: "
+          f"{'identical to the previous validator' if ok else 'MISMATCH'}")
+
+    for distinct in (False, True):
+        df = scale(examples, args.rows, distinct)
+        titles, bodies = df["title"].tolist(), df["body"].tolist()
+        ref_s, _ = best_time(lambda: [reference_validate(t, b) for t, b in zip(titles, bodies)], repeat=1)
+        new_s, _ = best_time(lambda: [validate_notification(t, b) for t, b in zip(titles, bodies)], repeat=1)
+        frame_s, _ = best_time(lambda: validate_frame(df))
+        n = len(df)
+        print(f"{n:,} rows ({'all distinct' if distinct else 'repeated examples'}):")
+        print(f"  per-word validate_notification  {ref_s:7.3f}s  {n / ref_s:>12,.0f} rows/s")
+        print(f"  new validate_notification       {new_s:7.3f}s  {n / new_s:>12,.0f} rows/s  ({ref_s / new_s:.1f}x)")
+        print(f"  validate_frame                  {frame_s:7.3f}s  {n / frame_s:>12,.0f} rows/s  ({ref_s / frame_s:.1f}x)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,12 @@
+"""
+Peak memory of the current process, for benchmarks that run each mode in a fresh subprocess.
+"""
+
+
+def peak_rss_mb() -> float:
+    # VmHWM is per process image; ru_maxrss would carry over the parent's peak across exec
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
@@ -0,0 +1,177 @@
+"""
+Seeded synthetic GenAI profiles for offline benchmarks.
+
+Profiles follow the shape of PRODDB.ML.GENAI_CX_PROFILE_SHADOW.PROFILE so they can be fed
+straight into NotificationGenerator without Snowflake.
+"""
+
+import random
+from typing import Dict, Iterator, List, Set
+
+CUISINES = [
+    "Vietnamese (Pho and beef noodle soups)",
+    "Chinese (Sichuan, Cantonese, Hunan)",
+    "Thai (spicy stir-fries and soups)",
+    "American (coffee and breakfast items)",
+    "Mexican (tacos and burritos)",
+    "Latin American",
+    "Italian (pizza and pasta)",
+    "Japanese (sushi and ramen)",
+    "Indian (curries and biryani)",
+    "Korean (bibimbap and fried chicken)",
+    "Mediterranean (gyros and falafel)",
+    "Greek",
+    "Hawaiian (poke)",
+]
+
+FOODS = [
+    "Noodle soups",
+    "rice bowls",
+    "salads",
+    "customized breakfast sandwiches",
+    "pizza",
+    "burgers",
+    "sushi rolls",
+    "ramen",
+    "pho",
+    "poke bowls",
+    "healthy wraps",
+    "fried rice",
+]
+
+TASTES = [
+    "Bold, spicy and savory flavors",
+    "Mild spicy with a preference for balanced sauces",
+    "Sweet and savory",
+    "Comforting, mild flavors",
+    "Fresh and light",
+]
+
+DIETARY = [
+    "none: no consistent exclusion pattern is evident",
+    "none",
+    "no preference",
+    "vegetarian",
+    "vegan",
+    "pescatarian",
+    "vegetarian leaning with occasional fish",
+    "",
+]
+
+PRICE = [
+    "Balanced Spender: typical order subtotals around $23-28 with 16% of orders using promotions",
+    "Value Seeker: frequently orders with promotions",
+    "Budget conscious: 40% promo usage on recent orders",
+    "Premium: rarely uses promotions, 5% promo usage",
+    "Balanced Spender: 30% promo usage",
+    "",
+]
+
+
+DAYPARTS = ["early_morning", "breakfast", "lunch", "afternoon", "dinner", "late_night"]
+
+
+def make_profile(rng: random.Random, full: bool = False) -> Dict:
+    """
+    Build one synthetic profile dict.
+
+    With full=True the profile also carries the sections generation never reads (per-cuisine
+    detail, store affinity, ordering patterns, rationale text), sized like production profiles.
+    """
+    profile = {
+        "overall_profile": {
+            "cuisine_preferences": ", ".join(rng.sample(CUISINES, rng.randint(1, 4))),
+            "food_preferences": ", ".join(rng.sample(FOODS, rng.randint(1, 4))),
+            "taste_preference": rng.choice(TASTES),
+            "dietary_preferences": {"preferred_dietary_preference": rng.choice(DIETARY)},
+            "price_sensitivity": rng.choice(PRICE),
+        }
+    }
+    if full:
+        overall = profile["overall_profile"]
+        overall["dietary_preferences"]["strict_dietary_preference"] = "none"
+        overall["summary"] = " ".join(rng.choice(FOODS + TASTES) for _ in range(40))
+        profile["cuisine_profiles"] = {
+            cuisine: {
+                "affinity": round(rng.random(), 3),
+                "orders_90d": rng.randint(0, 40),
+                "top_items": rng.sample(FOODS, 5),
+                "rationale": " ".join(rng.choice(TASTES) for _ in range(12)),
+            }
+            for cuisine in rng.sample(CUISINES, rng.randint(4, 10))
+        }
+        profile["store_affinity"] = [
+            {"store_id": rng.randint(1, 10**7), "orders": rng.randint(1, 30), "avg_subtotal": round(rng.uniform(8, 80), 2),
+             "last_order_date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"}
+            for _ in range(rng.randint(10, 50))
+        ]
+        profile["ordering_patterns"] = {
+            "dayparts": {daypart: round(rng.random(), 3) for daypart in DAYPARTS},
+            "weekday_share": round(rng.random(), 3),
+            "notes": " ".join(rng.choice(PRICE) for _ in range(6)),
+        }
+    return profile
+
+
+def iter_profiles(count: int, seed: int = 7, full: bool = False) -> Iterator[Dict]:
+    """Yield `count` profiles from a seeded generator (same seed, same profiles)."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield make_profile(rng, full)
+
+
+def make_profiles(count: int, seed: int = 7, full: bool = False) -> List[Dict]:
+    return list(iter_profiles(count, seed, full))
+
+
+def branch_profiles(count: int, seed: int = 7) -> List[Dict]:
+    """
+    `count` profiles that exercise every generation branch, then random ones.
+
+    The first profiles put each rule trigger term (taken from the compiled rules, so new rules
+    are covered automatically) into its field, paired in turn with every dietary, taste and
+    price variant: each cuisine/food rule, each dietary guardrail, the mild-spicy guardrail and
+    both sides of the value-conscious check. Requires notification_generator on sys.path.
+    """
+    from notification_rules import DEFAULT_RULES
+
+    rng = random.Random(seed)
+    terms = [(field, term) for rule in DEFAULT_RULES.rules
+             for field, field_terms in (rule.get("triggers") or {}).items() for term in field_terms]
+    cases = max(len(terms), len(DIETARY), len(TASTES), len(PRICE))
+    profiles = []
+    for i in range(min(count, cases)):
+        field, term = terms[i % len(terms)]
+        profile = make_profile(rng)
+        overall = profile["overall_profile"]
+        overall[field] = f"{overall[field]}, {term.title()}" if field != "taste_preference" else term.title()
+        overall["dietary_preferences"]["preferred_dietary_preference"] = DIETARY[i % len(DIETARY)]
+        if field != "taste_preference":
+            overall["taste_preference"] = TASTES[i % len(TASTES)]
+        overall["price_sensitivity"] = PRICE[i % len(PRICE)]
+        profiles.append(profile)
+    profiles.extend(make_profile(rng) for _ in range(count - len(profiles)))
+    return profiles
+
+
+def uncovered_branches(generator, profiles: List[Dict]) -> Set[str]:
+    """Branches of generation that none of the profiles reach (empty when fully covered)."""
+    from guardrails import DIET_PESCATARIAN, DIET_VEGAN, DIET_VEGETARIAN, TASTE_MILD_SPICY, profile_mask
+
+    missing = {f"rule:{i}:{rule['keyword']}" for i, rule in enumerate(generator.rules.rules)}
+    missing |= {"guardrail:vegetarian", "guardrail:vegan", "guardrail:pescatarian", "guardrail:mild_spicy",
+                "guardrail:none", "price:value_conscious", "price:not_value_conscious"}
+    bits = {DIET_VEGETARIAN: "vegetarian", DIET_VEGAN: "vegan", DIET_PESCATARIAN: "pescatarian",
+            TASTE_MILD_SPICY: "mild_spicy"}
+    for profile in profiles:
+        cuisine, food, taste, dietary, price = generator.extract_profile_fields(profile)
+        is_value = generator.is_value_conscious(price)
+        fired = generator.rules.fire({"cuisine_preferences": cuisine.lower(), "food_preferences": food.lower(),
+                                      "taste_preference": taste.lower()}, is_value)
+        missing -= {f"rule:{i}:{generator.rules.rules[i]['keyword']}" for i in fired}
+        mask = profile_mask(dietary, taste)
+        missing -= {f"guardrail:{name}" for bit, name in bits.items() if mask & bit}
+        if not mask:
+            missing.discard("guardrail:none")
+        missing.discard("price:value_conscious" if is_value else "price:not_value_conscious")
+    return missing
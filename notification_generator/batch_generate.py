@@ -0,0 +1,585 @@
+"""
+Streaming bulk notification generation: Snowflake (or a columnar snapshot) -> CSV/Parquet.
+
+Profiles are streamed from Snowflake in chunks (fetchmany), generated per chunk with
+NotificationGenerator.generate_frame and appended to the output, so memory stays flat
+regardless of audience size. With --workers N, chunks are sharded across a process pool;
+output order stays deterministic and a checkpoint manifest is written after each committed
+chunk, so an interrupted run continues with --resume instead of starting over.
+
+With --snapshot, profiles come from a columnar snapshot (columnar_profiles.py) instead: each
+worker memory-maps the file and reads its row ranges directly, so no JSON is parsed and chunks
+aren't pickled across processes.
+
+Usage:
+  python batch_generate.py --consumer-ids ../examples/consumer_ids.csv --output notifications.csv
+  python batch_generate.py --where "CONSUMER_ID % 100 = 7" --output notifications_parquet/ --format parquet
+  python batch_generate.py --all --output notifications.csv --workers 8 --chunk-size 20000
+  python batch_generate.py --all --output notifications.csv --workers 8 --chunk-size 20000 --resume
+  python batch_generate.py --snapshot profiles.arrow --output notifications.csv --workers 8
+  python batch_generate.py --snapshot profiles.arrow --output notifications.csv --stats generator_stats.json
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(__file__))
+from connection_pool import get_snowflake_connection
+from generator_stats import GeneratorStats
+from notification_generator import FRAME_PROFILE_COLUMNS, NotificationGenerator
+from notification_rules import DEFAULT_RULES
+from profile_features import decode_profile
+from profile_queries import DEFAULT_PROFILE_TABLE, InvalidConsumerId, validate_consumer_id, validate_table_name
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("notification-batch")
+
+DEFAULT_TABLE = DEFAULT_PROFILE_TABLE
+DEFAULT_CHUNK_SIZE = 5000
+
+# Same layout as examples/notifications_with_pricing.csv
+OUTPUT_COLUMNS = [
+    "consumer_id",
+    "rank",
+    "score",
+    "title",
+    "body",
+    "keyword",
+    "url",
+    "title_length",
+    "body_length",
+    "cuisines_preference",
+    "foods_preference",
+    "taste_preference",
+    "dietary_preference",
+    "price_sensitivity",
+    "promo_usage_pct",
+    "is_value_conscious",
+]
+
+
+def read_consumer_ids(path: str) -> Iterator[str]:
+    """Yield consumer ids from a CSV with a CONSUMER_ID column (e.g. examples/consumer_ids.csv)."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        column = next((c for c in reader.fieldnames or [] if c.strip().upper() == 'CONSUMER_ID'), None)
+        if column is None:
+            raise ValueError(f"{path} has no CONSUMER_ID column")
+        for row in reader:
+            value = (row[column] or '').strip()
+            if value:
+                # Malformed ids stop the run instead of reaching the warehouse
+                validate_consumer_id(value)
+                yield value
+
+
+def _batched(values: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for value in values:
+        batch.append(value)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Chunk sources yield (rows, position): rows are (CONSUMER_ID, PROFILE) tuples (or a
+# SnapshotSlice) and position is the checkpoint state needed to restart right after this chunk.
+
+
+class SnapshotSlice(NamedTuple):
+    """Rows [start, stop) of a columnar snapshot; workers read them from their own mapping."""
+    path: str
+    start: int
+    stop: int
+
+
+def _id_key(consumer_id):
+    """Comparable form of a consumer id, whether read from a CSV (str) or the warehouse (int)."""
+    try:
+        return validate_consumer_id(consumer_id)
+    except InvalidConsumerId:
+        return str(consumer_id).strip()
+
+
+def stream_profiles_by_ids(conn, table: str, consumer_ids: Iterable[str], chunk_size: int,
+                           skip_ids: int = 0) -> Iterator[Tuple[List[Tuple], Dict]]:
+    """
+    One bind-parameterized IN query per chunk of ids; resumes by skipping already-consumed ids.
+
+    An IN query returns rows in whatever order the warehouse likes, so each chunk is put back
+    in the order of its ids to keep the output deterministic; ids without a row (and rows for
+    ids not asked for) drop out.
+    """
+    consumed = 0
+    ids_iter = iter(consumer_ids)
+    for _ in range(skip_ids):
+        if next(ids_iter, None) is None:
+            break
+        consumed += 1
+
+    cursor = conn.cursor()
+    try:
+        for ids in _batched(ids_iter, chunk_size):
+            placeholders = ', '.join(['%s'] * len(ids))
+            cursor.execute(
+                f"SELECT CONSUMER_ID, PROFILE FROM {table} WHERE CONSUMER_ID IN ({placeholders})",
+                ids,
+            )
+            consumed += len(ids)
+            position = {_id_key(consumer_id): i for i, consumer_id in enumerate(ids)}
+            rows = [row for row in cursor.fetchall() if _id_key(row[0]) in position]
+            rows.sort(key=lambda row: position[_id_key(row[0])])
+            yield rows, {"ids_consumed": consumed}
+    finally:
+        cursor.close()
+
+
+def stream_profiles_by_query(conn, table: str, where: Optional[str], chunk_size: int,
+                             after_consumer_id=None) -> Iterator[Tuple[List[Tuple], Dict]]:
+    """
+    Stream a whole table (optionally filtered by a SQL predicate) in fetchmany chunks.
+
+    Rows are ordered by CONSUMER_ID so a resumed run can continue after the last committed id.
+    """
+    predicates = []
+    params = []
+    if where:
+        predicates.append(f"({where})")
+    if after_consumer_id is not None:
+        predicates.append("CONSUMER_ID > %s")
+        params.append(after_consumer_id)
+    query = f"SELECT CONSUMER_ID, PROFILE FROM {table}"
+    if predicates:
+        query += " WHERE " + " AND ".join(predicates)
+    query += " ORDER BY CONSUMER_ID"
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params or None)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows, {"last_consumer_id": rows[-1][0]}
+    finally:
+        cursor.close()
+
+
+def stream_snapshot(path: str, chunk_size: int, offset: int = 0) -> Iterator[Tuple[SnapshotSlice, Dict]]:
+    """Row ranges of a columnar snapshot; resumes at the first uncommitted row."""
+    from columnar_profiles import ColumnarProfiles
+
+    snapshot = ColumnarProfiles(path)
+    total = len(snapshot)
+    snapshot.close()
+    for start in range(offset, total, chunk_size):
+        stop = min(start + chunk_size, total)
+        yield SnapshotSlice(path, start, stop), {"snapshot_offset": stop}
+
+
+def generate_chunk(generator: NotificationGenerator, rows: List[Tuple],
+                   min_score: int, max_count: int):
+    """Generate notifications for (consumer_id, profile_json) rows in the OUTPUT_COLUMNS layout."""
+    import pandas as pd
+
+    consumer_ids = []
+    features = []
+    for consumer_id, profile_json in rows:
+        consumer_ids.append(consumer_id)
+        # Only the overall_profile fields generation reads (FRAME_PROFILE_COLUMNS order)
+        features.append(decode_profile(profile_json))
+
+    profiles_df = pd.DataFrame(features, columns=FRAME_PROFILE_COLUMNS)
+    profiles_df.insert(0, "consumer_id", consumer_ids)
+    return generate_from_frame(generator, profiles_df, min_score, max_count)
+
+
+def _map_values(series, fn):
+    """fn(value or '') per row; once per distinct value for categorical columns."""
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Code -1 (missing) picks the trailing fn('')
+        lookup = np.array([fn(value) for value in series.cat.categories] + [fn('')])
+        return lookup[series.cat.codes.to_numpy()]
+    return [fn(value or '') for value in series]
+
+
+def generate_from_frame(generator: NotificationGenerator, profiles_df, min_score: int, max_count: int):
+    """
+    generate_chunk for a frame of consumer_id + FRAME_PROFILE_COLUMNS (categorical columns from
+    a columnar snapshot included) in the OUTPUT_COLUMNS layout.
+    """
+    import pandas as pd
+
+    notifications = generator.generate_frame(profiles_df, min_score, max_count)
+    notifications["title_length"] = notifications["title"].str.len()
+    notifications["body_length"] = notifications["body"].str.len()
+
+    consumer_columns = profiles_df[["consumer_id"] + FRAME_PROFILE_COLUMNS].drop_duplicates("consumer_id")
+    price = consumer_columns["price_sensitivity"]
+    consumer_columns["promo_usage_pct"] = _map_values(price, generator.extract_promo_usage)
+    consumer_columns["is_value_conscious"] = _map_values(price, generator.is_value_conscious)
+    for column in FRAME_PROFILE_COLUMNS:
+        if isinstance(consumer_columns[column].dtype, pd.CategoricalDtype):
+            # Missing snapshot fields read as '' like missing profile keys
+            consumer_columns[column] = consumer_columns[column].astype(object).fillna('')
+    consumer_columns = consumer_columns.rename(columns={
+        "cuisine_preferences": "cuisines_preference",
+        "food_preferences": "foods_preference",
+        "dietary": "dietary_preference",
+    })
+    merged = notifications.merge(consumer_columns, on="consumer_id", how="left", sort=False)
+    return merged[OUTPUT_COLUMNS]
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("consumer_id", pa.string()),
+        ("rank", pa.int64()),
+        ("score", pa.int64()),
+        ("title", pa.string()),
+        ("body", pa.string()),
+        ("keyword", pa.string()),
+        ("url", pa.string()),
+        ("title_length", pa.int64()),
+        ("body_length", pa.int64()),
+        ("cuisines_preference", pa.string()),
+        ("foods_preference", pa.string()),
+        ("taste_preference", pa.string()),
+        ("dietary_preference", pa.string()),
+        ("price_sensitivity", pa.string()),
+        ("promo_usage_pct", pa.float64()),
+        ("is_value_conscious", pa.bool_()),
+    ])
+
+
+def encode_chunk(df, output_format: str) -> bytes:
+    """Render a generated chunk to output bytes (CSV rows without header, or one Parquet file)."""
+    if output_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        df = df.assign(consumer_id=df["consumer_id"].astype(str))
+        buffer = io.BytesIO()
+        pq.write_table(pa.Table.from_pandas(df, schema=parquet_schema(), preserve_index=False),
+                       buffer, compression='zstd')
+        return buffer.getvalue()
+    return df.to_csv(header=False, index=False).encode('utf-8')
+
+
+class CsvSink:
+    """Appends encoded chunks to one CSV file; position() is the committed byte size."""
+
+    def __init__(self, path: str, resume_bytes: Optional[int] = None):
+        self.path = path
+        if resume_bytes is None:
+            self._file = open(path, 'wb')
+            self._file.write((','.join(OUTPUT_COLUMNS) + '\n').encode('utf-8'))
+        else:
+            # Drop anything written after the last committed chunk
+            self._file = open(path, 'r+b')
+            self._file.truncate(resume_bytes)
+            self._file.seek(resume_bytes)
+        self._file.flush()
+
+    def write(self, seq: int, payload: bytes):
+        self._file.write(payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def position(self) -> int:
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    """
+    Writes each encoded chunk as its own part file in a dataset directory
+    (read back with pandas.read_parquet(path)); position() is the number of parts.
+    """
+
+    def __init__(self, path: str, resume_parts: Optional[int] = None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._parts = resume_parts or 0
+        # Parts from a crashed run that were never committed
+        for name in os.listdir(path):
+            if name.startswith('part-') and name.endswith('.parquet') and int(name[5:-8]) >= self._parts:
+                os.remove(os.path.join(path, name))
+
+    def write(self, seq: int, payload: bytes):
+        final = os.path.join(self.path, f"part-{seq:06d}.parquet")
+        tmp = final + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp, final)
+        self._parts = seq + 1
+
+    def position(self) -> int:
+        return self._parts
+
+    def close(self):
+        pass
+
+
+def open_sink(path: str, output_format: str, resume_position: Optional[int] = None):
+    if output_format == 'parquet':
+        return ParquetSink(path, resume_position)
+    return CsvSink(path, resume_position)
+
+
+class Checkpoint:
+    """
+    JSON manifest next to the output, rewritten atomically after every committed chunk.
+
+    `params` identify the run (a resume with different params is refused); `state` records
+    how far the source and the output got.
+    """
+
+    def __init__(self, path: str, params: Dict, state: Optional[Dict] = None):
+        self.path = path
+        self.params = params
+        self.state = state or {
+            "chunks_committed": 0,
+            "consumers": 0,
+            "notifications": 0,
+            "sink_position": None,
+            "completed": False,
+        }
+
+    @classmethod
+    def load(cls, path: str, params: Dict) -> "Checkpoint":
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("params") != params:
+            raise ValueError(f"Checkpoint {path} was written for a different run: {data.get('params')}")
+        return cls(path, params, data["state"])
+
+    def commit(self, **updates):
+        self.state.update(updates)
+        self.state["updated_at"] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"params": self.params, "state": self.state}, f, indent=2, default=str)
+        os.replace(tmp, self.path)
+
+
+# --- Worker side: one generator per process, built by the pool initializer ---
+
+_WORKER_GENERATOR: Optional[NotificationGenerator] = None
+
+
+def _init_worker(stats: bool = False):
+    global _WORKER_GENERATOR
+    _WORKER_GENERATOR = NotificationGenerator()
+    if stats:
+        _WORKER_GENERATOR.enable_stats()
+
+
+def _take_stats(generator: NotificationGenerator) -> Optional[Dict]:
+    """The generator's stats since the last chunk (reset after reading), or None when off."""
+    stats = generator.stats
+    if stats is None:
+        return None
+    snapshot = stats.snapshot()
+    stats.reset()
+    return snapshot
+
+
+# Snapshots opened (memory-mapped) by this worker, by path
+_WORKER_SNAPSHOTS: Dict = {}
+
+
+def _process_chunk(consumer_ids: List, profile_jsons: List, min_score: int, max_count: int,
+                   output_format: str) -> Tuple[bytes, int, Optional[Dict]]:
+    """Generate and encode one chunk; chunks are shipped as two flat lists, not per-row dicts."""
+    generator = _WORKER_GENERATOR or NotificationGenerator()
+    df = generate_chunk(generator, list(zip(consumer_ids, profile_jsons)), min_score, max_count)
+    return encode_chunk(df, output_format), len(df), _take_stats(generator)
+
+
+def _process_snapshot_slice(path: str, start: int, stop: int, min_score: int, max_count: int,
+                            output_format: str) -> Tuple[bytes, int, Optional[Dict]]:
+    """Generate and encode rows [start, stop) of a columnar snapshot mapped by this process."""
+    from columnar_profiles import ColumnarProfiles
+
+    generator = _WORKER_GENERATOR or NotificationGenerator()
+    snapshot = _WORKER_SNAPSHOTS.get(path)
+    if snapshot is None:
+        snapshot = _WORKER_SNAPSHOTS[path] = ColumnarProfiles(path)
+    df = generate_from_frame(generator, snapshot.frame(start, stop), min_score, max_count)
+    return encode_chunk(df, output_format), len(df), _take_stats(generator)
+
+
+def _chunk_task(rows) -> Tuple[Callable, tuple, int]:
+    """(worker function, its chunk arguments, consumer count) for one chunk from a source."""
+    if isinstance(rows, SnapshotSlice):
+        return _process_snapshot_slice, tuple(rows), rows.stop - rows.start
+    return _process_chunk, ([r[0] for r in rows], [r[1] for r in rows]), len(rows)
+
+
+def run_batch(chunks: Iterable[Tuple[List[Tuple], Dict]], sink, output_format: str = 'csv',
+              min_score: int = 82, max_count: int = 10, workers: int = 1,
+              checkpoint: Optional[Checkpoint] = None, stats: bool = False) -> Dict:
+    """
+    Generate and write every chunk in source order.
+
+    With workers > 1, up to 2 * workers chunks are in flight; results are committed strictly in
+    submission order, so the output is identical to a single-process run. With stats, every
+    worker records generator stats and the merged snapshot is returned as "generator_stats".
+    """
+    state = checkpoint.state if checkpoint else {"chunks_committed": 0, "consumers": 0, "notifications": 0}
+    seq = state["chunks_committed"]
+    consumers = state["consumers"]
+    written = state["notifications"]
+    start = time.perf_counter()
+    start_consumers = consumers
+    start_written = written
+    merged_stats = GeneratorStats(DEFAULT_RULES.rules) if stats else None
+
+    def commit(payload: bytes, n_notifications: int, n_consumers: int, position: Dict,
+               chunk_stats: Optional[Dict]):
+        nonlocal seq, consumers, written
+        if chunk_stats:
+            merged_stats.merge(chunk_stats)
+        sink.write(seq, payload)
+        seq += 1
+        consumers += n_consumers
+        written += n_notifications
+        if checkpoint:
+            checkpoint.commit(chunks_committed=seq, consumers=consumers, notifications=written,
+                              sink_position=sink.position(), **position)
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"chunk {seq}: {consumers:,} consumers -> {written:,} notifications "
+            f"({(consumers - start_consumers) / elapsed:,.0f} consumers/s, "
+            f"{(written - start_written) / elapsed:,.0f} rows/s)"
+        )
+
+    if workers <= 1:
+        _init_worker(stats)
+        for rows, position in chunks:
+            process, chunk_args, n_consumers = _chunk_task(rows)
+            payload, n, chunk_stats = process(*chunk_args, min_score, max_count, output_format)
+            commit(payload, n, n_consumers, position, chunk_stats)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(stats,)) as executor:
+            pending = deque()
+            for rows, position in chunks:
+                process, chunk_args, n_consumers = _chunk_task(rows)
+                future = executor.submit(process, *chunk_args, min_score, max_count, output_format)
+                pending.append((future, n_consumers, position))
+                if len(pending) >= 2 * workers:
+                    future, n_consumers, position = pending.popleft()
+                    payload, n, chunk_stats = future.result()
+                    commit(payload, n, n_consumers, position, chunk_stats)
+            while pending:
+                future, n_consumers, position = pending.popleft()
+                payload, n, chunk_stats = future.result()
+                commit(payload, n, n_consumers, position, chunk_stats)
+
+    if checkpoint:
+        checkpoint.commit(completed=True)
+    totals = {"consumers": consumers, "notifications": written, "chunks": seq,
+              "seconds": time.perf_counter() - start}
+    if merged_stats is not None:
+        totals["generator_stats"] = merged_stats.snapshot()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate notifications for many consumers into CSV/Parquet")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--consumer-ids", help="CSV file with a CONSUMER_ID column")
+    source.add_argument("--where", help="SQL predicate on the profile table, e.g. \"CONSUMER_ID % 100 = 7\"")
+    source.add_argument("--all", action="store_true", help="Every consumer in the profile table")
+    source.add_argument("--snapshot", help="Columnar profile snapshot (columnar_profiles.py) instead of Snowflake")
+    parser.add_argument("--output", required=True,
+                        help="Output path: a .csv file, or a directory of part files for Parquet")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Override format inferred from --output")
+    parser.add_argument("--table", type=validate_table_name, default=os.getenv('GENAI_PROFILE_TABLE', DEFAULT_TABLE))
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--min-score", type=int, default=82)
+    parser.add_argument("--max-count", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1, help="Generator processes (default: 1)")
+    parser.add_argument("--checkpoint", help="Checkpoint manifest path (default: <output>.checkpoint.json)")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint manifest")
+    parser.add_argument("--stats", metavar="PATH",
+                        help="Record generator stage timings, filter counts and rule hits; write them as JSON to PATH")
+    args = parser.parse_args()
+
+    output = args.output.rstrip('/')
+    output_format = args.format or ('parquet' if output.endswith('.parquet') else 'csv')
+    checkpoint_path = args.checkpoint or output + '.checkpoint.json'
+    params = {
+        "source": {"consumer_ids": args.consumer_ids, "where": args.where, "all": args.all,
+                   "snapshot": args.snapshot},
+        "table": args.table,
+        "output": output,
+        "format": output_format,
+        "chunk_size": args.chunk_size,
+        "min_score": args.min_score,
+        "max_count": args.max_count,
+    }
+
+    if args.resume:
+        checkpoint = Checkpoint.load(checkpoint_path, params)
+        if checkpoint.state.get("completed"):
+            logger.info(f"{checkpoint_path} says this run already completed, nothing to do")
+            return
+        logger.info(f"Resuming after chunk {checkpoint.state['chunks_committed']} "
+                    f"({checkpoint.state['consumers']:,} consumers committed)")
+    else:
+        checkpoint = Checkpoint(checkpoint_path, params)
+        checkpoint.commit()
+
+    conn = None if args.snapshot else get_snowflake_connection()
+    try:
+        if args.snapshot:
+            chunks = stream_snapshot(args.snapshot, args.chunk_size, checkpoint.state.get("snapshot_offset", 0))
+        elif args.consumer_ids:
+            chunks = stream_profiles_by_ids(conn, args.table, read_consumer_ids(args.consumer_ids),
+                                            args.chunk_size, checkpoint.state.get("ids_consumed", 0))
+        else:
+            chunks = stream_profiles_by_query(conn, args.table, args.where, args.chunk_size,
+                                              checkpoint.state.get("last_consumer_id"))
+
+        sink = open_sink(output, output_format, checkpoint.state["sink_position"] if args.resume else None)
+        try:
+            totals = run_batch(chunks, sink, output_format, args.min_score, args.max_count,
+                               args.workers, checkpoint, stats=bool(args.stats))
+        finally:
+            sink.close()
+    finally:
+        if conn is not None:
+            conn.close()
+
+    logger.info(
+        f"Done: {totals['consumers']:,} consumers, {totals['notifications']:,} notifications "
+        f"in {totals['seconds']:.1f}s -> {output}"
+    )
+    if args.stats:
+        with open(args.stats, 'w', encoding='utf-8') as f:
+            json.dump(totals["generator_stats"], f, indent=2)
+        logger.info(f"Generator stats (this run) -> {args.stats}")
+
+
+if __name__ == "__main__":
+    main()
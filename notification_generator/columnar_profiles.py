@@ -0,0 +1,251 @@
+"""
+Columnar profile snapshot: only the fields generation reads, as a memory-mappable Arrow file.
+
+Generation reads five fields of the PROFILE JSON (FRAME_PROFILE_COLUMNS); localization adds
+DD_USER_LOCALE and LANGUAGE. This snapshot stores just those, one typed column each, with every
+string column dictionary-encoded, in an uncompressed Arrow IPC file. Opening it memory-maps the
+file, so batch workers read it zero-copy and share the same page-cache pages across processes.
+Frames come out with categorical columns, and generate_frame matches trigger terms once per
+distinct value instead of once per consumer.
+
+  python columnar_profiles.py build --out profiles.arrow                    # from GENAI_PROFILE_TABLE
+  python columnar_profiles.py build --out profiles.arrow --locale-table PRODDB.PUBLIC.CX_LOCALES
+  python columnar_profiles.py build --out profiles.arrow --from-snapshot profiles.db --locales-csv locales.csv
+
+Then: python batch_generate.py --snapshot profiles.arrow --output notifications.csv --workers 8
+"""
+
+import argparse
+import csv
+import logging
+import os
+import time
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from connection_pool import get_snowflake_connection
+from notification_generator import FRAME_PROFILE_COLUMNS, NotificationGenerator
+from profile_features import decode_profile
+from profile_queries import ProfileQueries, validate_consumer_id, validate_table_name
+
+logger = logging.getLogger("notification-batch")
+
+LOCALE_COLUMNS = ["dd_user_locale", "language"]
+# Column layout of the snapshot, in file order
+SNAPSHOT_COLUMNS = ["consumer_id"] + FRAME_PROFILE_COLUMNS + LOCALE_COLUMNS
+SNAPSHOT_FORMAT = b"notification-profile-columns/1"
+# Rows converted to Arrow at a time while building, and rows per record batch in the file
+BUILD_BATCH_SIZE = 50000
+RECORD_BATCH_ROWS = 65536
+
+# JSON paths of FRAME_PROFILE_COLUMNS inside PROFILE, extracted server-side when building from Snowflake
+PROFILE_PATHS = {
+    "cuisine_preferences": "overall_profile:cuisine_preferences",
+    "food_preferences": "overall_profile:food_preferences",
+    "taste_preference": "overall_profile:taste_preference",
+    "dietary": "overall_profile:dietary_preferences:preferred_dietary_preference",
+    "price_sensitivity": "overall_profile:price_sensitivity",
+}
+
+
+def snapshot_schema():
+    import pyarrow as pa
+
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema(
+        [("consumer_id", pa.int64())] + [(column, dictionary) for column in SNAPSHOT_COLUMNS[1:]],
+        metadata={b"format": SNAPSHOT_FORMAT},
+    )
+
+
+def write_columnar_snapshot(records: Iterable[tuple], path: str) -> int:
+    """
+    Write records (tuples in SNAPSHOT_COLUMNS order) to an Arrow IPC file; returns the row count.
+
+    Strings are collected as Arrow arrays (not Python objects) and dictionary-encoded once at the
+    end, so every record batch shares one dictionary per column. Written to a temp file and
+    renamed into place.
+    """
+    import pyarrow as pa
+
+    schema = snapshot_schema()
+    chunks = {column: [] for column in SNAPSHOT_COLUMNS}
+    count = 0
+    batch = []
+
+    def flush():
+        for column, values in zip(SNAPSHOT_COLUMNS, zip(*batch)):
+            chunks[column].append(pa.array(values, pa.int64() if column == "consumer_id" else pa.string()))
+
+    for record in records:
+        batch.append(record)
+        if len(batch) >= BUILD_BATCH_SIZE:
+            flush()
+            count += len(batch)
+            batch = []
+    if batch:
+        flush()
+        count += len(batch)
+
+    arrays = []
+    for column in SNAPSHOT_COLUMNS:
+        column_type = pa.int64() if column == "consumer_id" else pa.string()
+        combined = pa.chunked_array(chunks[column], column_type).combine_chunks()
+        chunks[column] = None
+        arrays.append(combined if column == "consumer_id" else combined.dictionary_encode())
+    table = pa.Table.from_arrays(arrays, schema=schema)
+
+    path = os.path.expanduser(path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+            writer.write_table(table, max_chunksize=RECORD_BATCH_ROWS)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def profile_records(rows: Iterable[tuple], locales: Optional[Dict[int, Tuple]] = None) -> Iterator[tuple]:
+    """Snapshot records from (CONSUMER_ID, PROFILE) rows, with locales by consumer id if given."""
+    locales = locales or {}
+    for consumer_id, profile in rows:
+        consumer_id = validate_consumer_id(consumer_id)
+        features = decode_profile(profile or {})
+        yield (consumer_id,) + tuple(features) + tuple(locales.get(consumer_id, (None, None)))
+
+
+def snapshot_query(table: Optional[str] = None, locale_table: Optional[str] = None) -> str:
+    """Snowflake query returning snapshot records; the JSON paths are extracted in the warehouse."""
+    table = ProfileQueries(table).table
+    # Parse each PROFILE once (it may be a VARIANT or JSON text), then pick the paths
+    parsed = f"(SELECT CONSUMER_ID, TRY_PARSE_JSON(TO_VARCHAR(PROFILE)) AS J FROM {table})"
+    columns = ["p.CONSUMER_ID"] + [f"p.J:{PROFILE_PATHS[column]}::STRING" for column in FRAME_PROFILE_COLUMNS]
+    if locale_table:
+        locale_table = validate_table_name(locale_table)
+        columns += ["l.DD_USER_LOCALE", "l.LANGUAGE"]
+        joins = f" LEFT JOIN {locale_table} l ON l.CONSUMER_ID = p.CONSUMER_ID"
+    else:
+        columns += ["NULL", "NULL"]
+        joins = ""
+    return f"SELECT {', '.join(columns)} FROM {parsed} p{joins} ORDER BY p.CONSUMER_ID"
+
+
+def iter_snowflake_records(conn, table: Optional[str] = None, locale_table: Optional[str] = None) -> Iterator[tuple]:
+    cursor = conn.cursor()
+    try:
+        cursor.execute(snapshot_query(table, locale_table))
+        while True:
+            rows = cursor.fetchmany(BUILD_BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield tuple(row)
+    finally:
+        cursor.close()
+
+
+def read_locales_csv(path: str) -> Dict[int, Tuple]:
+    """(dd_user_locale, language) by consumer id from a CSV with CONSUMER_ID, DD_USER_LOCALE, LANGUAGE."""
+    locales = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        columns = {name.upper(): name for name in reader.fieldnames or []}
+        if 'CONSUMER_ID' not in columns:
+            raise ValueError(f"{path} has no CONSUMER_ID column (found: {reader.fieldnames})")
+        for row in reader:
+            locales[validate_consumer_id(row[columns['CONSUMER_ID']])] = (
+                row.get(columns.get('DD_USER_LOCALE', ''), None) or None,
+                row.get(columns.get('LANGUAGE', ''), None) or None,
+            )
+    return locales
+
+
+class ColumnarProfiles:
+    """A memory-mapped columnar snapshot; frames feed NotificationGenerator.generate_frame directly."""
+
+    def __init__(self, path: str):
+        import pyarrow as pa
+
+        self.path = os.path.expanduser(path)
+        self._source = pa.memory_map(self.path, 'r')
+        reader = pa.ipc.open_file(self._source)
+        if (reader.schema.metadata or {}).get(b"format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{self.path} is not a columnar profile snapshot")
+        # Buffers point into the mapping: nothing is copied until a frame is converted
+        self.table = reader.read_all()
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def frame(self, start: int = 0, stop: Optional[int] = None):
+        """
+        Rows [start, stop) as a DataFrame (SNAPSHOT_COLUMNS, strings as categoricals).
+
+        Each string column is re-encoded with a dictionary of just the slice's values: the file's
+        dictionaries cover every row, and generate_frame evaluates once per category.
+        """
+        import pyarrow as pa
+
+        stop = len(self) if stop is None else min(stop, len(self))
+        table = self.table.slice(start, max(0, stop - start))
+        columns = [
+            column.cast(pa.string()).combine_chunks().dictionary_encode()
+            if pa.types.is_dictionary(column.type) else column
+            for column in table.columns
+        ]
+        return pa.Table.from_arrays(columns, names=table.column_names).to_pandas()
+
+    def iter_frames(self, batch_size: int = BUILD_BATCH_SIZE) -> Iterator:
+        for start in range(0, len(self), batch_size):
+            yield self.frame(start, start + batch_size)
+
+    def generate(self, generator: NotificationGenerator, min_score: int = 82, max_count: int = 10,
+                 batch_size: int = BUILD_BATCH_SIZE) -> Iterator:
+        """generate_frame output (FRAME_OUTPUT_COLUMNS) per batch of consumers."""
+        for frame in self.iter_frames(batch_size):
+            yield generator.generate_frame(frame, min_score, max_count)
+
+    def close(self):
+        self.table = None
+        self._source.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a columnar profile snapshot (Arrow IPC)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Extract generation fields into a snapshot file")
+    build.add_argument("--out", required=True, help="Snapshot file to write, e.g. profiles.arrow")
+    build.add_argument("--table", help="Profile table (default: GENAI_PROFILE_TABLE or the shadow table)")
+    build.add_argument("--locale-table", help="Table with CONSUMER_ID, DD_USER_LOCALE, LANGUAGE to join")
+    build.add_argument("--from-snapshot", help="Read profiles from a SQLite snapshot (profile_source.py) instead")
+    build.add_argument("--from-csv", help="Read profiles from a CONSUMER_ID,PROFILE CSV export instead")
+    build.add_argument("--locales-csv", help="CONSUMER_ID, DD_USER_LOCALE, LANGUAGE CSV (with --from-*)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    if args.from_snapshot or args.from_csv:
+        from profile_source import SnapshotProfileSource, iter_csv_profiles
+
+        locales = read_locales_csv(args.locales_csv) if args.locales_csv else None
+        if args.from_csv:
+            rows = iter_csv_profiles(args.from_csv)
+        else:
+            import sqlite3
+            conn = sqlite3.connect(f"file:{SnapshotProfileSource(args.from_snapshot).path}?mode=ro", uri=True)
+            rows = conn.execute("SELECT consumer_id, profile FROM profiles ORDER BY consumer_id")
+        count = write_columnar_snapshot(profile_records(rows, locales), args.out)
+    else:
+        conn = get_snowflake_connection()
+        try:
+            count = write_columnar_snapshot(iter_snowflake_records(conn, args.table, args.locale_table), args.out)
+        finally:
+            conn.close()
+    logger.info(f"Wrote {count:,} profiles to {args.out} ({os.path.getsize(args.out) / 2**20:.1f} MB) "
+                f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
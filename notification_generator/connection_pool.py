@@ -0,0 +1,368 @@
+"""
+Managed pool of authenticated Snowflake connections for the MCP server, and the one
+get_snowflake_connection factory every entry point uses to open them.
+
+Connections are created up front (min_size), handed out with acquire()/connection(), health
+checked when they have been idle for a while, evicted when idle past idle_timeout (down to
+min_size) and transparently replaced when the Snowflake session has expired.
+
+Eviction runs on acquire() and release(); the pool has no background thread, so a pool that sees
+no traffic at all keeps its expired connections until the next call (or evict_idle()).
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("notification-server.pool")
+
+# Snowflake error codes for expired / invalid sessions and tokens
+SESSION_EXPIRED_ERRNOS = {390111, 390112, 390114}
+
+
+def is_session_expired(error: Exception) -> bool:
+    if getattr(error, 'errno', None) in SESSION_EXPIRED_ERRNOS:
+        return True
+    message = str(error).lower()
+    return 'session' in message and ('expired' in message or 'no longer exists' in message)
+
+
+def get_snowflake_connection():
+    """
+    One authenticated Snowflake connection from the SNOWFLAKE_* settings (../.env is loaded first).
+
+    Shared by the server's pool, the batch runner, the snapshot builders and quick_start.
+    """
+    import snowflake.connector
+    from dotenv import load_dotenv
+
+    load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+    params = dict(
+        account=os.getenv('SNOWFLAKE_ACCOUNT'),
+        user=os.getenv('SNOWFLAKE_USER'),
+        authenticator=os.getenv('SNOWFLAKE_AUTHENTICATOR'),
+        warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
+        database=os.getenv('SNOWFLAKE_DATABASE'),
+        schema=os.getenv('SNOWFLAKE_SCHEMA'),
+        role=os.getenv('SNOWFLAKE_ROLE')
+    )
+    # Cache the SSO token so the pool can open/replace connections without another browser prompt
+    if (os.getenv('SNOWFLAKE_AUTHENTICATOR') or '').lower() == 'externalbrowser':
+        params['client_store_temporary_credential'] = True
+    return snowflake.connector.connect(**params)
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the acquire timeout."""
+
+
+class _PooledConnection:
+    __slots__ = ('conn', 'created_at', 'last_used', 'last_checked')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+        self.last_checked = now
+
+
+class SnowflakeConnectionPool:
+    """Thread-safe connection pool with min/max size, health checks and idle eviction."""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 4,
+        idle_timeout: float = 600.0,
+        health_check_interval: float = 60.0,
+        acquire_timeout: float = 30.0,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: List[_PooledConnection] = []
+        self._in_use: Dict[int, _PooledConnection] = {}
+        self._opening = 0
+        self._checking = 0  # taken from _idle, health check in progress
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # Metrics
+        self._acquires = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._health_check_failures = 0
+        self._reconnects = 0
+        self._peak_in_use = 0
+        self._busy_since = time.monotonic()
+        self._busy_seconds = 0.0  # integral of in-use connections over time
+        self._started_at = time.monotonic()
+
+    @classmethod
+    def from_env(cls, connect: Callable[[], Any]) -> "SnowflakeConnectionPool":
+        return cls(
+            connect,
+            min_size=int(os.getenv('SNOWFLAKE_POOL_MIN', '1')),
+            max_size=int(os.getenv('SNOWFLAKE_POOL_MAX', '4')),
+            idle_timeout=float(os.getenv('SNOWFLAKE_POOL_IDLE_TIMEOUT', '600')),
+            health_check_interval=float(os.getenv('SNOWFLAKE_POOL_HEALTH_CHECK_INTERVAL', '60')),
+            acquire_timeout=float(os.getenv('SNOWFLAKE_POOL_ACQUIRE_TIMEOUT', '30')),
+        )
+
+    # --- lifecycle ---
+
+    def start(self):
+        """Open min_size connections now (so SSO happens at startup, not on the first tool call)."""
+        with self._cond:
+            missing = self.min_size - self._total()
+            self._opening += max(missing, 0)
+        for _ in range(max(missing, 0)):
+            pooled = self._open()
+            with self._cond:
+                self._opening -= 1
+                if pooled:
+                    self._idle.append(pooled)
+                self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for pooled in idle:
+            self._close_quietly(pooled)
+
+    # --- acquire / release ---
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Borrow a healthy connection, waiting up to `timeout` seconds when the pool is exhausted."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = time.monotonic()
+        waited = False
+        while True:
+            pooled = None
+            open_new = False
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                # Eviction lowers the pool size, so when it finds anything we never reach the wait below
+                evicted = self._take_expired_idle_locked()
+                if self._idle:
+                    pooled = self._idle.pop()
+                    # Counted while its health check runs outside the lock, so _total() stays exact
+                    self._checking += 1
+                elif self._total() < self.max_size:
+                    self._opening += 1
+                    open_new = True
+                else:
+                    remaining = timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f"No Snowflake connection available after {timeout:.1f}s")
+                    waited = True
+                    self._cond.wait(remaining)
+                    continue
+
+            for stale in evicted:
+                self._close_quietly(stale)
+
+            if open_new:
+                try:
+                    pooled = self._connect_pooled()
+                except BaseException:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._healthy(pooled):
+                with self._cond:
+                    self._checking -= 1
+                    self._health_check_failures += 1
+                    self._discarded += 1
+                    self._cond.notify()
+                self._close_quietly(pooled)
+                continue
+
+            with self._cond:
+                # Hand over from opening / checking to in use in one step, so it's always counted
+                if open_new:
+                    self._opening -= 1
+                else:
+                    self._checking -= 1
+                self._track_busy_locked()
+                self._in_use[id(pooled.conn)] = pooled
+                self._peak_in_use = max(self._peak_in_use, len(self._in_use))
+                wait = time.monotonic() - start
+                self._acquires += 1
+                if waited:
+                    self._waits += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+            return pooled.conn
+
+    def release(self, conn, broken: bool = False):
+        """Return a connection; broken connections are closed instead of being reused."""
+        with self._cond:
+            self._track_busy_locked()
+            pooled = self._in_use.pop(id(conn), None)
+            if pooled is None:
+                return
+            if broken or self._closed:
+                self._discarded += 1
+                evicted = [pooled]
+            else:
+                pooled.last_used = time.monotonic()
+                evicted = self._take_expired_idle_locked()
+                self._idle.append(pooled)
+            self._cond.notify()
+        for stale in evicted:
+            self._close_quietly(stale)
+
+    def evict_idle(self) -> int:
+        """Close connections idle past idle_timeout now (above min_size); returns how many."""
+        with self._cond:
+            evicted = self._take_expired_idle_locked()
+        for stale in evicted:
+            self._close_quietly(stale)
+        return len(evicted)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """`with pool.connection() as conn:`; the connection is discarded if the block hits a session error."""
+        conn = self.acquire(timeout)
+        broken = False
+        try:
+            yield conn
+        except Exception as e:
+            broken = is_session_expired(e) or self._is_closed(conn)
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    def run(self, fn: Callable[[Any], Any], timeout: Optional[float] = None):
+        """Call fn(conn); if the session expired, retry once on a fresh connection."""
+        try:
+            with self.connection(timeout) as conn:
+                return fn(conn)
+        except Exception as e:
+            if not is_session_expired(e):
+                raise
+            logger.info("Snowflake session expired, reconnecting")
+            with self._cond:
+                self._reconnects += 1
+            with self.connection(timeout) as conn:
+                return fn(conn)
+
+    # --- metrics ---
+
+    def stats(self) -> Dict:
+        with self._cond:
+            self._track_busy_locked()
+            uptime = max(time.monotonic() - self._started_at, 1e-9)
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._total(),
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "peak_in_use": self._peak_in_use,
+                "utilization": len(self._in_use) / self.max_size,
+                "avg_utilization": self._busy_seconds / uptime / self.max_size,
+                "acquires": self._acquires,
+                "waits": self._waits,
+                "wait_ms_avg": 1000 * self._wait_total / self._acquires if self._acquires else 0.0,
+                "wait_ms_max": 1000 * self._wait_max,
+                "acquire_timeouts": self._timeouts,
+                "created": self._created,
+                "discarded": self._discarded,
+                "health_check_failures": self._health_check_failures,
+                "reconnects": self._reconnects,
+            }
+
+    # --- internals ---
+
+    def _total(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._opening + self._checking
+
+    def _track_busy_locked(self):
+        now = time.monotonic()
+        self._busy_seconds += len(self._in_use) * (now - self._busy_since)
+        self._busy_since = now
+
+    def _connect_pooled(self) -> _PooledConnection:
+        pooled = _PooledConnection(self._connect())
+        with self._cond:
+            self._created += 1
+        return pooled
+
+    def _open(self) -> Optional[_PooledConnection]:
+        try:
+            return self._connect_pooled()
+        except Exception as e:
+            logger.error(f"Failed to open Snowflake connection: {e}")
+            return None
+
+    def _take_expired_idle_locked(self) -> List[_PooledConnection]:
+        """Remove connections idle past idle_timeout (keeping min_size open); caller closes them."""
+        now = time.monotonic()
+        keep = []
+        evict = []
+        # Oldest idle first; the most recently used connections are at the end and get reused first
+        for pooled in self._idle:
+            if now - pooled.last_used > self.idle_timeout and self._total() - len(evict) > self.min_size:
+                evict.append(pooled)
+            else:
+                keep.append(pooled)
+        if evict:
+            self._idle = keep
+            self._discarded += len(evict)
+        return evict
+
+    def _healthy(self, pooled: _PooledConnection) -> bool:
+        if self._is_closed(pooled.conn):
+            return False
+        now = time.monotonic()
+        if now - pooled.last_checked < self.health_check_interval:
+            return True
+        try:
+            cursor = pooled.conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            finally:
+                cursor.close()
+        except Exception as e:
+            logger.info(f"Dropping unhealthy Snowflake connection: {e}")
+            return False
+        pooled.last_checked = now
+        return True
+
+    @staticmethod
+    def _is_closed(conn) -> bool:
+        is_closed = getattr(conn, 'is_closed', None)
+        try:
+            return bool(is_closed()) if callable(is_closed) else False
+        except Exception:
+            return True
+
+    @staticmethod
+    def _close_quietly(pooled: _PooledConnection):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
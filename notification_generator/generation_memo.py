@@ -0,0 +1,94 @@
+"""
+Profile-fingerprint memoization for notification generation.
+
+Generation output depends only on the five fields returned by
+NotificationGenerator.extract_profile_fields plus min_score/max_count, and many GenAI
+profiles share the same text. GenerationMemo keys results by a hash of those normalized
+fields (tagged with the generator version) and returns a shared, read-only result on hits.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, Tuple
+
+DEFAULT_MEMO_SIZE = 100_000
+
+
+def profile_fingerprint(fields: tuple, version: str, min_score: int, max_count: int) -> bytes:
+    """
+    16-byte digest of the generation inputs.
+
+    Fields are lowercased: every rule trigger, guardrail and the pricing check already
+    compare lowercased text, so profiles differing only in case generate the same output.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{version}\x1f{min_score}\x1f{max_count}".encode('utf-8'))
+    for value in fields:
+        h.update(b'\x1e')
+        h.update((value or '').lower().encode('utf-8'))
+    return h.digest()
+
+
+class GenerationMemo:
+    """
+    Bounded LRU memo in front of NotificationGenerator.generate_from_fields.
+
+    Thread-safe; generation itself runs outside the lock, so two threads missing on the same
+    key may both generate (the result is identical and only one copy is kept).
+    """
+
+    def __init__(self, generator, max_entries: int = DEFAULT_MEMO_SIZE):
+        self.generator = generator
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[MappingProxyType, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def generate(self, profile: Dict, min_score: int = 82, max_count: int = 10) -> Tuple[MappingProxyType, ...]:
+        """Memoized generate_notifications; the result is shared, copy it before mutating."""
+        return self.generate_from_fields(self.generator.extract_profile_fields(profile), min_score, max_count)
+
+    def generate_from_fields(self, fields: tuple, min_score: int = 82,
+                             max_count: int = 10) -> Tuple[MappingProxyType, ...]:
+        key = profile_fingerprint(fields, self.generator.__version__, min_score, max_count)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        result = tuple(
+            MappingProxyType(n) for n in self.generator.generate_from_fields(fields, min_score, max_count)
+        )
+
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Counters snapshot for logs and server metrics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.generator.__version__,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
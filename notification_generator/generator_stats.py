@@ -0,0 +1,138 @@
+"""
+Opt-in per-stage timings and counters for NotificationGenerator.
+
+Disabled by default: generate_from_fields checks one attribute and takes the plain path. After
+NotificationGenerator.enable_stats() (NOTIFICATION_GENERATOR_STATS=1 in the server, --stats in
+batch_generate.py) every generation records where its time went, how many candidates each filter
+let through and which rules fired; snapshot() reports the totals.
+
+Per-consumer stages (generate_from_fields):
+  match         lowercase fields, fire rules, pricing check
+  candidates    catalog entries of the fired rules
+  score_filter  drop entries under min_score
+  dietary_guardrail / mild_spicy_guardrail
+  top_n         keep max_count
+  enrich        build the output dicts (url and image_url come from the catalog)
+
+Batch stages (generate_frame): match (trigger and guardrail masks), select (candidate matrix and
+top-k) and assemble (output DataFrame). Counts are comparable across both paths. Memoized
+results (GenerationMemo hits) are not generated again and so are not counted.
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+GENERATE_STAGES = ["match", "candidates", "score_filter", "dietary_guardrail", "mild_spicy_guardrail",
+                   "top_n", "enrich"]
+FRAME_STAGES = ["match", "select", "assemble"]
+# Filters in the order candidates pass through them
+FILTERS = ["score_filter", "dietary_guardrail", "mild_spicy_guardrail", "top_n"]
+
+
+class GeneratorStats:
+    """Thread-safe accumulator; one lock acquisition per generation call."""
+
+    def __init__(self, rules: Sequence[Dict]):
+        self.keywords = [rule["keyword"] for rule in rules]
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.since = time.time()
+            self.consumers = 0
+            self.notifications = 0
+            self.empty_results = 0
+            self.calls = {"generate_from_fields": 0, "generate_frame": 0}
+            self.stage_seconds = {
+                "generate_from_fields": dict.fromkeys(GENERATE_STAGES, 0.0),
+                "generate_frame": dict.fromkeys(FRAME_STAGES, 0.0),
+            }
+            self.filter_counts = {name: [0, 0] for name in FILTERS}
+            self.rule_hits = [0] * len(self.keywords)
+
+    def record(self, timestamps: Sequence[float], active: Iterable[int],
+               filter_counts: Sequence[Tuple[int, int]], notifications: int):
+        """One generate_from_fields call: stage boundary timestamps, fired rules, (in, out) per filter."""
+        with self._lock:
+            self.calls["generate_from_fields"] += 1
+            self.consumers += 1
+            self.notifications += notifications
+            if not notifications:
+                self.empty_results += 1
+            seconds = self.stage_seconds["generate_from_fields"]
+            for stage, start, end in zip(GENERATE_STAGES, timestamps, timestamps[1:]):
+                seconds[stage] += end - start
+            for counts, (n_in, n_out) in zip(self.filter_counts.values(), filter_counts):
+                counts[0] += n_in
+                counts[1] += n_out
+            for idx in active:
+                self.rule_hits[idx] += 1
+
+    def record_frame(self, timestamps: Sequence[float], rule_hits: Sequence[int],
+                     filter_counts: Sequence[Tuple[int, int]], consumers: int, notifications: int,
+                     empty_results: int):
+        """One generate_frame call; rule_hits is the number of consumers per rule index (numpy ints accepted)."""
+        with self._lock:
+            self.calls["generate_frame"] += 1
+            self.consumers += int(consumers)
+            self.notifications += int(notifications)
+            self.empty_results += int(empty_results)
+            seconds = self.stage_seconds["generate_frame"]
+            for stage, start, end in zip(FRAME_STAGES, timestamps, timestamps[1:]):
+                seconds[stage] += end - start
+            for counts, (n_in, n_out) in zip(self.filter_counts.values(), filter_counts):
+                counts[0] += int(n_in)
+                counts[1] += int(n_out)
+            for idx, hits in enumerate(rule_hits):
+                self.rule_hits[idx] += int(hits)
+
+    def merge(self, other: Dict):
+        """Add a snapshot() taken elsewhere (e.g. in a batch worker process)."""
+        with self._lock:
+            self.consumers += other["consumers"]
+            self.notifications += other["notifications"]
+            self.empty_results += other["empty_results"]
+            for path, section in other["stages"].items():
+                self.calls[path] += section["calls"]
+                for stage, value in section["seconds"].items():
+                    self.stage_seconds[path][stage] += value
+            for name, counts in other["filters"].items():
+                self.filter_counts[name][0] += counts["in"]
+                self.filter_counts[name][1] += counts["out"]
+            for rule in other["rules"]:
+                self.rule_hits[rule["rule"]] += rule["hits"]
+
+    def snapshot(self) -> Dict:
+        """Totals since enable/reset: stages by path, candidates through each filter, rule hits."""
+        with self._lock:
+            consumers = self.consumers
+            stages = {}
+            for path, seconds in self.stage_seconds.items():
+                total = sum(seconds.values())
+                stages[path] = {
+                    "calls": self.calls[path],
+                    "seconds": {stage: round(value, 6) for stage, value in seconds.items()},
+                    "share": {stage: round(value / total, 4) if total else 0.0 for stage, value in seconds.items()},
+                }
+            filters = {
+                name: {"in": n_in, "out": n_out, "dropped": n_in - n_out,
+                       "pass_rate": round(n_out / n_in, 4) if n_in else 1.0}
+                for name, (n_in, n_out) in self.filter_counts.items()
+            }
+            rules: List[Dict] = sorted((
+                {"rule": idx, "keyword": keyword, "hits": hits,
+                 "hit_rate": round(hits / consumers, 4) if consumers else 0.0}
+                for idx, (keyword, hits) in enumerate(zip(self.keywords, self.rule_hits))
+            ), key=lambda r: -r["hits"])
+            return {
+                "since": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.since)),
+                "consumers": consumers,
+                "notifications": self.notifications,
+                "empty_results": self.empty_results,
+                "stages": stages,
+                "filters": filters,
+                "rules": rules,
+                "rules_never_fired": [r["keyword"] for r in rules if not r["hits"]],
+            }
@@ -0,0 +1,94 @@
+"""
+Precompiled guardrail engine.
+
+Guardrails are expressed as bits. A candidate's conflict mask records which guardrails its
+copy would violate (e.g. it mentions chicken, so it conflicts with vegetarian, vegan and
+pescatarian). A profile's guardrail mask records which guardrails apply to the consumer.
+A candidate passes when the two masks share no bits.
+
+Candidate copy is matched with one compiled pattern for words starting with a blocked term, so
+'egg' blocks "eggs" and "eggnog" but not "veggie", 'cheese' blocks "cheeseburger", and 'butter'
+blocks "buttermilk". Words that merely start with a term without containing it ("meatless",
+"eggplant", "butternut") are listed in SAFE_WORDS and pass.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict
+
+DIET_VEGETARIAN = 1 << 0
+DIET_VEGAN = 1 << 1
+DIET_PESCATARIAN = 1 << 2
+TASTE_MILD_SPICY = 1 << 3  # v1.1: 'mild spicy' consumers don't get 'spicy' copy
+
+# Guardrail bit -> terms a candidate must not mention
+BLOCKED_TERMS: Dict[int, tuple] = {
+    DIET_VEGETARIAN: ('meat', 'chicken', 'beef', 'pork', 'bacon', 'sausage', 'steak', 'turkey'),
+    DIET_VEGAN: ('meat', 'chicken', 'beef', 'dairy', 'cheese', 'egg', 'milk', 'bacon', 'butter'),
+    DIET_PESCATARIAN: ('chicken', 'beef', 'pork', 'bacon', 'sausage', 'steak', 'turkey', 'lamb'),
+    TASTE_MILD_SPICY: ('spicy',),
+}
+
+# Term -> every guardrail bit it violates
+_TERM_BITS: Dict[str, int] = {}
+for _bit, _terms in BLOCKED_TERMS.items():
+    for _term in _terms:
+        _TERM_BITS[_term] = _TERM_BITS.get(_term, 0) | _bit
+
+# Patterns for whole words that start with a blocked term but don't contain the ingredient
+SAFE_WORDS = (r'\w+less', r'eggplants?', r'butternuts?')
+
+_BLOCKED_PATTERN = re.compile(
+    r'\b(?!(?:' + '|'.join(SAFE_WORDS) + r')\b)('
+    + '|'.join(sorted(map(re.escape, _TERM_BITS), key=len, reverse=True)) + r')\w*',
+    re.IGNORECASE,
+)
+
+_NO_DIETARY = ('none', 'no preference')
+
+
+@lru_cache(maxsize=4096)
+def content_conflicts(title: str, body: str, keyword: str) -> int:
+    """Conflict mask for a candidate's copy (cached; candidates come from a fixed template set)."""
+    mask = 0
+    for text in (title, body, keyword):
+        for m in _BLOCKED_PATTERN.finditer(text or ''):
+            mask |= _TERM_BITS[m.group(1).lower()]
+    return mask
+
+
+def candidate_conflicts(notification: Dict) -> int:
+    """Conflict mask for a notification dict with 'title', 'body' and 'keyword'."""
+    return content_conflicts(notification['title'], notification['body'], notification['keyword'])
+
+
+def dietary_mask(dietary_pref: str) -> int:
+    """Guardrail bits implied by a free-text dietary preference."""
+    if not dietary_pref:
+        return 0
+    dietary_lower = dietary_pref.lower()
+    if dietary_lower in _NO_DIETARY:
+        return 0
+    mask = 0
+    if 'vegetarian' in dietary_lower:
+        mask |= DIET_VEGETARIAN
+    if 'vegan' in dietary_lower:
+        mask |= DIET_VEGAN
+    if 'pescatarian' in dietary_lower:
+        mask |= DIET_PESCATARIAN
+    return mask
+
+
+def taste_mask(taste_pref: str) -> int:
+    """Guardrail bits implied by a free-text taste preference."""
+    if not taste_pref:
+        return 0
+    taste_lower = taste_pref.lower()
+    if 'mild' in taste_lower and 'spicy' in taste_lower:
+        return TASTE_MILD_SPICY
+    return 0
+
+
+def profile_mask(dietary_pref: str, taste_pref: str) -> int:
+    """Combined guardrail mask for a consumer."""
+    return dietary_mask(dietary_pref) | taste_mask(taste_pref)
@@ -0,0 +1,122 @@
+"""
+Precomputed notification catalog.
+
+Everything about a candidate notification (body variant, keyword-in-body fix-up, URL, image,
+guardrail conflicts) depends only on its rule and the image map, never on the consumer. The
+catalog computes all of it once so generation only selects and ranks entries, and the server
+serves url and image_url straight from the entry.
+"""
+
+import hashlib
+import json
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from guardrails import content_conflicts
+
+
+class CatalogEntry(NamedTuple):
+    """One fully enriched candidate notification."""
+    rule_index: int
+    title: str
+    body: str
+    keyword: str
+    score: int
+    url: Optional[str]
+    image_url: Optional[str]
+    conflicts: int
+
+    def as_notification(self) -> Dict:
+        """Fresh dict in the generate_notifications output shape (safe for callers to mutate)."""
+        return {
+            "title": self.title,
+            "body": self.body,
+            "keyword": self.keyword,
+            "score": self.score,
+            "url": self.url,
+            "image_url": self.image_url,
+        }
+
+
+def catalog_fingerprint(generator) -> str:
+    """Digest of everything a catalog is built from: generator version, rule table and image map."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(generator.__version__.encode('utf-8'))
+    h.update(json.dumps(generator.rules.rules, sort_keys=True, default=str).encode('utf-8'))
+    h.update(json.dumps(sorted(generator.keyword_to_image.items())).encode('utf-8'))
+    return h.hexdigest()
+
+
+class NotificationCatalog:
+    """Immutable, rule-ordered set of catalog entries plus their score ranking."""
+
+    def __init__(self, version: str, entries: List[CatalogEntry], fingerprint: Optional[str] = None):
+        self.version = version
+        self.fingerprint = fingerprint
+        self.entries: Tuple[CatalogEntry, ...] = tuple(entries)
+        # Stable sort by score descending: equal scores keep rule (emission) order
+        self.ranked: Tuple[CatalogEntry, ...] = tuple(sorted(self.entries, key=lambda e: -e.score))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @classmethod
+    def build(cls, generator) -> "NotificationCatalog":
+        """Build the catalog for a generator's rule table and image map."""
+        entries = []
+        for idx, rule in enumerate(generator.rules.rules):
+            candidate = generator._build_rule_notification(rule)
+            keyword = (candidate['keyword'] or '').strip()
+            if keyword:
+                url = generator.format_for_doordash_url(keyword)
+                image_url = generator.keyword_to_image.get(keyword.lower()) if generator.keyword_to_image else None
+            else:
+                url = None
+                image_url = None
+            entries.append(CatalogEntry(
+                rule_index=idx,
+                title=candidate['title'],
+                body=candidate['body'],
+                keyword=candidate['keyword'],
+                score=candidate['score'],
+                url=url,
+                image_url=image_url,
+                conflicts=content_conflicts(candidate['title'], candidate['body'], candidate['keyword']),
+            ))
+        return cls(generator.__version__, entries, catalog_fingerprint(generator))
+
+    def save(self, path: str):
+        """Serialize the catalog to JSON."""
+        data = {
+            "version": self.version,
+            "fingerprint": self.fingerprint,
+            "entries": [entry._asdict() for entry in self.entries],
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str, generator) -> "NotificationCatalog":
+        """Load a catalog written by save(); rejects catalogs built from other rules or another image map."""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        expected = catalog_fingerprint(generator)
+        if data.get("fingerprint") != expected:
+            raise ValueError(
+                f"Catalog {path} was built for generator {data.get('version')} with different rules or images "
+                f"(fingerprint {data.get('fingerprint')}, expected {expected})"
+            )
+        return cls(data["version"], [CatalogEntry(**raw) for raw in data["entries"]], data["fingerprint"])
+
+
+# Built once per process per catalog_fingerprint (version, rule table, image map)
+_CATALOG_CACHE: Dict[str, NotificationCatalog] = {}
+
+
+def get_catalog(generator) -> NotificationCatalog:
+    """Return the process-wide catalog for a generator, building it on first use."""
+    key = catalog_fingerprint(generator)
+    catalog = _CATALOG_CACHE.get(key)
+    if catalog is None:
+        catalog = NotificationCatalog.build(generator)
+        _CATALOG_CACHE[key] = catalog
+    return catalog
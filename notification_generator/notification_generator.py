@@ -7,7 +7,45 @@ Version: 1.4.0 - Updated restrictions (min_score=82, no promo phrases, short das
 import json
 import re
 import os
-from typing import List, Dict, Optional
+import time
+from typing import List, Dict, Optional, Iterable
+
+from generator_stats import GeneratorStats
+from notification_rules import CompiledRules, DEFAULT_RULES
+from notification_catalog import NotificationCatalog, catalog_fingerprint, get_catalog
+from notification_validation import validate_frame, validate_notification
+from guardrails import (
+    DIET_PESCATARIAN,
+    DIET_VEGAN,
+    DIET_VEGETARIAN,
+    TASTE_MILD_SPICY,
+    candidate_conflicts,
+    dietary_mask,
+    profile_mask,
+    taste_mask,
+)
+
+
+# Profile columns read by generate_frame (one row per consumer)
+FRAME_PROFILE_COLUMNS = [
+    "cuisine_preferences",
+    "food_preferences",
+    "taste_preference",
+    "dietary",
+    "price_sensitivity",
+]
+
+# Columns returned by generate_frame (one row per consumer x notification)
+FRAME_OUTPUT_COLUMNS = [
+    "consumer_id",
+    "rank",
+    "score",
+    "title",
+    "body",
+    "keyword",
+    "url",
+    "image_url",
+]
 
 
 class NotificationGenerator:
@@ -24,7 +62,10 @@ class NotificationGenerator:
     
     __version__ = "1.4.0"
     
-    def __init__(self):
+    def __init__(self, rules: Optional[CompiledRules] = None, catalog: Optional[NotificationCatalog] = None):
+        # Declarative candidate rules, compiled once (see notification_rules.py)
+        self.rules = rules or DEFAULT_RULES
+
         self.brand_phrases = [
             "Skip the schlep",
             "You pick. We roll",
@@ -130,6 +171,30 @@ class NotificationGenerator:
         except Exception:
             self.keyword_to_image = {}
 
+        # Fully enriched candidates, built once per process (or passed in from NotificationCatalog.load)
+        if catalog is not None and catalog.fingerprint != catalog_fingerprint(self):
+            raise ValueError("Catalog was built from different rules or a different image map")
+        self.catalog = catalog or get_catalog(self)
+
+        # Stage timings and counters, off unless enable_stats() is called (see generator_stats.py)
+        self.stats: Optional[GeneratorStats] = None
+
+    def enable_stats(self) -> GeneratorStats:
+        """Start recording per-stage timings and counters; returns the (possibly existing) stats."""
+        if self.stats is None:
+            self.stats = GeneratorStats(self.rules.rules)
+        return self.stats
+
+    def disable_stats(self):
+        self.stats = None
+
+    def stats_snapshot(self) -> Dict:
+        """GeneratorStats.snapshot(), or {"enabled": False} when stats are off."""
+        stats = self.stats
+        if stats is None:
+            return {"enabled": False}
+        return {"enabled": True, **stats.snapshot()}
+
     def _detect_locale_key(self, dd_user_locale: str, language: str) -> str:
         """Return canonical locale key: 'es', 'fr-CA', 'en-CA', or 'en-US' default."""
         loc = (dd_user_locale or "").lower()
@@ -203,80 +268,22 @@ class NotificationGenerator:
     
     def passes_dietary_guardrail(self, notification: Dict, dietary_pref: str) -> bool:
         """Check if a notification respects dietary preferences."""
-        if not dietary_pref or dietary_pref.lower() in ['none', 'no preference']:
-            return True
-        
-        dietary_lower = dietary_pref.lower()
-        content = f"{notification['title']} {notification['body']} {notification['keyword']}".lower()
-        
-        if 'vegetarian' in dietary_lower:
-            meat_keywords = ['meat', 'chicken', 'beef', 'pork', 'bacon', 'sausage', 'steak', 'turkey']
-            if any(meat in content for meat in meat_keywords):
-                return False
-        
-        if 'vegan' in dietary_lower:
-            animal_products = ['meat', 'chicken', 'beef', 'dairy', 'cheese', 'egg', 'milk', 'bacon', 'butter']
-            if any(product in content for product in animal_products):
-                return False
-        
-        if 'pescatarian' in dietary_lower:
-            meats = ['chicken', 'beef', 'pork', 'bacon', 'sausage', 'steak', 'turkey', 'lamb']
-            if any(meat in content for meat in meats):
-                return False
-        
-        return True
+        return not (candidate_conflicts(notification) & dietary_mask(dietary_pref))
     
     def passes_mild_spicy_guardrail(self, notification: Dict, taste_pref: str) -> bool:
         """
         v1.1: If taste preference contains 'mild spicy', filter out 'spicy' keyword.
         """
-        if not taste_pref:
-            return True
-        
-        taste_lower = taste_pref.lower()
-        
-        if 'mild' in taste_lower and 'spicy' in taste_lower:
-            content = f"{notification['title']} {notification['body']} {notification['keyword']}".lower()
-            if 'spicy' in content:
-                return False
-        
-        return True
+        return not (candidate_conflicts(notification) & taste_mask(taste_pref))
     
     def validate_notification(self, title: str, body: str) -> Dict:
-        """Validate a notification against DoorDash guidelines."""
-        issues = []
-        
-        if len(title) >= 35:
-            issues.append(f"Title too long: {len(title)}/35 characters")
-        if len(body) > 140:
-            issues.append(f"Body too long: {len(body)}/140 characters")
-        
-        if '!' in title or '!' in body:
-            issues.append("Contains exclamation points")
-        if title and title[-1] in '.,:;' and title[-1] != '?':
-            issues.append("Title has end punctuation")
-        if '#' in title or '#' in body:
-            issues.append("Contains hashtags")
-        if 'DoorDash' in title or 'DoorDash' in body:
-            issues.append("Mentions DoorDash")
-        
-        hyperbolic = ['mouthwatering', 'scrumptious', 'tantalizing', 'tempting', 'indulge', 'savor']
-        if any(word in title.lower() or word in body.lower() for word in hyperbolic):
-            issues.append("Contains overly salesy language")
-        
-        meal_times = ['breakfast', 'brunch', 'lunch', 'dinner']
-        if any(meal in title.lower() or meal in body.lower() for meal in meal_times):
-            issues.append("Infers meal time")
-        
-        if 'authentic' in title.lower() or 'authentic' in body.lower():
-            issues.append("Uses 'authentic' descriptor")
-        
-        return {
-            "is_valid": len(issues) == 0,
-            "title_length": len(title),
-            "body_length": len(body),
-            "issues": issues
-        }
+        """Validate a notification against DoorDash guidelines (one compiled scan per string)."""
+        return validate_notification(title, body)
+
+    @staticmethod
+    def validate_frame(notifications_df, title_column: str = "title", body_column: str = "body"):
+        """Columnar validate_notification: issue bitmask and codes per row (see notification_validation.py)."""
+        return validate_frame(notifications_df, title_column, body_column)
     
     def generate_notifications(
         self, 
@@ -285,309 +292,281 @@ class NotificationGenerator:
         max_count: int = 10
     ) -> List[Dict]:
         """Generate personalized notifications from a consumer profile."""
+        return self.generate_from_fields(self.extract_profile_fields(profile), min_score, max_count)
+
+    @staticmethod
+    def extract_profile_fields(profile: Dict) -> tuple:
+        """
+        The only profile fields generation reads, in FRAME_PROFILE_COLUMNS order:
+        (cuisine_preferences, food_preferences, taste_preference, dietary, price_sensitivity).
+
+        Missing fields are empty strings, except dietary, which is None when the profile has no
+        preferred_dietary_preference (generation treats it as '', the profile summary as 'none').
+        """
         overall = profile.get('overall_profile', {})
-        cuisine = overall.get('cuisine_preferences', '').lower()
-        food = overall.get('food_preferences', '').lower()
-        taste = overall.get('taste_preference', '').lower()
         dietary = overall.get('dietary_preferences', {})
-        preferred_dietary = dietary.get('preferred_dietary_preference', '')
-        price_sensitivity = overall.get('price_sensitivity', '')
-        
-        all_notifications = []
-        
-        # Generate base notifications
-        self._add_noodle_notifications(all_notifications, food, cuisine)
-        self._add_cuisine_notifications(all_notifications, cuisine, food, taste)
-        self._add_pricing_aware_notifications(all_notifications, price_sensitivity)
-        self._add_universal_notifications(all_notifications)
-        
-        # Apply guardrails
-        filtered = []
-        for notif in all_notifications:
-            if not self.passes_dietary_guardrail(notif, preferred_dietary):
-                continue
-            if not self.passes_mild_spicy_guardrail(notif, taste):
-                continue
-            filtered.append(notif)
-        
-        # Filter by score and sort
-        filtered = [n for n in filtered if n['score'] >= min_score]
-        filtered.sort(key=lambda x: x['score'], reverse=True)
-        top = filtered[:max_count]
-        
-        # Enrich with URL and image URL for downstream consumers
-        for n in top:
-            kw = (n.get('keyword') or '').strip()
-            if kw:
-                n['url'] = self.format_for_doordash_url(kw)
-                n['image_url'] = self.keyword_to_image.get(kw.lower()) if self.keyword_to_image else None
-            else:
-                n['url'] = None
-                n['image_url'] = None
+        return (
+            overall.get('cuisine_preferences', ''),
+            overall.get('food_preferences', ''),
+            overall.get('taste_preference', ''),
+            dietary.get('preferred_dietary_preference'),
+            overall.get('price_sensitivity', ''),
+        )
+
+    def generate_from_fields(self, fields: tuple, min_score: int = 82, max_count: int = 10) -> List[Dict]:
+        """generate_notifications for fields already pulled out by extract_profile_fields."""
+        # One read: disable_stats() from another thread can't leave us recording into None
+        stats = self.stats
+        if stats is not None:
+            return self._generate_with_stats(stats, fields, min_score, max_count)
+        cuisine, food, taste, preferred_dietary, price_sensitivity = fields
+        cuisine = cuisine.lower()
+        food = food.lower()
+        taste = taste.lower()
+        
+        # Rules that apply: one scan per field plus the pricing/universal conditions
+        active = self.rules.fire({
+            "cuisine_preferences": cuisine,
+            "food_preferences": food,
+            "taste_preference": taste,
+        }, self.is_value_conscious(price_sensitivity))
+        
+        # Apply guardrails: one AND per candidate against the consumer's guardrail mask
+        guardrails = profile_mask(preferred_dietary, taste)
+        
+        # Catalog entries are pre-ranked and pre-enriched (url, image_url), so selection is all that's left
+        filtered = [
+            entry for entry in self.catalog.ranked
+            if entry.rule_index in active and entry.score >= min_score and not (entry.conflicts & guardrails)
+        ]
+        top = [entry.as_notification() for entry in filtered[:max_count]]
         
         return top
-    
-    def _add_noodle_notifications(self, notifications: List, food: str, cuisine: str):
-        """Add noodle-related notifications"""
-        if 'noodle' in food or 'noodle' in cuisine:
-            body_templates = [
-                "🍜 Hot bowls and hand-pulled options ready from spots you'll love",
-                "🍜 Fresh noodles delivered fast from places you'll reorder",
-                "🍜 Hand-pulled noodles and hot bowls, made easy",
-            ]
-            body_text = self._choose_variant(body_templates, 'noodles')
-            body_text = self._ensure_keyword_in_body('noodles', body_text)
-            notifications.append({
-                "title": "Noodle cravings covered",
-                "body": body_text,
-                "keyword": "noodles",
-                "score": 98
-            })
-    
-    def _add_cuisine_notifications(self, notifications: List, cuisine: str, food: str, taste: str):
-        """Add cuisine-specific notifications"""
-        
-        if 'chinese' in cuisine:
-            body_templates = [
-                "Get dumplings, rice dishes, and bold flavors delivered from top spots",
-                "Top Chinese spots near you with dumplings and rice dishes",
-                "Bold Chinese flavors from nearby favorites, delivered",
-            ]
-            body_text = self._choose_variant(body_templates, 'Chinese food')
-            body_text = self._ensure_keyword_in_body('Chinese food', body_text)
-            notifications.append({
-                "title": "Skip the schlep",
-                "body": body_text,
-                "keyword": "Chinese food",
-                "score": 96
-            })
-        
-        if 'bowl' in food or 'rice' in food or 'poke' in food or 'hawaiian' in cuisine:
-            body_templates = [
-                "Build your perfect bowl with fresh ingredients from places nearby",
-                "Custom rice bowls with fresh picks from spots around you",
-                "Fresh rice bowls, built your way and delivered",
-            ]
-            body_text = self._choose_variant(body_templates, 'rice bowls')
-            body_text = self._ensure_keyword_in_body('rice bowls', body_text)
-            notifications.append({
-                "title": "You pick. We roll",
-                "body": body_text,
-                "keyword": "rice bowls",
-                "score": 94
-            })
-        
-        if 'spicy' in taste or 'bold' in taste:
-            body_templates = [
-                "Get bold flavors from restaurants that bring it",
-                "Spicy picks ready to deliver from places you’ll like",
-                "Turn up the heat with spicy food near you",
-            ]
-            body_text = self._choose_variant(body_templates, 'spicy food')
-            body_text = self._ensure_keyword_in_body('spicy food', body_text)
-            notifications.append({
-                "title": "Heat seekers wanted",
-                "body": body_text,
-                "keyword": "spicy food",
-                "score": 92
-            })
-        
-        if 'mexican' in cuisine or 'latin' in cuisine:
-            body_templates = [
-                "Fresh tacos, burritos, and more ready to order from nearby favorites",
-                "Tacos and burritos from top Mexican spots near you",
-                "Mexican classics, delivered from places you’ll reorder",
-            ]
-            body_text = self._choose_variant(body_templates, 'Mexican')
-            body_text = self._ensure_keyword_in_body('Mexican', body_text)
-            notifications.append({
-                "title": "Taco time",
-                "body": body_text,
-                "keyword": "Mexican",
-                "score": 90
-            })
-        
-        if 'pizza' in food or 'italian' in cuisine:
-            body_templates = [
-                "Thin crust to deep dish, they're all just a tap away",
-                "Hot pizza from top spots, just a tap away",
-                "Classic and new pizza picks delivered fast",
-            ]
-            body_text = self._choose_variant(body_templates, 'pizza')
-            body_text = self._ensure_keyword_in_body('pizza', body_text)
-            notifications.append({
-                "title": "Pizza. Done",
-                "body": body_text,
-                "keyword": "pizza",
-                "score": 88
-            })
-        
-        if 'burger' in food or 'sandwich' in food:
-            body_templates = [
-                "Classic or loaded, get them delivered hot and ready",
-                "Stacked burgers, cooked right and delivered",
-                "Burgers your way, hot and ready at your door",
-            ]
-            body_text = self._choose_variant(body_templates, 'burgers')
-            body_text = self._ensure_keyword_in_body('burgers', body_text)
-            notifications.append({
-                "title": "Burgers your way",
-                "body": body_text,
-                "keyword": "burgers",
-                "score": 86
-            })
-        
-        if 'japanese' in cuisine or 'sushi' in food or 'ramen' in food:
-            body_templates = [
-                "Fresh rolls and rich broths from spots you'll want to reorder",
-                "Sushi and ramen from nearby favorites, delivered",
-                "Rolls and ramen, prepped fast from top Japanese spots",
-            ]
-            body_text = self._choose_variant(body_templates, 'Japanese food')
-            body_text = self._ensure_keyword_in_body('Japanese food', body_text)
-            notifications.append({
-                "title": "Sushi and ramen ready",
-                "body": body_text,
-                "keyword": "Japanese food",
-                "score": 84
-            })
-        
-        if 'thai' in cuisine:
-            body_templates = [
-                "Get bold Thai curries and stir-fries delivered in 30 min",
-                "Thai curries and stir-fries, ready to deliver",
-                "Thai flavors from nearby spots, delivered quick",
-            ]
-            body_text = self._choose_variant(body_templates, 'Thai food')
-            body_text = self._ensure_keyword_in_body('Thai food', body_text)
-            notifications.append({
-                "title": "Curry cravings",
-                "body": body_text,
-                "keyword": "Thai food",
-                "score": 82
-            })
-        
-        if 'vietnamese' in cuisine or 'pho' in food:
-            body_templates = [
-                "Fresh Vietnamese flavors from noodle soups to banh mi sandwiches",
-                "Pho and banh mi from nearby favorites, delivered",
-                "Vietnamese picks like pho and banh mi, made easy",
-            ]
-            body_text = self._choose_variant(body_templates, 'Vietnamese food')
-            body_text = self._ensure_keyword_in_body('Vietnamese food', body_text)
-            notifications.append({
-                "title": "Pho and more",
-                "body": body_text,
-                "keyword": "Vietnamese food",
-                "score": 82
-            })
-        
-        if 'indian' in cuisine:
-            body_templates = [
-                "Bold Indian flavors from tikka masala to biryani, all nearby",
-                "Biryani and tikka masala from top Indian spots",
-                "Indian favorites delivered from places you’ll reorder",
-            ]
-            body_text = self._choose_variant(body_templates, 'Indian food')
-            body_text = self._ensure_keyword_in_body('Indian food', body_text)
-            notifications.append({
-                "title": "Curry and more",
-                "body": body_text,
-                "keyword": "Indian food",
-                "score": 82
-            })
-        
-        if 'korean' in cuisine:
-            body_templates = [
-                "From bibimbap to Korean fried chicken, flavors you'll love",
-                "Bibimbap and Korean fried chicken, delivered hot",
-                "Korean favorites near you, ready to deliver",
-            ]
-            body_text = self._choose_variant(body_templates, 'Korean food')
-            body_text = self._ensure_keyword_in_body('Korean food', body_text)
-            notifications.append({
-                "title": "Favorites nearby",
-                "body": body_text,
-                "keyword": "Korean food",
-                "score": 82
-            })
-        
-        if 'mediterranean' in cuisine or 'greek' in cuisine:
-            body_templates = [
-                "Fresh gyros, falafel, and hummus from spots worth reordering",
-                "Mediterranean bowls and plates from nearby favorites",
-                "Gyros, falafel, hummus - Mediterranean picks delivered",
-            ]
-            body_text = self._choose_variant(body_templates, 'Mediterranean food')
-            body_text = self._ensure_keyword_in_body('Mediterranean food', body_text)
-            notifications.append({
-                "title": "Fresh picks nearby",
-                "body": body_text,
-                "keyword": "Mediterranean food",
-                "score": 82
-            })
-        
-        if 'salad' in food or 'healthy' in food:
-            body_templates = [
-                "Build your perfect meal with options that keep it light",
-                "Light and fresh options ready to go",
-                "Healthy picks you can customize and deliver",
-            ]
-            body_text = self._choose_variant(body_templates, 'healthy food')
-            body_text = self._ensure_keyword_in_body('healthy food', body_text)
-            notifications.append({
-                "title": "Fresh bowls nearby",
-                "body": body_text,
-                "keyword": "healthy food",
-                "score": 80
-            })
-    
-    def _add_pricing_aware_notifications(self, notifications: List, price_sensitivity: str):
+
+    def _generate_with_stats(self, stats: GeneratorStats, fields: tuple, min_score: int,
+                             max_count: int) -> List[Dict]:
+        """generate_from_fields one stage at a time, recording timings and counts (same output)."""
+        clock = time.perf_counter
+        t_match = clock()
+        cuisine, food, taste, preferred_dietary, price_sensitivity = fields
+        taste = taste.lower()
+        active = self.rules.fire({
+            "cuisine_preferences": cuisine.lower(),
+            "food_preferences": food.lower(),
+            "taste_preference": taste,
+        }, self.is_value_conscious(price_sensitivity))
+        t_candidates = clock()
+        candidates = [entry for entry in self.catalog.ranked if entry.rule_index in active]
+        t_score = clock()
+        scored = [entry for entry in candidates if entry.score >= min_score]
+        t_dietary = clock()
+        diet_bits = dietary_mask(preferred_dietary)
+        allowed = [entry for entry in scored if not (entry.conflicts & diet_bits)]
+        t_spicy = clock()
+        taste_bits = taste_mask(taste)
+        filtered = [entry for entry in allowed if not (entry.conflicts & taste_bits)]
+        t_top = clock()
+        selected = filtered[:max_count]
+        t_enrich = clock()
+        top = [entry.as_notification() for entry in selected]
+        t_end = clock()
+
+        stats.record(
+            (t_match, t_candidates, t_score, t_dietary, t_spicy, t_top, t_enrich, t_end),
+            active,
+            ((len(candidates), len(scored)), (len(scored), len(allowed)), (len(allowed), len(filtered)),
+             (len(filtered), len(selected))),
+            len(top),
+        )
+        return top
+
+    @staticmethod
+    def profiles_to_frame(profiles: Iterable[Dict], consumer_ids: Optional[Iterable] = None):
         """
-        v1.2: Add deal notifications with pricing-aware scoring
-        
-        Value-conscious consumers get boosted deal notification scores
+        Flatten GenAI profile dicts into the column layout expected by generate_frame.
+
+        Missing fields become empty strings, matching the defaults used by generate_notifications.
         """
-        is_value = self.is_value_conscious(price_sensitivity)
-        
-        if is_value:
-            # Boost deal notifications for value-conscious consumers (avoid specific promo phrases)
-            body_templates_deals = [
-                "Save on restaurants you order from most with deals ready now",
-                "Deals you’ll actually use from places you reorder",
-            ]
-            body_text_deals = self._choose_variant(body_templates_deals, 'food deals')
-            body_text_deals = self._ensure_keyword_in_body('food deals', body_text_deals)
-            notifications.append({
-                "title": "Deal dropped. You're up",
-                "body": body_text_deals,
-                "keyword": "food deals",
-                "score": 95  # Boosted score
-            })
+        import pandas as pd
+
+        rows = [NotificationGenerator.extract_profile_fields(profile) for profile in profiles]
+        df = pd.DataFrame(rows, columns=FRAME_PROFILE_COLUMNS)
+        df["dietary"] = df["dietary"].fillna('')
+        if consumer_ids is not None:
+            df.insert(0, "consumer_id", list(consumer_ids))
+        return df
+
+    def generate_frame(
+        self,
+        profiles_df,
+        min_score: int = 82,
+        max_count: int = 10,
+        id_column: str = "consumer_id",
+    ):
+        """
+        Columnar variant of generate_notifications for batch runs.
+
+        Takes one row per consumer with the FRAME_PROFILE_COLUMNS columns and returns a
+        long-format DataFrame (FRAME_OUTPUT_COLUMNS) with one row per selected notification,
+        ordered by consumer then rank. Each trigger term is evaluated once per column and
+        top-k selection is done on a boolean matrix, so the output matches calling
+        generate_notifications row by row. Categorical (dictionary-encoded) columns are matched
+        once per distinct value.
+        """
+        import numpy as np
+        import pandas as pd
+
+        stats = self.stats
+        t_match = time.perf_counter()
+        n_rows = len(profiles_df)
+        if id_column in profiles_df.columns:
+            consumer_ids = profiles_df[id_column].to_numpy()
         else:
-            # Lower score for balanced spenders (will likely be filtered out)
-            body_templates_deals_low = [
-                "Get savings on restaurants you visit most",
-                "Deals available from places you visit",
-            ]
-            body_text_deals_low = self._choose_variant(body_templates_deals_low, 'food deals')
-            body_text_deals_low = self._ensure_keyword_in_body('food deals', body_text_deals_low)
-            notifications.append({
-                "title": "Deal dropped. You're up",
-                "body": body_text_deals_low,
-                "keyword": "food deals",
-                "score": 78  # Below typical threshold
-            })
-    
-    def _add_universal_notifications(self, notifications: List):
-        """Add universal notifications that work for all consumers"""
-        notifications.append({
-            "title": "Your go-tos are here",
-            "body": self._ensure_keyword_in_body('restaurants', "Reorder favorites or find something new worth trying"),
-            "keyword": "restaurants",
-            "score": 80
-        })
-    
+            consumer_ids = profiles_df.index.to_numpy()
+
+        def lowered(column: str):
+            """(lowercased values, codes): codes index values per row, or None if values are per row."""
+            if column not in profiles_df.columns:
+                return pd.Series([''], dtype=object), np.zeros(n_rows, dtype=np.intp)
+            series = profiles_df[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # Dictionary-encoded input (e.g. columnar_profiles.py): evaluate once per distinct value
+                categories = pd.Series(series.cat.categories, dtype=object).astype(str).str.lower()
+                values = pd.concat([categories, pd.Series([''], dtype=object)], ignore_index=True)
+                codes = series.cat.codes.to_numpy()
+                return values, np.where(codes < 0, len(categories), codes)
+            return series.fillna('').astype(str).str.lower(), None
+
+        fields = {column: lowered(column) for column in FRAME_PROFILE_COLUMNS}
+        term_cache = {}
+
+        def per_row(column: str, result):
+            codes = fields[column][1]
+            result = np.asarray(result)
+            return result if codes is None else result[codes]
+
+        def contains(column: str, term: str):
+            key = (column, term)
+            if key not in term_cache:
+                values = fields[column][0]
+                term_cache[key] = per_row(column, values.str.contains(term, regex=False).to_numpy(dtype=bool))
+            return term_cache[key]
+
+        # Consumer-level flags shared by every candidate
+        price = fields["price_sensitivity"][0]
+        promo = price.str.extract(r'(\d+\.?\d*)%\s*promo', expand=False).astype(float).fillna(0.0)
+        is_value = (
+            contains("price_sensitivity", "value seeker")
+            | contains("price_sensitivity", "budget")
+            | per_row("price_sensitivity", promo.to_numpy() > 25)
+        )
+        dietary = fields["dietary"][0]
+        no_dietary = per_row("dietary", ((dietary == '') | dietary.isin(['none', 'no preference'])).to_numpy())
+        guardrails = (
+            np.where(contains("dietary", "vegetarian"), DIET_VEGETARIAN, 0)
+            | np.where(contains("dietary", "vegan"), DIET_VEGAN, 0)
+            | np.where(contains("dietary", "pescatarian"), DIET_PESCATARIAN, 0)
+        )
+        guardrails[no_dietary] = 0
+        guardrails |= np.where(
+            contains("taste_preference", "mild") & contains("taste_preference", "spicy"), TASTE_MILD_SPICY, 0
+        )
+
+        # Candidate masks in catalog rank order; terms shared by several rules are matched once
+        if stats is not None:
+            # Every rule is evaluated so hits are counted even for entries under min_score
+            rule_hits = np.zeros(len(self.rules.rules), dtype=np.int64)
+            filter_counts = np.zeros((3, 2), dtype=np.int64)
+            diet_bits = guardrails & ~TASTE_MILD_SPICY
+        entries = []
+        masks = []
+        for entry in self.catalog.ranked:
+            below_score = entry.score < min_score
+            if below_score and stats is None:
+                continue
+            rule = self.rules.rules[entry.rule_index]
+            condition = rule.get("condition")
+            if condition == "value_conscious":
+                mask = is_value.copy()
+            elif condition == "not_value_conscious":
+                mask = ~is_value
+            elif condition == "always":
+                mask = np.ones(n_rows, dtype=bool)
+            else:
+                mask = np.zeros(n_rows, dtype=bool)
+                for column, terms in rule["triggers"].items():
+                    for term in terms:
+                        mask |= contains(column, term.lower())
+            if stats is not None:
+                hits = np.count_nonzero(mask)
+                rule_hits[entry.rule_index] = hits
+                if below_score:
+                    filter_counts[0] += (hits, 0)
+                    continue
+                no_diet = np.count_nonzero(mask & ((diet_bits & entry.conflicts) == 0)) if entry.conflicts else hits
+            if entry.conflicts:
+                mask &= (guardrails & entry.conflicts) == 0
+            if stats is not None:
+                filter_counts += ((hits, hits), (hits, no_diet), (no_diet, np.count_nonzero(mask)))
+            entries.append(entry)
+            masks.append(mask)
+        t_select = time.perf_counter()
+
+        if entries:
+            matrix = np.column_stack(masks)
+        else:
+            matrix = np.zeros((n_rows, 0), dtype=bool)
+
+        # Vectorized per-consumer top-k: running count of selected candidates along each row
+        running = np.cumsum(matrix, axis=1)
+        if max_count >= 0:
+            limit = max_count
+        else:
+            limit = running[:, -1:] + max_count if entries else 0
+        keep = matrix & (running <= limit)
+        row_idx, cand_idx = np.nonzero(keep)
+        t_assemble = time.perf_counter()
+
+        def column(field: str):
+            values = np.empty(len(entries), dtype=object)
+            values[:] = [getattr(entry, field) for entry in entries]
+            return values[cand_idx]
+
+        scores = np.array([entry.score for entry in entries], dtype=np.int64)
+        result = pd.DataFrame({
+            "consumer_id": consumer_ids[row_idx],
+            "rank": running[row_idx, cand_idx].astype(np.int64),
+            "score": scores[cand_idx],
+            "title": column('title'),
+            "body": column('body'),
+            "keyword": column('keyword'),
+            "url": column('url'),
+            "image_url": column('image_url'),
+        }, columns=FRAME_OUTPUT_COLUMNS)
+
+        if stats is not None:
+            stats.record_frame(
+                (t_match, t_select, t_assemble, time.perf_counter()),
+                rule_hits,
+                [tuple(counts) for counts in filter_counts] + [(np.count_nonzero(matrix), len(row_idx))],
+                n_rows,
+                len(row_idx),
+                n_rows - np.count_nonzero(keep.any(axis=1)),
+            )
+        return result
+
+    def _build_rule_notification(self, rule: Dict) -> Dict:
+        """Build the candidate notification described by a rule table entry."""
+        keyword = rule["keyword"]
+        body_text = self._choose_variant(rule["bodies"], keyword)
+        body_text = self._ensure_keyword_in_body(keyword, body_text)
+        return {
+            "title": rule["title"],
+            "body": body_text,
+            "keyword": keyword,
+            "score": rule["score"]
+        }
+
     def format_for_doordash_url(self, keyword: str) -> str:
         """
         Generate DoorDash search URL from keyword.
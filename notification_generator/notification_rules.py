@@ -0,0 +1,313 @@
+"""
+Declarative notification rules and their compiled single-pass matcher.
+
+Each rule describes one candidate notification:
+- keyword: search keyword (also drives body variant choice, URL and image)
+- title: notification title
+- bodies: body templates, one is picked deterministically per keyword
+- score: ranking score (80-98 scale)
+- triggers: profile field -> substring terms; the rule fires if any term occurs
+  in the lowercased field
+- condition: for rules that don't depend on substring triggers:
+  'value_conscious', 'not_value_conscious' or 'always'
+
+Rule order is the emission order, which breaks ties between equal scores.
+"""
+
+import re
+from typing import Dict, List, Set
+
+
+# Profile fields rules can trigger on (same names as the generate_frame columns)
+RULE_FIELDS = [
+    "cuisine_preferences",
+    "food_preferences",
+    "taste_preference",
+]
+
+RULE_CONDITIONS = ["value_conscious", "not_value_conscious", "always"]
+
+
+NOTIFICATION_RULES: List[Dict] = [
+    {
+        "keyword": "noodles",
+        "title": "Noodle cravings covered",
+        "bodies": [
+            "🍜 Hot bowls and hand-pulled options ready from spots you'll love",
+            "🍜 Fresh noodles delivered fast from places you'll reorder",
+            "🍜 Hand-pulled noodles and hot bowls, made easy",
+        ],
+        "score": 98,
+        "triggers": {"food_preferences": ["noodle"], "cuisine_preferences": ["noodle"]},
+    },
+    {
+        "keyword": "Chinese food",
+        "title": "Skip the schlep",
+        "bodies": [
+            "Get dumplings, rice dishes, and bold flavors delivered from top spots",
+            "Top Chinese spots near you with dumplings and rice dishes",
+            "Bold Chinese flavors from nearby favorites, delivered",
+        ],
+        "score": 96,
+        "triggers": {"cuisine_preferences": ["chinese"]},
+    },
+    {
+        "keyword": "rice bowls",
+        "title": "You pick. We roll",
+        "bodies": [
+            "Build your perfect bowl with fresh ingredients from places nearby",
+            "Custom rice bowls with fresh picks from spots around you",
+            "Fresh rice bowls, built your way and delivered",
+        ],
+        "score": 94,
+        "triggers": {"food_preferences": ["bowl", "rice", "poke"], "cuisine_preferences": ["hawaiian"]},
+    },
+    {
+        "keyword": "spicy food",
+        "title": "Heat seekers wanted",
+        "bodies": [
+            "Get bold flavors from restaurants that bring it",
+            "Spicy picks ready to deliver from places you’ll like",
+            "Turn up the heat with spicy food near you",
+        ],
+        "score": 92,
+        "triggers": {"taste_preference": ["spicy", "bold"]},
+    },
+    {
+        "keyword": "Mexican",
+        "title": "Taco time",
+        "bodies": [
+            "Fresh tacos, burritos, and more ready to order from nearby favorites",
+            "Tacos and burritos from top Mexican spots near you",
+            "Mexican classics, delivered from places you’ll reorder",
+        ],
+        "score": 90,
+        "triggers": {"cuisine_preferences": ["mexican", "latin"]},
+    },
+    {
+        "keyword": "pizza",
+        "title": "Pizza. Done",
+        "bodies": [
+            "Thin crust to deep dish, they're all just a tap away",
+            "Hot pizza from top spots, just a tap away",
+            "Classic and new pizza picks delivered fast",
+        ],
+        "score": 88,
+        "triggers": {"food_preferences": ["pizza"], "cuisine_preferences": ["italian"]},
+    },
+    {
+        "keyword": "burgers",
+        "title": "Burgers your way",
+        "bodies": [
+            "Classic or loaded, get them delivered hot and ready",
+            "Stacked burgers, cooked right and delivered",
+            "Burgers your way, hot and ready at your door",
+        ],
+        "score": 86,
+        "triggers": {"food_preferences": ["burger", "sandwich"]},
+    },
+    {
+        "keyword": "Japanese food",
+        "title": "Sushi and ramen ready",
+        "bodies": [
+            "Fresh rolls and rich broths from spots you'll want to reorder",
+            "Sushi and ramen from nearby favorites, delivered",
+            "Rolls and ramen, prepped fast from top Japanese spots",
+        ],
+        "score": 84,
+        "triggers": {"cuisine_preferences": ["japanese"], "food_preferences": ["sushi", "ramen"]},
+    },
+    {
+        "keyword": "Thai food",
+        "title": "Curry cravings",
+        "bodies": [
+            "Get bold Thai curries and stir-fries delivered in 30 min",
+            "Thai curries and stir-fries, ready to deliver",
+            "Thai flavors from nearby spots, delivered quick",
+        ],
+        "score": 82,
+        "triggers": {"cuisine_preferences": ["thai"]},
+    },
+    {
+        "keyword": "Vietnamese food",
+        "title": "Pho and more",
+        "bodies": [
+            "Fresh Vietnamese flavors from noodle soups to banh mi sandwiches",
+            "Pho and banh mi from nearby favorites, delivered",
+            "Vietnamese picks like pho and banh mi, made easy",
+        ],
+        "score": 82,
+        "triggers": {"cuisine_preferences": ["vietnamese"], "food_preferences": ["pho"]},
+    },
+    {
+        "keyword": "Indian food",
+        "title": "Curry and more",
+        "bodies": [
+            "Bold Indian flavors from tikka masala to biryani, all nearby",
+            "Biryani and tikka masala from top Indian spots",
+            "Indian favorites delivered from places you’ll reorder",
+        ],
+        "score": 82,
+        "triggers": {"cuisine_preferences": ["indian"]},
+    },
+    {
+        "keyword": "Korean food",
+        "title": "Favorites nearby",
+        "bodies": [
+            "From bibimbap to Korean fried chicken, flavors you'll love",
+            "Bibimbap and Korean fried chicken, delivered hot",
+            "Korean favorites near you, ready to deliver",
+        ],
+        "score": 82,
+        "triggers": {"cuisine_preferences": ["korean"]},
+    },
+    {
+        "keyword": "Mediterranean food",
+        "title": "Fresh picks nearby",
+        "bodies": [
+            "Fresh gyros, falafel, and hummus from spots worth reordering",
+            "Mediterranean bowls and plates from nearby favorites",
+            "Gyros, falafel, hummus - Mediterranean picks delivered",
+        ],
+        "score": 82,
+        "triggers": {"cuisine_preferences": ["mediterranean", "greek"]},
+    },
+    {
+        "keyword": "healthy food",
+        "title": "Fresh bowls nearby",
+        "bodies": [
+            "Build your perfect meal with options that keep it light",
+            "Light and fresh options ready to go",
+            "Healthy picks you can customize and deliver",
+        ],
+        "score": 80,
+        "triggers": {"food_preferences": ["salad", "healthy"]},
+    },
+    # v1.2: pricing-aware deals, boosted for value-conscious consumers (avoid specific promo phrases)
+    {
+        "keyword": "food deals",
+        "title": "Deal dropped. You're up",
+        "bodies": [
+            "Save on restaurants you order from most with deals ready now",
+            "Deals you’ll actually use from places you reorder",
+        ],
+        "score": 95,
+        "condition": "value_conscious",
+    },
+    # Lower score for balanced spenders (will likely be filtered out)
+    {
+        "keyword": "food deals",
+        "title": "Deal dropped. You're up",
+        "bodies": [
+            "Get savings on restaurants you visit most",
+            "Deals available from places you visit",
+        ],
+        "score": 78,
+        "condition": "not_value_conscious",
+    },
+    # Universal notification that works for all consumers
+    {
+        "keyword": "restaurants",
+        "title": "Your go-tos are here",
+        "bodies": ["Reorder favorites or find something new worth trying"],
+        "score": 80,
+        "condition": "always",
+    },
+]
+
+
+def _trie_pattern(terms: List[str]) -> str:
+    """
+    Build a regex alternation shaped like a trie of `terms`, so the engine walks shared
+    prefixes once instead of retrying every term at each position. Optional suffixes are
+    greedy, so the longest term starting at a position wins.
+    """
+    trie: Dict = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != '']
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            return '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+class CompiledRules:
+    """
+    Rule table compiled into one multi-pattern regex per profile field.
+
+    Each field is scanned once per profile regardless of how many rules exist. The pattern
+    is a zero-width lookahead, so overlapping terms are all seen; when one term is a prefix
+    of another, the longest match at a position also credits every shorter term it starts
+    with, which keeps plain substring semantics.
+    """
+
+    def __init__(self, rules: List[Dict]):
+        self.rules = tuple(rules)
+        term_rules: Dict[str, Dict[str, Set[int]]] = {field: {} for field in RULE_FIELDS}
+
+        for idx, rule in enumerate(self.rules):
+            triggers = rule.get("triggers") or {}
+            condition = rule.get("condition")
+            if bool(triggers) == bool(condition):
+                raise ValueError(f"Rule {rule.get('keyword')!r} needs exactly one of 'triggers' or 'condition'")
+            if condition and condition not in RULE_CONDITIONS:
+                raise ValueError(f"Rule {rule.get('keyword')!r} has unknown condition {condition!r}")
+            if not rule.get("bodies"):
+                raise ValueError(f"Rule {rule.get('keyword')!r} has no body templates")
+            for field, terms in triggers.items():
+                if field not in term_rules:
+                    raise ValueError(f"Rule {rule.get('keyword')!r} triggers on unknown field {field!r}")
+                for term in terms:
+                    term_rules[field].setdefault(term.lower(), set()).add(idx)
+
+        # field -> (compiled pattern, matched term -> rule ids incl. those of its prefix terms)
+        self._matchers = {}
+        for field, by_term in term_rules.items():
+            if not by_term:
+                continue
+            closure = {}
+            for term in by_term:
+                ids = set()
+                for other, other_ids in by_term.items():
+                    if term.startswith(other):
+                        ids |= other_ids
+                closure[term] = frozenset(ids)
+            pattern = re.compile('(?=(' + _trie_pattern(list(by_term)) + '))')
+            self._matchers[field] = (pattern, closure)
+
+        self._conditions = {
+            condition: frozenset(idx for idx, rule in enumerate(self.rules) if rule.get("condition") == condition)
+            for condition in RULE_CONDITIONS
+        }
+        self.terms_by_field = {field: sorted(by_term) for field, by_term in term_rules.items()}
+
+    def match(self, fields: Dict[str, str]) -> Set[int]:
+        """Return indices of trigger-based rules that fire for the given lowercased fields."""
+        matched: Set[int] = set()
+        for field, (pattern, closure) in self._matchers.items():
+            text = fields.get(field)
+            if not text:
+                continue
+            for m in pattern.finditer(text):
+                matched |= closure[m.group(1)]
+        return matched
+
+    def fire(self, fields: Dict[str, str], is_value: bool) -> Set[int]:
+        """Indices of every rule that applies: trigger matches plus condition rules."""
+        matched = self.match(fields)
+        matched |= self._conditions["value_conscious" if is_value else "not_value_conscious"]
+        matched |= self._conditions["always"]
+        return matched
+
+
+DEFAULT_RULES = CompiledRules(NOTIFICATION_RULES)
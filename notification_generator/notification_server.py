@@ -20,9 +20,19 @@ load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 from mcp.server import Server
 from mcp.types import Tool, TextContent, Resource
 from pydantic import AnyUrl
-import snowflake.connector
 
 from notification_generator import NotificationGenerator
+from generation_memo import GenerationMemo, DEFAULT_MEMO_SIZE
+from connection_pool import SnowflakeConnectionPool, get_snowflake_connection
+from profile_source import profile_source_from_env
+from server_metrics import LatencyMetrics, MetricsExporter
+from notification_service import (
+    NOTIFICATION_FIELDS,
+    OPTIONAL_RESPONSE_FIELDS,
+    RESPONSE_FORMATS,
+    NotificationService,
+    serialize_response,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -44,18 +54,21 @@ async def main():
     """Main entry point for the notification server"""
     server = Server("doordash-notification-generator")
     generator = NotificationGenerator()
+    # Identical profiles skip generation; results are shared, so copy before enriching
+    memo = GenerationMemo(generator, int(os.getenv('NOTIFICATION_MEMO_SIZE', DEFAULT_MEMO_SIZE)))
+    # Per-stage timings and rule/filter counters (off by default; see get_generator_stats)
+    if os.getenv('NOTIFICATION_GENERATOR_STATS', '').strip().lower() in ('1', 'true', 'yes'):
+        generator.enable_stats()
     
-    # Snowflake connection params
-    def get_snowflake_connection():
-        return snowflake.connector.connect(
-            account=os.getenv('SNOWFLAKE_ACCOUNT'),
-            user=os.getenv('SNOWFLAKE_USER'),
-            authenticator=os.getenv('SNOWFLAKE_AUTHENTICATOR'),
-            warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
-            database=os.getenv('SNOWFLAKE_DATABASE'),
-            schema=os.getenv('SNOWFLAKE_SCHEMA'),
-            role=os.getenv('SNOWFLAKE_ROLE')
-        )
+    # Snowflake (authenticated connections shared across tool calls, opened at startup by
+    # source.start below) or a local snapshot, per NOTIFICATION_PROFILE_SOURCE
+    source = profile_source_from_env(lambda: SnowflakeConnectionPool.from_env(get_snowflake_connection))
+    # Per-tool and per-phase latency histograms, optionally exported (NOTIFICATION_METRICS_PORT / _FILE)
+    latency = LatencyMetrics()
+    exporter = MetricsExporter.from_env(latency)
+    # Tool logic; blocking profile lookups run on its executor (NOTIFICATION_SERVER_MAX_CONCURRENCY)
+    service = NotificationService(generator, memo, keyword_to_image=KEYWORD_TO_IMAGE, source=source,
+                                  latency=latency)
     
     # List available tools
     @server.list_tools()
@@ -80,11 +93,58 @@ async def main():
                             "type": "integer",
                             "description": "Maximum number of notifications to return (default: 10)",
                             "default": 10
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": RESPONSE_FORMATS,
+                            "description": "Response encoding: pretty (indented JSON), compact (JSON without whitespace) or ndjson (one line per notification) (default: pretty)",
+                            "default": "pretty"
+                        },
+                        "fields": {
+                            "type": "array",
+                            "items": {"type": "string", "enum": NOTIFICATION_FIELDS + OPTIONAL_RESPONSE_FIELDS},
+                            "description": "Only include these notification fields (and profile_summary if listed); default: all"
                         }
                     },
                     "required": ["consumer_id"]
                 }
             ),
+            Tool(
+                name="generate_notifications_batch",
+                description="Generate personalized DoorDash push notifications for many consumers in one call. Profiles are fetched with a few batched Snowflake queries. Returns JSON with per-consumer results and per-consumer errors.",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "consumer_ids": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Consumer IDs to generate notifications for"
+                        },
+                        "min_score": {
+                            "type": "integer",
+                            "description": "Minimum score threshold (default: 80)",
+                            "default": 80
+                        },
+                        "max_count": {
+                            "type": "integer",
+                            "description": "Maximum number of notifications per consumer (default: 10)",
+                            "default": 10
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": RESPONSE_FORMATS,
+                            "description": "Response encoding: pretty (indented JSON), compact (JSON without whitespace) or ndjson (one line per notification) (default: pretty)",
+                            "default": "pretty"
+                        },
+                        "fields": {
+                            "type": "array",
+                            "items": {"type": "string", "enum": NOTIFICATION_FIELDS + OPTIONAL_RESPONSE_FIELDS},
+                            "description": "Only include these notification fields (and profile_summary if listed); default: all"
+                        }
+                    },
+                    "required": ["consumer_ids"]
+                }
+            ),
             Tool(
                 name="validate_notification",
                 description="Validate a notification against DoorDash brand guidelines and format restrictions. Checks title length, body length, and compliance with all content rules.",
@@ -102,102 +162,141 @@ async def main():
                     },
                     "required": ["title", "body"]
                 }
+            ),
+            Tool(
+                name="invalidate_profile_cache",
+                description="Drop cached consumer profiles so the next request re-reads them from Snowflake. Pass consumer_ids to drop specific consumers, or omit it to clear the whole cache.",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "consumer_ids": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Consumer IDs to invalidate (default: all)"
+                        }
+                    }
+                }
+            ),
+            Tool(
+                name="get_server_metrics",
+                description="Report server metrics: per-tool and per-phase (connect, query, decode, generate, serialize) latency p50/p90/p99 and error counts, profile source (Snowflake connection pool size, utilization and wait times and profile query compile/execute times, or snapshot lookup times), in-flight profile I/O, profile cache and generation memo hit rates. format=prometheus returns the latency histograms and error counters in Prometheus text format.",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "format": {
+                            "type": "string",
+                            "enum": ["json", "prometheus"],
+                            "description": "json (default): all server metrics; prometheus: latency histograms and error counters in Prometheus text exposition format",
+                            "default": "json"
+                        }
+                    }
+                }
+            ),
+            Tool(
+                name="get_generator_stats",
+                description="Report where generation time goes and what fires: cumulative time per generator stage (rule matching, candidates, score filter, dietary and mild spicy guardrails, top-N, enrichment), candidates in and out of each filter, and hit counts per rule. Recording is off unless NOTIFICATION_GENERATOR_STATS=1 or enable is passed.",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "enable": {
+                            "type": "boolean",
+                            "description": "Turn recording on (true) or off (false) before reporting"
+                        },
+                        "reset": {
+                            "type": "boolean",
+                            "description": "Start the counts over after this report (default: false)",
+                            "default": False
+                        }
+                    }
+                }
             )
         ]
     
     # Handle tool calls
     @server.call_tool()
     async def call_tool(name: str, arguments: Any) -> list[TextContent]:
+        # Every call lands in the per-tool latency histogram; failures in the error counters
+        with latency.tool(name) as call:
+            return await dispatch_tool(name, arguments or {}, call)
+    
+    def respond(data, output_format: str = "pretty", ensure_ascii: bool = True) -> list[TextContent]:
+        with latency.phase("serialize"):
+            text = serialize_response(data, output_format, ensure_ascii=ensure_ascii)
+        return [TextContent(type="text", text=text)]
+    
+    async def dispatch_tool(name: str, arguments: Any, call) -> list[TextContent]:
         if name == "generate_consumer_notifications":
             consumer_id = arguments.get("consumer_id")
             min_score = arguments.get("min_score", 80)
             max_count = arguments.get("max_count", 10)
             
-            try:
-                # Connect to Snowflake
-                conn = get_snowflake_connection()
-                cursor = conn.cursor()
-                
-                # Query profile from SHADOW table (default), allow override via env TABLE
-                table = os.getenv('GENAI_PROFILE_TABLE', 'PRODDB.ML.GENAI_CX_PROFILE_SHADOW')
-                query = f"SELECT CONSUMER_ID, PROFILE FROM {table} WHERE CONSUMER_ID = {consumer_id}"
-                cursor.execute(query)
-                result = cursor.fetchone()
-                
-                if not result:
-                    return [TextContent(
-                        type="text",
-                        text=json.dumps({
-                            "consumer_id": consumer_id,
-                            "status": "error",
-                            "message": f"No profile found for consumer {consumer_id}",
-                            "notifications": []
-                        }, indent=2)
-                    )]
-                
-                _, profile_json = result
-                profile = json.loads(profile_json)
-                
-                # Generate notifications
-                notifications = generator.generate_notifications(profile, min_score, max_count)
-                
-                # Add URLs and image URLs
-                for notif in notifications:
-                    keyword = notif.get('keyword', '') or ''
-                    notif['url'] = generator.format_for_doordash_url(keyword)
-                    image_url = KEYWORD_TO_IMAGE.get(keyword.lower()) if keyword else None
-                    if image_url:
-                        notif['image_url'] = image_url
-                    notif['title_length'] = len(notif['title'])
-                    notif['body_length'] = len(notif['body'])
-                
-                overall = profile.get('overall_profile', {})
-                dietary = overall.get('dietary_preferences', {})
-                
-                result_data = {
+            output_format = arguments.get("format", "pretty")
+            if output_format not in RESPONSE_FORMATS:
+                call.error("invalid_request")
+                return respond({
                     "consumer_id": consumer_id,
-                    "status": "success",
-                    "profile_summary": {
-                        "cuisines": overall.get('cuisine_preferences', '')[:100],
-                        "foods": overall.get('food_preferences', '')[:100],
-                        "taste": overall.get('taste_preference', '')[:80],
-                        "dietary": dietary.get('preferred_dietary_preference', 'none')
-                    },
-                    "notifications": notifications,
-                    "count": len(notifications),
-                    "avg_score": sum(n['score'] for n in notifications) / len(notifications) if notifications else 0
-                }
-                
-                cursor.close()
-                conn.close()
-                
-                return [TextContent(
-                    type="text",
-                    text=json.dumps(result_data, indent=2, ensure_ascii=False)
-                )]
-                
-            except Exception as e:
-                logger.error(f"Error generating notifications: {e}")
-                return [TextContent(
-                    type="text",
-                    text=json.dumps({
-                        "consumer_id": consumer_id,
-                        "status": "error",
-                        "message": str(e)
-                    }, indent=2)
-                )]
+                    "status": "error",
+                    "message": f"Unknown format {output_format!r} (allowed: {', '.join(RESPONSE_FORMATS)})"
+                })
+            
+            # Profile fetch runs on the Snowflake I/O threads; the event loop keeps serving other calls
+            result_data = await service.generate_consumer_notifications(
+                consumer_id, min_score, max_count, arguments.get("fields")
+            )
+            if result_data["status"] != "success":
+                call.error()
+            
+            return respond(result_data, output_format, ensure_ascii=result_data["status"] != "success")
+        
+        elif name == "generate_notifications_batch":
+            consumer_ids = arguments.get("consumer_ids") or []
+            min_score = arguments.get("min_score", 80)
+            max_count = arguments.get("max_count", 10)
+            
+            output_format = arguments.get("format", "pretty")
+            if output_format not in RESPONSE_FORMATS:
+                call.error("invalid_request")
+                return respond({
+                    "status": "error",
+                    "message": f"Unknown format {output_format!r} (allowed: {', '.join(RESPONSE_FORMATS)})"
+                })
+            
+            result_data = await service.generate_notifications_batch(
+                consumer_ids, min_score, max_count, arguments.get("fields")
+            )
+            if result_data["status"] != "success":
+                call.error()
+            call.error("consumer", result_data.get("error_count", 0))
+            
+            return respond(result_data, output_format, ensure_ascii=False)
         
         elif name == "validate_notification":
             title = arguments.get("title", "")
             body = arguments.get("body", "")
             
-            result = generator.validate_notification(title, body)
+            result = service.validate_notification(title, body)
+            
+            return respond(result)
+        
+        elif name == "invalidate_profile_cache":
+            result = service.invalidate_profiles(arguments.get("consumer_ids"))
+            if result["status"] != "success":
+                call.error("invalid_request")
+            
+            return respond(result)
+        
+        elif name == "get_server_metrics":
+            if arguments.get("format") == "prometheus":
+                return [TextContent(type="text", text=latency.render_prometheus())]
+            await service.collect_query_timings()
+            return respond(service.metrics())
+        
+        elif name == "get_generator_stats":
+            result = service.generator_stats(arguments.get("enable"), bool(arguments.get("reset", False)))
             
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, indent=2)
-            )]
+            return respond(result)
         
+        call.error("unknown_tool")
         return [TextContent(type="text", text="Unknown tool")]
     
     # List resources
@@ -265,14 +364,21 @@ URLs include: &filterQuery-deals-fill=true"""
     from mcp.server.stdio import stdio_server
     
     logger.info("Starting DoorDash Notification Generator MCP Server v1.1...")
-    logger.info(f"Connected to Snowflake: {os.getenv('SNOWFLAKE_DATABASE')}")
+    source.start()
+    logger.info(f"Profile source: {source.name}")
+    exporter.start()
     
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options()
-        )
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                server.create_initialization_options()
+            )
+    finally:
+        exporter.close()
+        service.close()
+        source.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,484 @@
+"""
+Tool logic behind the notification MCP server.
+
+Kept free of MCP imports so it can be driven directly (benchmarks, other front ends).
+Profiles come from a ProfileSource (Snowflake or a local snapshot, see profile_source.py).
+Blocking lookups run on a dedicated thread pool, so a slow query never stalls the server's
+event loop; a semaphore caps how many profile fetches are in flight at once. Only the fields
+generation reads are decoded from each PROFILE (see profile_features.py) and cached (see
+profile_cache.py), so repeat requests don't touch the warehouse.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from profile_cache import MISS, STALE, ProfileCache
+from profile_features import ProfileFeatures, as_features, decode_profile
+from profile_queries import DEFAULT_BATCH_CHUNK_SIZE, InvalidConsumerId, ProfileQueries, validate_consumer_id
+from profile_source import ProfileSource, SnowflakeProfileSource
+from server_metrics import LatencyMetrics
+from single_flight import SingleFlight
+
+logger = logging.getLogger("notification-server")
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+# Response encodings for the generate tools
+RESPONSE_FORMATS = ["pretty", "compact", "ndjson"]
+# Per-notification fields a `fields` projection may select, in output order
+NOTIFICATION_FIELDS = ["title", "body", "keyword", "score", "url", "image_url", "title_length", "body_length"]
+# Response-level fields that are only included when projected (or when no projection is given)
+OPTIONAL_RESPONSE_FIELDS = ["profile_summary"]
+
+
+def normalize_fields(fields: Optional[List[str]]) -> Optional[Tuple[str, ...]]:
+    """Validate a `fields` projection; None means every field."""
+    if fields is None:
+        return None
+    unknown = [f for f in fields if f not in NOTIFICATION_FIELDS and f not in OPTIONAL_RESPONSE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(map(str, unknown))} "
+                         f"(allowed: {', '.join(NOTIFICATION_FIELDS + OPTIONAL_RESPONSE_FIELDS)})")
+    # Keep the canonical order so equal projections share coalesced work and produce identical output
+    wanted = set(fields)
+    return tuple(f for f in NOTIFICATION_FIELDS + OPTIONAL_RESPONSE_FIELDS if f in wanted)
+
+
+def serialize_response(data: Dict, output_format: str = "pretty", ensure_ascii: bool = False) -> str:
+    """
+    Encode a tool response.
+
+    pretty: indented JSON (the original output); compact: JSON without whitespace;
+    ndjson: one compact line per notification tagged with consumer_id, and one line per
+    error (batch responses are flattened the same way).
+    """
+    if output_format == "pretty":
+        return json.dumps(data, indent=2, ensure_ascii=ensure_ascii)
+    if output_format == "compact":
+        return json.dumps(data, separators=(',', ':'), ensure_ascii=ensure_ascii)
+    if output_format != "ndjson":
+        raise ValueError(f"Unknown format {output_format!r} (allowed: {', '.join(RESPONSE_FORMATS)})")
+
+    encode = json.JSONEncoder(separators=(',', ':'), ensure_ascii=ensure_ascii).encode
+    lines = []
+    for result in data.get("results", [data]):
+        if result.get("status") != "success":
+            lines.append(encode(result))
+            continue
+        consumer_id = result["consumer_id"]
+        for notif in result["notifications"]:
+            lines.append(encode({"consumer_id": consumer_id, **notif}))
+    for error in data.get("errors", []):
+        lines.append(encode({"status": "error", **error}))
+    return "\n".join(lines)
+
+
+async def _no_rows():
+    return {}, {}
+
+
+class NotificationService:
+    """Async tool implementations over a generator, its memo and a profile source (or Snowflake pool)."""
+
+    def __init__(
+        self,
+        generator,
+        memo,
+        pool=None,
+        keyword_to_image: Optional[Dict[str, str]] = None,
+        max_concurrency: Optional[int] = None,
+        table: Optional[str] = None,
+        profile_cache: Optional[ProfileCache] = None,
+        source: Optional[ProfileSource] = None,
+        latency: Optional[LatencyMetrics] = None,
+    ):
+        self.generator = generator
+        self.memo = memo
+        self.keyword_to_image = keyword_to_image if keyword_to_image is not None else generator.keyword_to_image
+        # Catalog entries already carry url and image_url for the generator's image map
+        self._catalog_images = self.keyword_to_image == generator.keyword_to_image
+        self.max_concurrency = max_concurrency or int(
+            os.getenv('NOTIFICATION_SERVER_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY)
+        )
+        if source is None:
+            # Bind-parameterized lookups on GENAI_PROFILE_TABLE (shadow table by default)
+            source = SnowflakeProfileSource(pool, ProfileQueries(
+                table, int(os.getenv('NOTIFICATION_BATCH_CHUNK_SIZE', DEFAULT_BATCH_CHUNK_SIZE))
+            ))
+        self.source = source
+        # Phase latency histograms (connect/query from the source; decode and generate here)
+        self.latency = latency or LatencyMetrics()
+        source.set_latency_metrics(self.latency)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="snowflake-io")
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._in_flight = 0
+        # Decoded profiles (ProfileFeatures) by consumer id; stale entries are served while refreshed in the background
+        self.profile_cache = profile_cache if profile_cache is not None else ProfileCache.from_env()
+        self._refreshing = set()
+        self._background = set()
+        # Concurrent identical requests share one profile fetch / one generation
+        self._profile_flight = SingleFlight()
+        self._generation_flight = SingleFlight()
+
+    async def run_blocking(self, fn: Callable, *args) -> Any:
+        """Run blocking profile I/O on the dedicated thread pool, at most max_concurrency at a time."""
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, fn, *args)
+            finally:
+                self._in_flight -= 1
+
+    async def fetch_profile(self, consumer_id) -> Optional[tuple]:
+        """(CONSUMER_ID, PROFILE) row for a consumer, or None."""
+        return await self.run_blocking(self.source.fetch_one, consumer_id)
+
+    async def fetch_profiles(self, consumer_ids: List) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Fetch many profiles in chunks (chunked IN queries on Snowflake; chunks run concurrently).
+
+        Takes validated ids (see profile_key). Returns (PROFILE JSON by consumer id, error message
+        by consumer id), keyed by the id as a string.
+        """
+        chunks = self.source.chunks(consumer_ids)
+        results = await asyncio.gather(
+            *(self.run_blocking(self.source.fetch_many, chunk) for chunk in chunks),
+            return_exceptions=True,
+        )
+        profiles: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+        for chunk, rows in zip(chunks, results):
+            if isinstance(rows, BaseException):
+                logger.error(f"Error fetching {len(chunk)} profiles: {rows}")
+                errors.update((str(consumer_id), str(rows)) for consumer_id in chunk)
+                continue
+            for row_id, profile_json in rows:
+                profiles[str(row_id)] = profile_json
+        return profiles, errors
+
+    @staticmethod
+    def profile_key(consumer_id) -> str:
+        """Validated, normalized consumer id used for queries, caching and coalescing."""
+        return str(validate_consumer_id(consumer_id))
+
+    async def get_profile(self, consumer_id) -> Optional[ProfileFeatures]:
+        """Decoded profile from the cache (stale entries are refreshed in the background) or the profile source."""
+        key = self.profile_key(consumer_id)
+        profile, state = self.profile_cache.get(key)
+        if state == STALE:
+            self._refresh_in_background([key])
+        if state != MISS:
+            return profile
+        return await self._profile_flight.do(key, lambda: self._load_profile(key))
+
+    async def _load_profile(self, key: str) -> Optional[ProfileFeatures]:
+        result = await self.fetch_profile(key)
+        if not result:
+            return None
+        profile = self.decode(result[1])
+        self.profile_cache.put(key, profile)
+        return profile
+
+    async def get_profiles(self, consumer_ids: List[str]) -> Tuple[Dict[str, ProfileFeatures], Dict[str, str]]:
+        """Decoded profiles for many consumers; only cache misses reach the profile source."""
+        profiles: Dict[str, ProfileFeatures] = {}
+        missing = []
+        stale = []
+        for key in consumer_ids:
+            profile, state = self.profile_cache.get(key)
+            if state == MISS:
+                missing.append(key)
+                continue
+            profiles[key] = profile
+            if state == STALE:
+                stale.append(key)
+        if stale:
+            self._refresh_in_background(stale)
+        if not missing:
+            return profiles, {}
+
+        # Join single-consumer fetches already in flight instead of querying those ids again
+        joined = [key for key in missing if self._profile_flight.pending(key) is not None]
+        if joined:
+            missing = [key for key in missing if self._profile_flight.pending(key) is None]
+        joined_results = asyncio.gather(
+            *(self._profile_flight.do(key, lambda key=key: self._load_profile(key)) for key in joined),
+            return_exceptions=True,
+        )
+        (profile_jsons, errors), joined_profiles = await asyncio.gather(
+            self.fetch_profiles(missing) if missing else _no_rows(), joined_results
+        )
+        for key, profile in zip(joined, joined_profiles):
+            if isinstance(profile, BaseException):
+                errors[key] = str(profile)
+            elif profile is not None:
+                profiles[key] = profile
+
+        for key, profile_json in profile_jsons.items():
+            try:
+                profiles[key] = self.decode(profile_json)
+            except Exception as e:
+                errors[key] = str(e)
+                continue
+            self.profile_cache.put(key, profiles[key])
+        return profiles, errors
+
+    def decode(self, profile_json) -> ProfileFeatures:
+        with self.latency.phase("decode"):
+            return decode_profile(profile_json)
+
+    def _refresh_in_background(self, keys: List[str]):
+        keys = [key for key in keys if key not in self._refreshing]
+        if not keys:
+            return
+        self._refreshing.update(keys)
+        task = asyncio.get_running_loop().create_task(self._refresh(keys))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _refresh(self, keys: List[str]):
+        try:
+            profile_jsons, errors = await self.fetch_profiles(keys)
+            for key in keys:
+                if key in errors:
+                    self.profile_cache.record_refresh(False)
+                    continue
+                profile_json = profile_jsons.get(key)
+                if profile_json is None:
+                    # Profile no longer exists
+                    self.profile_cache.invalidate([key])
+                    self.profile_cache.record_refresh(True)
+                    continue
+                try:
+                    self.profile_cache.put(key, self.decode(profile_json))
+                    self.profile_cache.record_refresh(True)
+                except Exception as e:
+                    logger.warning(f"Failed to refresh profile {key}: {e}")
+                    self.profile_cache.record_refresh(False)
+        finally:
+            self._refreshing.difference_update(keys)
+
+    def invalidate_profiles(self, consumer_ids: Optional[List] = None) -> Dict:
+        """Drop cached profiles for the given consumers, or all of them."""
+        if consumer_ids is None:
+            keys = None
+        else:
+            try:
+                keys = [self.profile_key(consumer_id) for consumer_id in consumer_ids]
+            except InvalidConsumerId as e:
+                return {"status": "error", "message": str(e)}
+        return {"status": "success", "invalidated": self.profile_cache.invalidate(keys)}
+
+    async def generate_consumer_notifications(self, consumer_id, min_score: int = 80, max_count: int = 10,
+                                              fields: Optional[List[str]] = None) -> Dict:
+        try:
+            fields = normalize_fields(fields)
+            profile_key = self.profile_key(consumer_id)
+        except ValueError as e:
+            return {"consumer_id": consumer_id, "status": "error", "message": str(e)}
+        key = (profile_key, min_score, max_count, fields)
+        # Coalesced callers share the response (treat it as read-only) built for the normalized
+        # id; each gets its own consumer_id back
+        response = await self._generation_flight.do(
+            key, lambda: self._generate_consumer_notifications(profile_key, min_score, max_count, fields)
+        )
+        return {**response, "consumer_id": consumer_id}
+
+    async def _generate_consumer_notifications(self, consumer_id, min_score: int, max_count: int,
+                                               fields: Optional[Tuple[str, ...]]) -> Dict:
+        try:
+            profile = await self.get_profile(consumer_id)
+
+            if profile is None:
+                return {
+                    "consumer_id": consumer_id,
+                    "status": "error",
+                    "message": f"No profile found for consumer {consumer_id}",
+                    "notifications": []
+                }
+
+            return self.build_response(consumer_id, profile, min_score, max_count, fields)
+
+        except Exception as e:
+            logger.error(f"Error generating notifications: {e}")
+            return {
+                "consumer_id": consumer_id,
+                "status": "error",
+                "message": str(e)
+            }
+
+    async def generate_notifications_batch(self, consumer_ids: List, min_score: int = 80, max_count: int = 10,
+                                           fields: Optional[List[str]] = None) -> Dict:
+        """Generate for many consumers in a handful of warehouse round trips."""
+        try:
+            fields = normalize_fields(fields)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        # Validate up front; malformed ids never reach the warehouse
+        ids = []
+        errors = []
+        for consumer_id in consumer_ids or []:
+            try:
+                ids.append(self.profile_key(consumer_id))
+            except InvalidConsumerId as e:
+                errors.append({"consumer_id": consumer_id, "message": str(e)})
+        # De-duplicate, keeping request order
+        ids = list(dict.fromkeys(ids))
+        requested = len(ids) + len(errors)
+        profiles, fetch_errors = await self.get_profiles(ids) if ids else ({}, {})
+
+        results = []
+        for consumer_id in ids:
+            if consumer_id in fetch_errors:
+                errors.append({"consumer_id": consumer_id, "message": fetch_errors[consumer_id]})
+                continue
+            profile = profiles.get(consumer_id)
+            if profile is None:
+                errors.append({"consumer_id": consumer_id, "message": f"No profile found for consumer {consumer_id}"})
+                continue
+            try:
+                results.append(self.build_response(consumer_id, profile, min_score, max_count, fields))
+            except Exception as e:
+                errors.append({"consumer_id": consumer_id, "message": str(e)})
+
+        return {
+            "status": "success" if results or not errors else "error",
+            "requested": requested,
+            "count": len(results),
+            "error_count": len(errors),
+            "results": results,
+            "errors": errors,
+        }
+
+    def build_response(self, consumer_id, profile: Union[ProfileFeatures, Dict], min_score: int, max_count: int,
+                       fields: Optional[Tuple[str, ...]] = None) -> Dict:
+        """
+        Generate (memoized) and enrich notifications for one decoded (or parsed dict) profile.
+
+        With a `fields` projection (see normalize_fields) only the requested notification
+        fields and the profile summary if asked for are built.
+        """
+        with self.latency.phase("generate"):
+            return self._build_response(consumer_id, profile, min_score, max_count, fields)
+
+    def _build_response(self, consumer_id, profile: Union[ProfileFeatures, Dict], min_score: int, max_count: int,
+                        fields: Optional[Tuple[str, ...]] = None) -> Dict:
+        profile = as_features(profile)
+        generated = self.memo.generate_from_fields(profile, min_score, max_count)
+        if fields is not None:
+            return self._build_projected_response(consumer_id, profile, generated, fields)
+
+        notifications = [dict(n) for n in generated]
+
+        # url and image_url come from the catalog entry unless this service has its own image map
+        for notif in notifications:
+            if not self._catalog_images:
+                keyword = notif.get('keyword', '') or ''
+                image_url = self.keyword_to_image.get(keyword.lower()) if keyword else None
+                if image_url:
+                    notif['image_url'] = image_url
+            notif['title_length'] = len(notif['title'])
+            notif['body_length'] = len(notif['body'])
+
+        return {
+            "consumer_id": consumer_id,
+            "status": "success",
+            "profile_summary": self.profile_summary(profile),
+            "notifications": notifications,
+            "count": len(notifications),
+            "avg_score": sum(n['score'] for n in notifications) / len(notifications) if notifications else 0
+        }
+
+    def _build_projected_response(self, consumer_id, profile: ProfileFeatures, generated,
+                                  fields: Tuple[str, ...]) -> Dict:
+        notifications = []
+        for n in generated:
+            keyword = n.get('keyword', '') or ''
+            notif = {}
+            for field in fields:
+                if field == 'image_url' and not self._catalog_images:
+                    notif['image_url'] = (self.keyword_to_image.get(keyword.lower()) if keyword else None) \
+                        or n.get('image_url')
+                elif field == 'title_length':
+                    notif['title_length'] = len(n['title'])
+                elif field == 'body_length':
+                    notif['body_length'] = len(n['body'])
+                elif field in NOTIFICATION_FIELDS:
+                    notif[field] = n.get(field)
+            notifications.append(notif)
+
+        response = {"consumer_id": consumer_id, "status": "success"}
+        if 'profile_summary' in fields:
+            response["profile_summary"] = self.profile_summary(profile)
+        response["notifications"] = notifications
+        response["count"] = len(generated)
+        response["avg_score"] = sum(n['score'] for n in generated) / len(generated) if generated else 0
+        return response
+
+    @staticmethod
+    def profile_summary(profile: Union[ProfileFeatures, Dict]) -> Dict:
+        features = as_features(profile)
+        return {
+            "cuisines": features.cuisine_preferences[:100],
+            "foods": features.food_preferences[:100],
+            "taste": features.taste_preference[:80],
+            "dietary": 'none' if features.dietary is None else features.dietary
+        }
+
+    async def collect_query_timings(self) -> int:
+        """Best effort: pull Snowflake compile/execute times for recent profile queries."""
+        try:
+            return await self.run_blocking(self.source.collect_server_timings)
+        except Exception as e:
+            logger.warning(f"Could not collect query timings: {e}")
+            return 0
+
+    def validate_notification(self, title: str, body: str) -> Dict:
+        return self.generator.validate_notification(title, body)
+
+    def generator_stats(self, enable: Optional[bool] = None, reset: bool = False) -> Dict:
+        """
+        Generator stage timings, filter counts and rule hits (see generator_stats.py).
+
+        `enable` switches recording on or off first; `reset` starts the counts over after this
+        snapshot. Memo hits skip generation, so the counts cover memo misses only.
+        """
+        if enable is True:
+            self.generator.enable_stats()
+        elif enable is False:
+            self.generator.disable_stats()
+        # Snapshot and reset the same object, even if stats are switched off meanwhile
+        stats = self.generator.stats
+        snapshot = {"enabled": False} if stats is None else {"enabled": True, **stats.snapshot()}
+        if reset and stats is not None:
+            stats.reset()
+        snapshot["generation_memo"] = self.memo.stats()
+        return snapshot
+
+    def metrics(self) -> Dict:
+        return {
+            "profile_source": self.source.stats(),
+            "generation_memo": self.memo.stats(),
+            "profile_cache": self.profile_cache.stats(),
+            "latency": self.latency.snapshot(),
+            "coalescing": {
+                "profile_fetch": self._profile_flight.stats(),
+                "generation": self._generation_flight.stats(),
+            },
+            "snowflake_io": {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self._in_flight,
+            },
+        }
+
+    def close(self):
+        for task in list(self._background):
+            task.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,261 @@
+"""
+Compiled brand-guideline validator for notification copy.
+
+Issues are expressed as bits, in the order validate_notification reports them. The content
+rules (exclamation points, hashtags, 'DoorDash', overly salesy words, meal times, 'authentic')
+are flattened into one table of needles, so each title or body is lowercased once and searched
+once per needle, with a rule skipped as soon as it has fired. Matching is substring-based, like
+the original `word in text.lower()` checks: 'savor' flags "savory".
+
+validate_frame checks the title and body columns of a whole DataFrame (e.g. an exported
+notifications CSV). Title and body rules don't interact, so each distinct title and each
+distinct body is validated once and the per-row issue masks are ORed from them. With pyarrow
+installed, the distinct values are matched in bulk: one regex pass over all of them finds the
+ones with any content issue, and only those are matched rule by rule.
+
+  python notification_validation.py ../examples/notifications_with_pricing.csv
+  python notification_validation.py export.csv --out issues.csv --title-column title_localized --body-column body_localized
+"""
+
+import argparse
+import logging
+import re
+import sys
+import time
+from typing import Dict, List, Sequence
+
+logger = logging.getLogger("notification-validation")
+
+ISSUE_TITLE_TOO_LONG = 1 << 0
+ISSUE_BODY_TOO_LONG = 1 << 1
+ISSUE_EXCLAMATION = 1 << 2
+ISSUE_END_PUNCTUATION = 1 << 3
+ISSUE_HASHTAG = 1 << 4
+ISSUE_MENTIONS_DOORDASH = 1 << 5
+ISSUE_SALESY = 1 << 6
+ISSUE_MEAL_TIME = 1 << 7
+ISSUE_AUTHENTIC = 1 << 8
+
+TITLE_MAX_LENGTH = 35  # titles must be shorter than this
+BODY_MAX_LENGTH = 140
+
+# Issue bit -> (code, message), in report order; length messages are formatted with the length
+ISSUES = {
+    ISSUE_TITLE_TOO_LONG: ("title_too_long", "Title too long: {}/35 characters"),
+    ISSUE_BODY_TOO_LONG: ("body_too_long", "Body too long: {}/140 characters"),
+    ISSUE_EXCLAMATION: ("exclamation", "Contains exclamation points"),
+    ISSUE_END_PUNCTUATION: ("end_punctuation", "Title has end punctuation"),
+    ISSUE_HASHTAG: ("hashtag", "Contains hashtags"),
+    ISSUE_MENTIONS_DOORDASH: ("mentions_doordash", "Mentions DoorDash"),
+    ISSUE_SALESY: ("salesy", "Contains overly salesy language"),
+    ISSUE_MEAL_TIME: ("meal_time", "Infers meal time"),
+    ISSUE_AUTHENTIC: ("authentic", "Uses 'authentic' descriptor"),
+}
+
+HYPERBOLIC_WORDS = ('mouthwatering', 'scrumptious', 'tantalizing', 'tempting', 'indulge', 'savor')
+MEAL_TIME_WORDS = ('breakfast', 'brunch', 'lunch', 'dinner')
+
+TITLE_END_PUNCTUATION = '.,:;'
+
+# (needle, issue bit): matched against the text as is, then against text.lower()
+_CASE_SENSITIVE_NEEDLES = (('!', ISSUE_EXCLAMATION), ('#', ISSUE_HASHTAG), ('DoorDash', ISSUE_MENTIONS_DOORDASH))
+_LOWERCASE_NEEDLES = tuple(
+    [(word, ISSUE_SALESY) for word in HYPERBOLIC_WORDS]
+    + [(word, ISSUE_MEAL_TIME) for word in MEAL_TIME_WORDS]
+    + [('authentic', ISSUE_AUTHENTIC)]
+)
+
+# Code point (besides the ASCII capital) whose str.lower() is an ASCII letter: KELVIN SIGN -> 'k'.
+# (U+0130 lowers to 'i' + a combining dot, which can't complete any of the words above.)
+_LOWER_TO_ASCII = {'k': '\u212a'}
+
+
+def _lowercase_pattern(word: str) -> str:
+    """Regex matching exactly where `word in text.lower()` would, without lowercasing the text."""
+    return ''.join(f"[{c}{c.upper()}{_LOWER_TO_ASCII.get(c, '')}]" for c in word)
+
+
+# Issue bit -> regex over the original text, for the bulk (RE2) path in validate_frame. Letter
+# classes rather than a case-insensitive flag keep results identical to lower() (RE2's (?i) would
+# also match e.g. LATIN SMALL LONG S as 's').
+_CONTENT_PATTERNS: Dict[int, str] = {}
+for _needle, _bit in _CASE_SENSITIVE_NEEDLES:
+    _CONTENT_PATTERNS[_bit] = re.escape(_needle)
+for _needle, _bit in _LOWERCASE_NEEDLES:
+    _pattern = _lowercase_pattern(_needle)
+    _CONTENT_PATTERNS[_bit] = f"{_CONTENT_PATTERNS[_bit]}|{_pattern}" if _bit in _CONTENT_PATTERNS else _pattern
+_ANY_CONTENT_PATTERN = '|'.join(_CONTENT_PATTERNS.values())
+
+
+def content_mask(text: str) -> int:
+    """Content-rule issue bits for one title or body; lowercases it once."""
+    mask = 0
+    for needle, bit in _CASE_SENSITIVE_NEEDLES:
+        if needle in text:
+            mask |= bit
+    lowered = text.lower()
+    for needle, bit in _LOWERCASE_NEEDLES:
+        if not mask & bit and needle in lowered:
+            mask |= bit
+    return mask
+
+
+def content_masks(values: Sequence[str]):
+    """content_mask for many strings, as an int64 array; bulk regex matching when pyarrow is installed."""
+    import numpy as np
+
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        return np.fromiter((content_mask(value) for value in values), dtype=np.int64, count=len(values))
+
+    masks = np.zeros(len(values), dtype=np.int64)
+    texts = pa.array(values, type=pa.string())
+    flagged = np.flatnonzero(pc.match_substring_regex(texts, _ANY_CONTENT_PATTERN).to_numpy(zero_copy_only=False))
+    if len(flagged):
+        texts = texts.take(flagged)
+        for bit, pattern in _CONTENT_PATTERNS.items():
+            hits = pc.match_substring_regex(texts, pattern).to_numpy(zero_copy_only=False)
+            masks[flagged[hits]] |= bit
+    return masks
+
+
+def title_mask(title: str) -> int:
+    mask = content_mask(title)
+    if len(title) >= TITLE_MAX_LENGTH:
+        mask |= ISSUE_TITLE_TOO_LONG
+    if title and title[-1] in TITLE_END_PUNCTUATION:
+        mask |= ISSUE_END_PUNCTUATION
+    return mask
+
+
+def body_mask(body: str) -> int:
+    mask = content_mask(body)
+    if len(body) > BODY_MAX_LENGTH:
+        mask |= ISSUE_BODY_TOO_LONG
+    return mask
+
+
+def issue_mask(title: str, body: str) -> int:
+    """Every issue bit for a notification; 0 means valid."""
+    return title_mask(title) | body_mask(body)
+
+
+def issue_codes(mask: int) -> List[str]:
+    """Issue codes set in `mask`, in report order."""
+    return [code for bit, (code, _) in ISSUES.items() if mask & bit]
+
+
+def validate_notification(title: str, body: str) -> Dict:
+    """Validate a notification against DoorDash guidelines."""
+    mask = issue_mask(title, body)
+    issues = []
+    if mask:
+        for bit, (_, message) in ISSUES.items():
+            if mask & bit:
+                if bit == ISSUE_TITLE_TOO_LONG:
+                    message = message.format(len(title))
+                elif bit == ISSUE_BODY_TOO_LONG:
+                    message = message.format(len(body))
+                issues.append(message)
+    return {
+        "is_valid": not issues,
+        "title_length": len(title),
+        "body_length": len(body),
+        "issues": issues
+    }
+
+
+def validate_frame(df, title_column: str = "title", body_column: str = "body"):
+    """
+    validate_notification for every row of a DataFrame.
+
+    Returns a DataFrame on the same index with title_length, body_length, issues (the issue
+    bitmask), issue_codes (';'-separated, empty when valid) and is_valid. Missing titles or
+    bodies count as empty strings.
+    """
+    import numpy as np
+    import pandas as pd
+
+    def per_distinct(column: str, title: bool):
+        """(issue mask, length) per row, computed once per distinct value."""
+        codes, values = pd.factorize(df[column].fillna('').astype(str))
+        values = values.tolist()
+        masks = content_masks(values)
+        lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+        if title:
+            masks[lengths >= TITLE_MAX_LENGTH] |= ISSUE_TITLE_TOO_LONG
+            ends = np.fromiter((bool(value) and value[-1] in TITLE_END_PUNCTUATION for value in values),
+                               dtype=bool, count=len(values))
+            masks[ends] |= ISSUE_END_PUNCTUATION
+        else:
+            masks[lengths > BODY_MAX_LENGTH] |= ISSUE_BODY_TOO_LONG
+        return masks[codes], lengths[codes]
+
+    title_masks, title_lengths = per_distinct(title_column, True)
+    body_masks, body_lengths = per_distinct(body_column, False)
+    masks = title_masks | body_masks
+    distinct_masks = np.unique(masks)
+    labels = pd.Series([';'.join(issue_codes(int(mask))) for mask in distinct_masks], index=distinct_masks)
+    return pd.DataFrame({
+        "title_length": title_lengths,
+        "body_length": body_lengths,
+        "issues": masks,
+        "issue_codes": labels.reindex(masks).to_numpy(),
+        "is_valid": masks == 0,
+    }, index=df.index)
+
+
+def summarize(masks: Sequence[int]) -> Dict[str, int]:
+    """Rows flagged per issue code."""
+    import numpy as np
+
+    masks = np.asarray(masks)
+    return {code: int(np.count_nonzero(masks & bit)) for bit, (code, _) in ISSUES.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate exported notification CSVs against brand guidelines")
+    parser.add_argument("files", nargs="+", help="CSV files with title and body columns")
+    parser.add_argument("--title-column", default="title")
+    parser.add_argument("--body-column", default="body")
+    parser.add_argument("--out", help="Write source_file, row, title, body, is_valid, issue_codes for every input row")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="Rows read at a time")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    logging.basicConfig(level=logging.INFO)
+    failed = 0
+    header = True
+    for path in args.files:
+        start = time.perf_counter()
+        rows = 0
+        invalid = 0
+        counts = {code: 0 for code, _ in ISSUES.values()}
+        for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=args.chunk_size):
+            result = validate_frame(chunk, args.title_column, args.body_column)
+            rows += len(chunk)
+            invalid += int((~result["is_valid"]).sum())
+            for code, n in summarize(result["issues"].to_numpy()).items():
+                counts[code] += n
+            if args.out:
+                report = pd.DataFrame({
+                    "source_file": path,
+                    "row": chunk.index,
+                    "title": chunk[args.title_column],
+                    "body": chunk[args.body_column],
+                    "is_valid": result["is_valid"],
+                    "issue_codes": result["issue_codes"],
+                })
+                report.to_csv(args.out, mode='w' if header else 'a', header=header, index=False)
+                header = False
+        failed += invalid
+        flagged = ", ".join(f"{code} {n:,}" for code, n in counts.items() if n) or "none"
+        logger.info(f"{path}: {rows:,} rows, {invalid:,} invalid ({flagged}) in {time.perf_counter() - start:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+In-process cache of decoded GenAI profiles (ProfileFeatures) for the MCP server.
+
+Entries are fresh for `ttl` seconds. After that they are stale: still served for up to
+`stale_ttl` more seconds while the caller refreshes them in the background
+(stale-while-revalidate), then dropped. The cache is LRU-bounded to `max_entries`.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+DEFAULT_PROFILE_CACHE_SIZE = 10_000
+DEFAULT_PROFILE_CACHE_TTL = 300.0
+DEFAULT_PROFILE_CACHE_STALE_TTL = 3600.0
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+class ProfileCache:
+    """Thread-safe TTL + LRU cache; values are shared, so callers must not mutate them."""
+
+    def __init__(self, max_entries: int = DEFAULT_PROFILE_CACHE_SIZE, ttl: float = DEFAULT_PROFILE_CACHE_TTL,
+                 stale_ttl: float = DEFAULT_PROFILE_CACHE_STALE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    @classmethod
+    def from_env(cls) -> "ProfileCache":
+        return cls(
+            max_entries=int(os.getenv('NOTIFICATION_PROFILE_CACHE_SIZE', DEFAULT_PROFILE_CACHE_SIZE)),
+            ttl=float(os.getenv('NOTIFICATION_PROFILE_CACHE_TTL', DEFAULT_PROFILE_CACHE_TTL)),
+            stale_ttl=float(os.getenv('NOTIFICATION_PROFILE_CACHE_STALE_TTL', DEFAULT_PROFILE_CACHE_STALE_TTL)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: str) -> Tuple[Optional[Any], str]:
+        """(value, FRESH | STALE | MISS); a STALE value should be served and refreshed."""
+        if not self.enabled:
+            return None, MISS
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry[0]
+                if age <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1], FRESH
+                if age <= self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    return entry[1], STALE
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None, MISS
+
+    def put(self, key: str, value: Any):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys: Optional[Iterable[str]] = None) -> int:
+        """Drop the given keys (or everything); returns how many entries were removed."""
+        with self._lock:
+            if keys is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                removed = sum(self._entries.pop(key, None) is not None for key in keys)
+            self.invalidations += removed
+            return removed
+
+    def record_refresh(self, ok: bool):
+        with self._lock:
+            if ok:
+                self.refreshes += 1
+            else:
+                self.refresh_errors += 1
+
+    def stats(self) -> Dict:
+        """Counters snapshot for server metrics."""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "stale_ttl": self.stale_ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+            }
@@ -0,0 +1,114 @@
+"""
+Decode only the PROFILE fields generation reads.
+
+A GenAI profile is a large JSON document, but generation (and the response's profile summary)
+reads five `overall_profile` values. decode_profile locates the `overall_profile` object in the
+raw text and, once the key is confirmed to be top level, decodes just that value, skipping the
+rest of the blob (a nested match falls back to a full parse); small blobs, where that saves
+nothing, are parsed whole with orjson when it is installed (stdlib json otherwise).
+The result is a ProfileFeatures tuple in FRAME_PROFILE_COLUMNS order, accepted anywhere
+extract_profile_fields output is (generate_from_fields, GenerationMemo.generate_from_fields).
+"""
+
+import json
+import re
+from typing import Dict, NamedTuple, Optional, Union
+
+from notification_generator import NotificationGenerator
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    _loads = json.loads
+    JSON_BACKEND = "json"
+
+# Below this size a whole-document parse is as cheap as locating the object
+PARTIAL_PARSE_MIN_BYTES = 2048
+
+_OVERALL_KEY = '"overall_profile"'
+_KEY_COLON = re.compile(r'"overall_profile"\s*:\s*')
+_decoder = json.JSONDecoder()
+# Every byte except those that shape JSON structure: '"', '{', '}', '[', ']'
+_NON_STRUCTURAL = bytes(b for b in range(256) if b not in b'"{}[]')
+
+
+class ProfileFeatures(NamedTuple):
+    """The generation inputs of one profile (same order as extract_profile_fields)."""
+    cuisine_preferences: str = ''
+    food_preferences: str = ''
+    taste_preference: str = ''
+    dietary: Optional[str] = None  # None: the profile has no preferred_dietary_preference
+    price_sensitivity: str = ''
+
+    @classmethod
+    def from_profile(cls, profile: Dict) -> "ProfileFeatures":
+        return cls(*NotificationGenerator.extract_profile_fields(profile))
+
+
+def _features_from_overall(overall) -> ProfileFeatures:
+    return ProfileFeatures.from_profile({"overall_profile": overall})
+
+
+def _confirmed_top_level(text: str, position: int) -> bool:
+    """
+    Whether `position` is directly inside the document's outermost object; False when unsure.
+
+    Drops escape pairs from the text before it, reduces the rest to quotes, braces and brackets
+    (bytes.translate), then drops the empty `""` left by every string without braces or brackets
+    in it. If no quote survives, what remains is the structure, and its brace depth is exact.
+    """
+    prefix = text[:position]
+    if '\\' in prefix:
+        # Left to right: escaped backslashes first, then escaped quotes; other escapes are dropped below
+        prefix = prefix.replace('\\\\', '').replace('\\"', '')
+    structure = prefix.encode('utf-8', 'surrogatepass').translate(None, _NON_STRUCTURAL).replace(b'""', b'')
+    if b'"' in structure:
+        return False  # a string holds braces or brackets (or position is inside one)
+    return (structure.count(b'{') - structure.count(b'}') == 1
+            and structure.count(b'[') == structure.count(b']'))
+
+
+def _decode_partial(text: str):
+    """The overall_profile value, or None when it can't be located unambiguously."""
+    start = text.find(_OVERALL_KEY)
+    if start < 0:
+        return {}
+    # The first match may be a nested key (the top-level one, if any, comes later); let the full
+    # parse decide
+    if not _confirmed_top_level(text, start):
+        return None
+    # An unescaped "overall_profile" followed by ':' can only be an object key
+    match = _KEY_COLON.match(text, start)
+    if not match:
+        return None
+    value, _ = _decoder.raw_decode(text, match.end())
+    return value
+
+
+def decode_profile(profile: Union[str, bytes, Dict]) -> ProfileFeatures:
+    """
+    ProfileFeatures from PROFILE JSON text (or an already parsed dict).
+
+    Large documents are not validated beyond the overall_profile object. A NULL PROFILE (None)
+    reads as an empty profile. Raises ValueError on malformed JSON.
+    """
+    if profile is None:
+        return ProfileFeatures()
+    if isinstance(profile, dict):
+        return ProfileFeatures.from_profile(profile)
+    if len(profile) >= PARTIAL_PARSE_MIN_BYTES:
+        text = profile.decode('utf-8') if isinstance(profile, (bytes, bytearray)) else profile
+        overall = _decode_partial(text)
+        if overall is not None:
+            return _features_from_overall(overall)
+    return ProfileFeatures.from_profile(_loads(profile))
+
+
+def as_features(profile: Union[ProfileFeatures, Dict]) -> ProfileFeatures:
+    """Accept either a ProfileFeatures or a parsed profile dict."""
+    if isinstance(profile, ProfileFeatures):
+        return profile
+    return ProfileFeatures.from_profile(profile)
@@ -0,0 +1,179 @@
+"""
+Shared, bind-parameterized profile queries for every entry point that reads GenAI profiles.
+
+Query text never contains a consumer id, so Snowflake sees the same statement for every
+consumer and can reuse the compiled plan (and the result cache for repeated consumers).
+Batch IN lists are padded to power-of-two sizes so only a handful of statement shapes exist.
+IDs are validated before anything reaches the warehouse.
+
+Per statement shape we record client-side execute/fetch time and, once collected from
+INFORMATION_SCHEMA.QUERY_HISTORY, Snowflake's own compilation vs execution time.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_PROFILE_TABLE = 'PRODDB.ML.GENAI_CX_PROFILE_SHADOW'
+# IDs per bind-parameterized IN query for batch lookups
+DEFAULT_BATCH_CHUNK_SIZE = 500
+# Query ids kept for server-side timing collection
+MAX_PENDING_QUERY_IDS = 1000
+
+_CONSUMER_ID = re.compile(r'^\d{1,38}$')
+_IDENTIFIER = r'(?:[A-Za-z_][A-Za-z0-9_$]*|"(?:[^"]|"")+")'
+_TABLE_NAME = re.compile(rf'^{_IDENTIFIER}(?:\.{_IDENTIFIER}){{0,2}}$')
+
+
+class InvalidConsumerId(ValueError):
+    """A consumer id that can't be a CONSUMER_ID (digits only)."""
+
+
+def validate_consumer_id(value) -> int:
+    """Normalize a consumer id (int or numeric string) to int, rejecting anything else."""
+    if isinstance(value, bool):
+        raise InvalidConsumerId(f"Invalid consumer_id {value!r}")
+    if isinstance(value, int):
+        if value < 0:
+            raise InvalidConsumerId(f"Invalid consumer_id {value!r}")
+        return value
+    text = str(value).strip() if value is not None else ''
+    if not _CONSUMER_ID.match(text):
+        raise InvalidConsumerId(f"Invalid consumer_id {value!r}: expected digits only")
+    return int(text)
+
+
+def validate_table_name(name: str) -> str:
+    """The table is interpolated (identifiers can't be bound), so allow only [db.][schema.]table."""
+    name = (name or '').strip()
+    if not _TABLE_NAME.match(name):
+        raise ValueError(f"Invalid profile table name {name!r}")
+    return name
+
+
+def profile_table(table: Optional[str] = None) -> str:
+    """Explicit table, else GENAI_PROFILE_TABLE, else the shadow table; validated."""
+    return validate_table_name(table or os.getenv('GENAI_PROFILE_TABLE', DEFAULT_PROFILE_TABLE))
+
+
+def _padded_size(n: int, limit: int) -> int:
+    size = 1
+    while size < n:
+        size *= 2
+    return min(size, max(limit, n))
+
+
+class ProfileQueries:
+    """Profile lookups for one table; safe to share across threads."""
+
+    def __init__(self, table: Optional[str] = None, chunk_size: int = DEFAULT_BATCH_CHUNK_SIZE):
+        self.table = profile_table(table)
+        self.chunk_size = chunk_size
+        self.select_one = f"SELECT CONSUMER_ID, PROFILE FROM {self.table} WHERE CONSUMER_ID = %s"
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+        self._pending = deque(maxlen=MAX_PENDING_QUERY_IDS)  # (shape, sfqid)
+
+    def select_many(self, size: int) -> str:
+        placeholders = ', '.join(['%s'] * size)
+        return f"SELECT CONSUMER_ID, PROFILE FROM {self.table} WHERE CONSUMER_ID IN ({placeholders})"
+
+    def chunks(self, consumer_ids: Iterable[int]) -> List[List[int]]:
+        ids = list(consumer_ids)
+        return [ids[i:i + self.chunk_size] for i in range(0, len(ids), self.chunk_size)]
+
+    def fetch_one(self, conn, consumer_id) -> Optional[tuple]:
+        """(CONSUMER_ID, PROFILE) row for one consumer, or None."""
+        return self._run(conn, 'one', self.select_one, [validate_consumer_id(consumer_id)], fetch_one=True)
+
+    def fetch_many(self, conn, consumer_ids: List) -> List[tuple]:
+        """Rows for up to chunk_size consumers with one IN query (padded to a power-of-two shape)."""
+        ids = [validate_consumer_id(consumer_id) for consumer_id in consumer_ids]
+        if not ids:
+            return []
+        size = _padded_size(len(ids), self.chunk_size)
+        # Repeating the last id keeps the statement text stable; duplicates in IN are harmless
+        params = ids + [ids[-1]] * (size - len(ids))
+        return self._run(conn, f'in_{size}', self.select_many(size), params)
+
+    def _run(self, conn, shape: str, query: str, params: List, fetch_one: bool = False):
+        cursor = conn.cursor()
+        try:
+            start = time.perf_counter()
+            cursor.execute(query, params)
+            executed = time.perf_counter()
+            result = cursor.fetchone() if fetch_one else cursor.fetchall()
+            fetched = time.perf_counter()
+            self._record(shape, executed - start, fetched - executed, getattr(cursor, 'sfqid', None))
+            return result
+        finally:
+            cursor.close()
+
+    def _record(self, shape: str, execute_s: float, fetch_s: float, sfqid: Optional[str]):
+        with self._lock:
+            stats = self._stats.setdefault(shape, {
+                "queries": 0, "execute_ms": 0.0, "fetch_ms": 0.0,
+                "server_timed": 0, "compile_ms": 0.0, "server_execute_ms": 0.0,
+            })
+            stats["queries"] += 1
+            stats["execute_ms"] += 1000 * execute_s
+            stats["fetch_ms"] += 1000 * fetch_s
+            if sfqid:
+                self._pending.append((shape, sfqid))
+
+    def collect_server_timings(self, conn) -> int:
+        """
+        Fold Snowflake's COMPILATION_TIME / EXECUTION_TIME for recent queries into the stats.
+
+        Returns how many queries were matched; ids not yet visible in QUERY_HISTORY are kept
+        for the next call.
+        """
+        with self._lock:
+            pending = list(self._pending)
+        if not pending:
+            return 0
+        placeholders = ', '.join(['%s'] * len(pending))
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT QUERY_ID, COMPILATION_TIME, EXECUTION_TIME "
+                "FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY(RESULT_LIMIT => 10000)) "
+                f"WHERE QUERY_ID IN ({placeholders})",
+                [sfqid for _, sfqid in pending],
+            )
+            timings = {row[0]: (row[1] or 0, row[2] or 0) for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+        with self._lock:
+            for shape, sfqid in pending:
+                if sfqid not in timings:
+                    continue
+                compile_ms, execute_ms = timings[sfqid]
+                stats = self._stats[shape]
+                stats["server_timed"] += 1
+                stats["compile_ms"] += compile_ms
+                stats["server_execute_ms"] += execute_ms
+            self._pending = deque((item for item in self._pending if item[1] not in timings),
+                                  maxlen=MAX_PENDING_QUERY_IDS)
+        return len(timings)
+
+    def stats(self) -> Dict:
+        """Per statement shape: count and average client/server timings in ms."""
+        with self._lock:
+            out = {"table": self.table, "pending_server_timings": len(self._pending), "shapes": {}}
+            for shape, s in self._stats.items():
+                n = s["queries"]
+                timed = s["server_timed"]
+                out["shapes"][shape] = {
+                    "queries": n,
+                    "execute_ms_avg": s["execute_ms"] / n if n else 0.0,
+                    "fetch_ms_avg": s["fetch_ms"] / n if n else 0.0,
+                    "server_timed": timed,
+                    "compile_ms_avg": s["compile_ms"] / timed if timed else None,
+                    "server_execute_ms_avg": s["server_execute_ms"] / timed if timed else None,
+                }
+            return out
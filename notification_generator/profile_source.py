@@ -0,0 +1,364 @@
+"""
+Where GenAI profiles come from: Snowflake, or a local snapshot file.
+
+Everything that reads profiles (the MCP server, quick_start) goes through a ProfileSource, so
+generation can run, be load tested and benchmarked offline against a snapshot, and the server
+can fall back to the snapshot while the warehouse is unavailable.
+
+The snapshot is a SQLite file with CONSUMER_ID as the integer primary key (the table's b-tree
+index), so a point lookup is a single index probe, well under a millisecond. Build one with:
+
+  python profile_source.py build --out profiles.db                   # from GENAI_PROFILE_TABLE
+  python profile_source.py build --out profiles.db --from-csv export.csv  # CONSUMER_ID,PROFILE
+
+Select the source with NOTIFICATION_PROFILE_SOURCE=snowflake (default) or snapshot, and point
+NOTIFICATION_PROFILE_SNAPSHOT at the file. With the Snowflake source, a configured snapshot is
+used as the fallback when a Snowflake lookup fails.
+"""
+
+import abc
+import argparse
+import csv
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from connection_pool import get_snowflake_connection
+from profile_queries import DEFAULT_BATCH_CHUNK_SIZE, ProfileQueries, validate_consumer_id
+
+logger = logging.getLogger("notification-server.profiles")
+
+PROFILE_SOURCES = ["snowflake", "snapshot"]
+# Rows per executemany / fetchmany while building a snapshot
+BUILD_BATCH_SIZE = 10000
+
+
+class ProfileSource(abc.ABC):
+    """Profile lookups returning (CONSUMER_ID, PROFILE JSON) rows; methods are blocking and thread-safe."""
+
+    name = "base"
+    chunk_size = DEFAULT_BATCH_CHUNK_SIZE
+    # server_metrics.LatencyMetrics receiving connect/query phase timings, if any
+    latency = None
+
+    def set_latency_metrics(self, latency):
+        self.latency = latency
+
+    @abc.abstractmethod
+    def fetch_one(self, consumer_id) -> Optional[tuple]:
+        """The (CONSUMER_ID, PROFILE) row for one consumer, or None."""
+
+    @abc.abstractmethod
+    def fetch_many(self, consumer_ids: List) -> List[tuple]:
+        """Rows for the consumers found among consumer_ids (one chunk)."""
+
+    def chunks(self, consumer_ids: Iterable) -> List[List]:
+        ids = list(consumer_ids)
+        return [ids[i:i + self.chunk_size] for i in range(0, len(ids), self.chunk_size)]
+
+    def collect_server_timings(self) -> int:
+        """Warehouse-side timings for recent lookups (only meaningful for Snowflake)."""
+        return 0
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self) -> Dict:
+        return {"source": self.name}
+
+
+class SnowflakeProfileSource(ProfileSource):
+    """Bind-parameterized lookups (profile_queries.py) on pooled Snowflake connections."""
+
+    name = "snowflake"
+
+    def __init__(self, pool, queries: Optional[ProfileQueries] = None):
+        self.pool = pool
+        self.queries = queries or ProfileQueries()
+
+    @property
+    def chunk_size(self) -> int:
+        return self.queries.chunk_size
+
+    def _run(self, fn: Callable):
+        """pool.run(fn), timing connection acquisition (connect) apart from fn itself (query)."""
+        latency = self.latency
+        if latency is None:
+            return self.pool.run(fn)
+        requested = time.perf_counter()
+
+        def timed(conn):
+            nonlocal requested
+            acquired = time.perf_counter()
+            latency.observe_phase("connect", acquired - requested)
+            try:
+                return fn(conn)
+            finally:
+                # A retry after an expired session waits for its connection from here
+                requested = time.perf_counter()
+                latency.observe_phase("query", requested - acquired)
+
+        return self.pool.run(timed)
+
+    def fetch_one(self, consumer_id) -> Optional[tuple]:
+        # Borrow a pooled connection (reconnects transparently if the session expired)
+        return self._run(lambda conn: self.queries.fetch_one(conn, consumer_id))
+
+    def fetch_many(self, consumer_ids: List) -> List[tuple]:
+        return self._run(lambda conn: self.queries.fetch_many(conn, consumer_ids))
+
+    def collect_server_timings(self) -> int:
+        return self.pool.run(self.queries.collect_server_timings)
+
+    def start(self):
+        self.pool.start()
+
+    def close(self):
+        self.pool.close()
+
+    def stats(self) -> Dict:
+        return {"source": self.name, "snowflake_pool": self.pool.stats(), "profile_queries": self.queries.stats()}
+
+
+class SnapshotProfileSource(ProfileSource):
+    """Read-only lookups on a local SQLite snapshot (see build_snapshot)."""
+
+    name = "snapshot"
+
+    def __init__(self, path: str, chunk_size: int = DEFAULT_BATCH_CHUNK_SIZE):
+        self.path = os.path.expanduser(path)
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Profile snapshot not found: {self.path}")
+        self.chunk_size = chunk_size
+        # One connection per thread; sqlite3 connections can't be shared across threads
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._rows = 0
+        self._seconds = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _query(self, query: str, params: List) -> List[tuple]:
+        start = time.perf_counter()
+        rows = self._connection().execute(query, params).fetchall()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._lookups += 1
+            self._rows += len(rows)
+            self._seconds += elapsed
+        if self.latency is not None:
+            self.latency.observe_phase("query", elapsed)
+        return rows
+
+    def fetch_one(self, consumer_id) -> Optional[tuple]:
+        rows = self._query("SELECT consumer_id, profile FROM profiles WHERE consumer_id = ?",
+                           [validate_consumer_id(consumer_id)])
+        return rows[0] if rows else None
+
+    def fetch_many(self, consumer_ids: List) -> List[tuple]:
+        ids = [validate_consumer_id(consumer_id) for consumer_id in consumer_ids]
+        if not ids:
+            return []
+        placeholders = ', '.join(['?'] * len(ids))
+        return self._query(f"SELECT consumer_id, profile FROM profiles WHERE consumer_id IN ({placeholders})", ids)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "source": self.name,
+                "path": self.path,
+                "lookups": self._lookups,
+                "rows": self._rows,
+                "lookup_ms_avg": 1000 * self._seconds / self._lookups if self._lookups else 0.0,
+            }
+
+
+class FallbackProfileSource(ProfileSource):
+    """Primary source, answered from a fallback (the snapshot) when the primary raises."""
+
+    def __init__(self, primary: ProfileSource, fallback: ProfileSource):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}"
+        self._fallbacks = 0
+
+    @property
+    def chunk_size(self) -> int:
+        return self.primary.chunk_size
+
+    def set_latency_metrics(self, latency):
+        self.latency = latency
+        self.primary.set_latency_metrics(latency)
+        self.fallback.set_latency_metrics(latency)
+
+    def _call(self, method: str, *args):
+        try:
+            return getattr(self.primary, method)(*args)
+        except Exception as e:
+            logger.warning(f"{self.primary.name} profile lookup failed, using {self.fallback.name}: {e}")
+            self._fallbacks += 1
+            return getattr(self.fallback, method)(*args)
+
+    def fetch_one(self, consumer_id) -> Optional[tuple]:
+        return self._call('fetch_one', consumer_id)
+
+    def fetch_many(self, consumer_ids: List) -> List[tuple]:
+        return self._call('fetch_many', consumer_ids)
+
+    def collect_server_timings(self) -> int:
+        return self.primary.collect_server_timings()
+
+    def start(self):
+        try:
+            self.primary.start()
+        except Exception as e:
+            # Serve from the snapshot until the warehouse is reachable again
+            logger.error(f"Could not start {self.primary.name} profile source, using {self.fallback.name}: {e}")
+        self.fallback.start()
+
+    def close(self):
+        self.primary.close()
+        self.fallback.close()
+
+    def stats(self) -> Dict:
+        return {"source": self.name, "fallbacks": self._fallbacks,
+                "primary": self.primary.stats(), "fallback": self.fallback.stats()}
+
+
+def profile_source_from_env(make_pool: Callable[[], object], table: Optional[str] = None) -> ProfileSource:
+    """
+    Source selected by NOTIFICATION_PROFILE_SOURCE (snowflake | snapshot).
+
+    make_pool is only called for the Snowflake source, so the snapshot source never needs
+    Snowflake credentials or the connector.
+    """
+    kind = os.getenv('NOTIFICATION_PROFILE_SOURCE', 'snowflake').strip().lower()
+    if kind not in PROFILE_SOURCES:
+        raise ValueError(f"Unknown NOTIFICATION_PROFILE_SOURCE {kind!r} (allowed: {', '.join(PROFILE_SOURCES)})")
+    chunk_size = int(os.getenv('NOTIFICATION_BATCH_CHUNK_SIZE', DEFAULT_BATCH_CHUNK_SIZE))
+    snapshot_path = os.getenv('NOTIFICATION_PROFILE_SNAPSHOT')
+    if kind == 'snapshot':
+        if not snapshot_path:
+            raise ValueError("NOTIFICATION_PROFILE_SOURCE=snapshot requires NOTIFICATION_PROFILE_SNAPSHOT")
+        return SnapshotProfileSource(snapshot_path, chunk_size)
+
+    source = SnowflakeProfileSource(make_pool(), ProfileQueries(table, chunk_size))
+    if snapshot_path:
+        return FallbackProfileSource(source, SnapshotProfileSource(snapshot_path, chunk_size))
+    return source
+
+
+def build_snapshot(rows: Iterable[tuple], path: str) -> int:
+    """
+    Write (CONSUMER_ID, PROFILE JSON) rows to a new snapshot file; returns the row count.
+
+    Written to a temp file and renamed, so a running server never sees a half-built snapshot.
+    Later rows win for duplicate consumer ids.
+    """
+    path = os.path.expanduser(path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    count = 0
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        # INTEGER PRIMARY KEY is the rowid: lookups probe the table's own b-tree. PROFILE may be
+        # NULL in the warehouse; it is kept as NULL, as a Snowflake lookup would return it
+        conn.execute("CREATE TABLE profiles (consumer_id INTEGER PRIMARY KEY, profile TEXT)")
+        batch = []
+        for consumer_id, profile_json in rows:
+            batch.append((validate_consumer_id(consumer_id), profile_json))
+            if len(batch) >= BUILD_BATCH_SIZE:
+                conn.executemany("INSERT OR REPLACE INTO profiles VALUES (?, ?)", batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            conn.executemany("INSERT OR REPLACE INTO profiles VALUES (?, ?)", batch)
+            count += len(batch)
+        conn.commit()
+        conn.execute("VACUUM")
+    except BaseException:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+    os.replace(tmp_path, path)
+    return count
+
+
+def iter_snowflake_profiles(conn, table: Optional[str] = None) -> Iterable[tuple]:
+    """Stream every (CONSUMER_ID, PROFILE) row of the profile table."""
+    queries = ProfileQueries(table)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT CONSUMER_ID, PROFILE FROM {queries.table}")
+        while True:
+            rows = cursor.fetchmany(BUILD_BATCH_SIZE)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def iter_csv_profiles(path: str) -> Iterable[tuple]:
+    """Rows of a CSV export with CONSUMER_ID and PROFILE columns (any case)."""
+    csv.field_size_limit(sys.maxsize)
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        columns = {name.upper(): name for name in reader.fieldnames or []}
+        if 'CONSUMER_ID' not in columns or 'PROFILE' not in columns:
+            raise ValueError(f"{path} needs CONSUMER_ID and PROFILE columns (found: {reader.fieldnames})")
+        for row in reader:
+            yield row[columns['CONSUMER_ID']], row[columns['PROFILE']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a local profile snapshot")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Export profiles to a SQLite snapshot")
+    build.add_argument("--out", required=True, help="Snapshot file to write")
+    build.add_argument("--from-csv", help="CSV export with CONSUMER_ID,PROFILE (default: query Snowflake)")
+    build.add_argument("--table", help="Profile table (default: GENAI_PROFILE_TABLE or the shadow table)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    if args.from_csv:
+        count = build_snapshot(iter_csv_profiles(args.from_csv), args.out)
+    else:
+        conn = get_snowflake_connection()
+        try:
+            count = build_snapshot(iter_snowflake_profiles(conn, args.table), args.out)
+        finally:
+            conn.close()
+    logger.info(f"Wrote {count} profiles to {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
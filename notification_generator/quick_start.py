@@ -6,68 +6,88 @@ Usage:
 
 Example:
   python quick_start.py 1193328057
+
+Offline, against a local snapshot (see profile_source.py):
+  NOTIFICATION_PROFILE_SOURCE=snapshot NOTIFICATION_PROFILE_SNAPSHOT=profiles.db python quick_start.py 1193328057
 """
 
 import sys
-import json
 import os
 from dotenv import load_dotenv
-import snowflake.connector
 
 # Add current directory to path
 sys.path.insert(0, os.path.dirname(__file__))
+from connection_pool import get_snowflake_connection
 from notification_generator import NotificationGenerator
+from profile_features import decode_profile
+from profile_queries import InvalidConsumerId, validate_consumer_id
+from profile_source import profile_source_from_env
 
 load_dotenv()
 
+
+class SingleConnection:
+    """One Snowflake connection behind the pool interface SnowflakeProfileSource expects."""
+
+    def __init__(self):
+        self.conn = None
+
+    def start(self):
+        self.conn = get_snowflake_connection()
+
+    def run(self, fn):
+        return fn(self.conn)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+    def stats(self):
+        return {"connections": int(self.conn is not None)}
+
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: python quick_start.py <consumer_id>")
         sys.exit(1)
     
     consumer_id = sys.argv[1]
+    try:
+        validate_consumer_id(consumer_id)
+        # Snowflake (GENAI_PROFILE_TABLE or the shadow table) or a local snapshot
+        source = profile_source_from_env(SingleConnection)
+    except (InvalidConsumerId, ValueError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
     
-    # Connect to Snowflake
-    conn = snowflake.connector.connect(
-        account=os.getenv('SNOWFLAKE_ACCOUNT'),
-        user=os.getenv('SNOWFLAKE_USER'),
-        authenticator=os.getenv('SNOWFLAKE_AUTHENTICATOR'),
-        warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
-        database=os.getenv('SNOWFLAKE_DATABASE'),
-        schema=os.getenv('SNOWFLAKE_SCHEMA'),
-        role=os.getenv('SNOWFLAKE_ROLE')
-    )
-    
-    cursor = conn.cursor()
-    
-    # Query profile
-    query = f"SELECT CONSUMER_ID, PROFILE FROM PRODDB.ML.GENAI_CX_PROFILE_SHADOW WHERE CONSUMER_ID = {consumer_id}"
-    cursor.execute(query)
-    result = cursor.fetchone()
+    # Query profile (bind-parameterized on Snowflake)
+    source.start()
+    try:
+        result = source.fetch_one(consumer_id)
+    finally:
+        source.close()
     
     if not result:
         print(f"❌ No profile found for consumer {consumer_id}")
         sys.exit(1)
     
     _, profile_json = result
-    profile = json.loads(profile_json)
+    # Only the overall_profile fields generation reads
+    profile = decode_profile(profile_json)
     
     # Generate notifications
     generator = NotificationGenerator()
-    notifications = generator.generate_notifications(profile, min_score=80, max_count=10)
+    notifications = generator.generate_from_fields(profile, min_score=80, max_count=10)
     
     # Display results
     print(f"\n{'='*80}")
     print(f"CONSUMER {consumer_id} - GENERATED {len(notifications)} NOTIFICATIONS")
     print(f"{'='*80}\n")
     
-    overall = profile.get('overall_profile', {})
-    dietary = overall.get('dietary_preferences', {})
-    
     print(f"Profile:")
-    print(f"  Cuisines: {overall.get('cuisine_preferences', '')[:80]}...")
-    print(f"  Foods: {overall.get('food_preferences', '')[:80]}...")
-    print(f"  Dietary: {dietary.get('preferred_dietary_preference', 'none')}\n")
+    print(f"  Cuisines: {profile.cuisine_preferences[:80]}...")
+    print(f"  Foods: {profile.food_preferences[:80]}...")
+    print(f"  Dietary: {profile.dietary or 'none'}\n")
     
     print(f"Top {len(notifications)} Notifications (Score >= 80):\n")
     
@@ -79,8 +99,6 @@ def main():
         print(f"   Keyword: {notif['keyword']}")
         url = generator.format_for_doordash_url(notif['keyword'])
         print(f"   URL: {url}\n")
-    
-    conn.close()
 
 if __name__ == "__main__":
     main()
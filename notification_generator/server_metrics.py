@@ -0,0 +1,300 @@
+"""
+Latency histograms and error counters for the notification server, in Prometheus text format.
+
+Every tool call is timed end to end (notification_tool_duration_seconds, by tool and status),
+and the work inside it by phase (notification_phase_duration_seconds):
+
+  connect    waiting for / opening / health checking a pooled Snowflake connection
+  query      profile query execute + fetch (Snowflake or the local snapshot)
+  decode     PROFILE JSON -> ProfileFeatures
+  generate   memoized generation and response enrichment
+  serialize  encoding the tool response
+
+Failed calls and per-consumer batch errors count in notification_tool_errors_total. Histograms
+use fixed buckets, so p50/p99 (snapshot(), or histogram_quantile in Prometheus) are estimates
+within a bucket. Exposition, all optional:
+
+  NOTIFICATION_METRICS_PORT=9464            serve /metrics on 127.0.0.1 (NOTIFICATION_METRICS_HOST to change)
+  NOTIFICATION_METRICS_FILE=metrics.prom    rewrite every NOTIFICATION_METRICS_INTERVAL seconds (default 15)
+  get_server_metrics tool with format=prometheus
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("notification-server")
+
+# Seconds; spans snapshot lookups (tens of microseconds) to cold Snowflake queries
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                           10.0, 30.0)
+PHASES = ["connect", "query", "decode", "generate", "serialize"]
+DEFAULT_EXPORT_INTERVAL = 15.0
+
+TOOL_METRIC = "notification_tool_duration_seconds"
+PHASE_METRIC = "notification_phase_duration_seconds"
+ERROR_METRIC = "notification_tool_errors_total"
+HELP = {
+    TOOL_METRIC: "MCP tool call latency, end to end including response encoding.",
+    PHASE_METRIC: "Time spent in each phase of serving tool calls.",
+    ERROR_METRIC: "Failed tool calls (error=exception type or error_response) and per-consumer batch errors.",
+}
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Cumulative-bucket histogram; not thread-safe on its own (LatencyMetrics holds the lock)."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimate like Prometheus histogram_quantile: linear within the bucket holding rank q."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for upper, n in zip(self.buckets, self.counts):
+            if n and seen + n >= rank:
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            lower = upper
+        # Beyond the last bucket: the best estimate is its upper bound
+        return self.buckets[-1]
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class ToolCall:
+    """Handle yielded by LatencyMetrics.tool(); marks a call (or some of its consumers) as failed."""
+
+    def __init__(self):
+        self.status = "success"
+        self.errors: List[Tuple[str, int]] = []
+
+    def error(self, reason: str = "error_response", count: int = 1):
+        """Count `count` errors; the call's own status becomes error unless reason is 'consumer'."""
+        if count <= 0:
+            return
+        self.errors.append((reason, count))
+        if reason != "consumer":
+            self.status = "error"
+
+
+class LatencyMetrics:
+    """Thread-safe registry of latency histograms and error counters."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms: Dict[str, Dict[Tuple, Histogram]] = {TOOL_METRIC: {}, PHASE_METRIC: {}}
+        self._counters: Dict[str, Dict[Tuple, float]] = {ERROR_METRIC: {}}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def observe(self, metric: str, seconds: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms[metric]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def observe_phase(self, phase: str, seconds: float):
+        self.observe(PHASE_METRIC, seconds, phase=phase)
+
+    def count(self, metric: str, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[metric]
+            series[key] = series.get(key, 0) + value
+
+    @contextmanager
+    def phase(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_phase(phase, time.perf_counter() - start)
+
+    @contextmanager
+    def tool(self, tool: str):
+        """Time one tool call; exceptions count as errors (by type) and propagate."""
+        call = ToolCall()
+        start = time.perf_counter()
+        try:
+            yield call
+        except BaseException as e:
+            call.error(type(e).__name__)
+            raise
+        finally:
+            self.observe(TOOL_METRIC, time.perf_counter() - start, tool=tool, status=call.status)
+            for reason, n in call.errors:
+                self.count(ERROR_METRIC, n, tool=tool, error=reason)
+
+    def snapshot(self) -> Dict:
+        """Per tool and per phase: count, mean and p50/p90/p99 in ms (estimated); error counts."""
+        with self._lock:
+            def summarize(series: Dict[Tuple, Histogram], label: str) -> Dict:
+                merged: Dict[str, Histogram] = {}
+                for key, histogram in series.items():
+                    name = dict(key)[label]
+                    total = merged.setdefault(name, Histogram(self.buckets))
+                    total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+                    total.count += histogram.count
+                    total.sum += histogram.sum
+                return {
+                    name: {
+                        "count": h.count,
+                        "mean_ms": round(1000 * h.sum / h.count, 3) if h.count else 0.0,
+                        "p50_ms": round(1000 * h.quantile(0.5), 3),
+                        "p90_ms": round(1000 * h.quantile(0.9), 3),
+                        "p99_ms": round(1000 * h.quantile(0.99), 3),
+                    }
+                    for name, h in sorted(merged.items())
+                }
+
+            errors: Dict[str, Dict[str, float]] = {}
+            for key, value in self._counters[ERROR_METRIC].items():
+                labels = dict(key)
+                errors.setdefault(labels["tool"], {})[labels["error"]] = value
+            return {
+                "tools": summarize(self._histograms[TOOL_METRIC], "tool"),
+                "phases": summarize(self._histograms[PHASE_METRIC], "phase"),
+                "errors": errors,
+            }
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for metric, series in self._histograms.items():
+                lines.append(f"# HELP {metric} {HELP[metric]}")
+                lines.append(f"# TYPE {metric} histogram")
+                for key, h in sorted(series.items()):
+                    cumulative = 0
+                    for upper, n in zip(self.buckets + (float("inf"),), h.counts):
+                        cumulative += n
+                        le = "+Inf" if upper == float("inf") else _number(upper)
+                        bucket = 'le="' + le + '"'
+                        lines.append(f"{metric}_bucket{_labels(key, bucket)} {cumulative}")
+                    lines.append(f"{metric}_sum{_labels(key)} {repr(h.sum)}")
+                    lines.append(f"{metric}_count{_labels(key)} {h.count}")
+            for metric, series in self._counters.items():
+                lines.append(f"# HELP {metric} {HELP[metric]}")
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{metric}{_labels(key)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """Write the exposition atomically (for node_exporter's textfile collector or scraping from disk)."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+class MetricsExporter:
+    """Optional /metrics HTTP endpoint and periodic text file; close() stops both."""
+
+    def __init__(self, metrics: LatencyMetrics, port: Optional[int] = None, host: str = "127.0.0.1",
+                 path: Optional[str] = None, interval: float = DEFAULT_EXPORT_INTERVAL):
+        self.metrics = metrics
+        self.port = port
+        self.host = host
+        self.path = path
+        self.interval = interval
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @classmethod
+    def from_env(cls, metrics: LatencyMetrics) -> "MetricsExporter":
+        port = os.getenv('NOTIFICATION_METRICS_PORT')
+        return cls(
+            metrics,
+            port=int(port) if port else None,
+            host=os.getenv('NOTIFICATION_METRICS_HOST', '127.0.0.1'),
+            path=os.getenv('NOTIFICATION_METRICS_FILE') or None,
+            interval=float(os.getenv('NOTIFICATION_METRICS_INTERVAL', DEFAULT_EXPORT_INTERVAL)),
+        )
+
+    def start(self):
+        if self.port is not None:
+            metrics = self.metrics
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                        self.send_error(404)
+                        return
+                    body = metrics.render_prometheus().encode('utf-8')
+                    self.send_response(200)
+                    self.send_header("Content-Type", CONTENT_TYPE)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.port = self._server.server_address[1]
+            self._spawn(self._server.serve_forever, "metrics-http")
+            logger.info(f"Serving Prometheus metrics on http://{self.host}:{self.port}/metrics")
+        if self.path:
+            self._spawn(self._write_periodically, "metrics-file")
+            logger.info(f"Writing Prometheus metrics to {self.path} every {self.interval:g}s")
+        return self
+
+    def _spawn(self, target, name: str):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _write_periodically(self):
+        while not self._stop.wait(self.interval):
+            self._write()
+        self._write()
+
+    def _write(self):
+        try:
+            self.metrics.write_textfile(self.path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {self.path}: {e}")
+
+    def close(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join(timeout=5)
@@ -0,0 +1,54 @@
+"""
+Single-flight request coalescing for the async MCP server.
+
+The first call for a key starts the work in a task owned by the SingleFlight; every caller for
+that key, the first included, awaits it through asyncio.shield and gets the same result, or the
+same exception. A caller being cancelled (client disconnect, timeout) only cancels its own wait:
+the work keeps running for the others, and the key is dropped when the task finishes.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class SingleFlight:
+    """Coalesce concurrent identical async calls (one event loop, not thread-safe)."""
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def pending(self, key: Hashable) -> Optional[asyncio.Future]:
+        """Task of the in-flight call for `key`, if any."""
+        return self._in_flight.get(key)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(fn())
+            self._in_flight[key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Retrieving the exception also keeps a task nobody awaits any more from logging
+        # "exception was never retrieved"
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    def stats(self) -> Dict:
+        calls = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._in_flight),
+            "executed": self.leaders,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "coalesce_rate": self.coalesced / calls if calls else 0.0,
+        }
@@ -0,0 +1,230 @@
+"""
+Local On-Disk Query Result Cache
+Keeps Snowflake query results as compressed Parquet files so notebooks and scripts
+don't re-run the same exploratory queries after every kernel restart
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_TTL = 24 * 3600
+DEFAULT_CACHE_MAX_MB = 2048
+
+_WHITESPACE = re.compile(r'\s+')
+# Leading whitespace, comments and opening parentheses before a statement's first keyword
+_STATEMENT_PREFIX = re.compile(r'(?:\s+|--[^\n]*|/\*.*?\*/|\()*', re.DOTALL)
+_READ_ONLY_KEYWORD = re.compile(r'(?:SELECT|WITH)\b', re.IGNORECASE)
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace and drop trailing semicolons (case is kept: literals are case sensitive)"""
+    return _WHITESPACE.sub(' ', query).strip().rstrip(';').strip()
+
+
+def is_cacheable(query: str) -> bool:
+    """
+    Only single read-only statements (SELECT / WITH) are cached
+
+    DDL, DML, SHOW / DESCRIBE and anything with a ';' left inside it always run against the
+    warehouse, so a cached result can never stand in for a side effect.
+    """
+    if ';' in normalize_sql(query):
+        return False
+    # Before normalizing: '--' comments end at the newline
+    return bool(_READ_ONLY_KEYWORD.match(query, _STATEMENT_PREFIX.match(query).end()))
+
+
+class QueryCache:
+    """
+    Directory of <key>.parquet result files with a TTL and a total size cap
+
+    Entries expire ttl seconds after they were written. When the directory grows past
+    max_bytes, least recently read entries are deleted first (reads bump the file's atime).
+    """
+
+    def __init__(self, directory: str, ttl: float = DEFAULT_CACHE_TTL,
+                 max_bytes: int = DEFAULT_CACHE_MAX_MB * 2**20, compression: str = 'zstd'):
+        self.directory = os.path.expanduser(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["QueryCache"]:
+        """Cache configured by SNOWFLAKE_QUERY_CACHE_DIR (unset: caching disabled)"""
+        directory = os.getenv('SNOWFLAKE_QUERY_CACHE_DIR')
+        if not directory:
+            return None
+        return cls(
+            directory,
+            ttl=float(os.getenv('SNOWFLAKE_QUERY_CACHE_TTL', DEFAULT_CACHE_TTL)),
+            max_bytes=int(float(os.getenv('SNOWFLAKE_QUERY_CACHE_MAX_MB', DEFAULT_CACHE_MAX_MB)) * 2**20),
+        )
+
+    @staticmethod
+    def key(query: str, params: Any = None, context: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Cache key for a query
+
+        Args:
+            query: SQL text (normalized before hashing)
+            params: Bind parameters
+            context: Session settings that change results, e.g. role, warehouse, database, schema
+        """
+        payload = json.dumps(
+            {"sql": normalize_sql(query), "params": params, "context": context or {}},
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def get(self, key: str):
+        """Cached pyarrow.Table for key, or None when missing or expired"""
+        import pyarrow.parquet as pq
+
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        if time.time() - stat.st_mtime > self.ttl:
+            self._remove(path)
+            self._count('misses')
+            return None
+        try:
+            # Memory-mapped read: pages come straight from the OS page cache
+            table = pq.read_table(path, memory_map=True)
+        except Exception as e:
+            logger.warning(f"Dropping unreadable cache entry {path}: {e}")
+            self._remove(path)
+            self._count('misses')
+            return None
+        # Record the access for LRU eviction; keep mtime (the write time used for the TTL)
+        os.utime(path, (time.time(), stat.st_mtime))
+        self._count('hits')
+        return table
+
+    def put(self, key: str, table, query: Optional[str] = None):
+        """Store a pyarrow.Table (written to a temp file, then renamed into place)"""
+        import pyarrow.parquet as pq
+
+        if query:
+            metadata = dict(table.schema.metadata or {})
+            metadata[b'query'] = normalize_sql(query).encode('utf-8')
+            table = table.replace_schema_metadata(metadata)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            pq.write_table(table, tmp_path, compression=self.compression)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # A full or read-only cache disk shouldn't fail the query itself
+            logger.warning(f"Could not write cache entry {path}: {e}")
+            self._remove(tmp_path)
+            return
+        self._count('writes')
+        self.evict()
+
+    def put_dataframe(self, key: str, df, query: Optional[str] = None) -> bool:
+        """Store a DataFrame; returns False (and skips caching) if it can't be converted to Arrow"""
+        import pyarrow as pa
+
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            logger.warning(f"Result not cached (no Arrow representation): {e}")
+            return False
+        self.put(key, table, query)
+        return True
+
+    def evict(self) -> int:
+        """Delete expired entries, then least recently read ones until under max_bytes"""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.parquet'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_mtime, stat.st_size, path))
+
+        removed = 0
+        total = 0
+        live = []
+        for atime, mtime, size, path in entries:
+            if now - mtime > self.ttl:
+                removed += self._remove(path)
+            else:
+                live.append((atime, size, path))
+                total += size
+        for atime, size, path in sorted(live):
+            if total <= self.max_bytes:
+                break
+            removed += self._remove(path)
+            total -= size
+        if removed:
+            self._count('evictions', removed)
+        return removed
+
+    def invalidate(self, key: str) -> bool:
+        return bool(self._remove(self._path(key)))
+
+    def clear(self) -> int:
+        """Delete every cache entry"""
+        return sum(self._remove(os.path.join(self.directory, name))
+                   for name in os.listdir(self.directory) if name.endswith('.parquet'))
+
+    def stats(self) -> Dict[str, Any]:
+        files = [os.path.join(self.directory, n) for n in os.listdir(self.directory) if n.endswith('.parquet')]
+        size = 0
+        for path in files:
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "directory": self.directory,
+                "entries": len(files),
+                "size_mb": size / 2**20,
+                "max_mb": self.max_bytes / 2**20,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
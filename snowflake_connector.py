@@ -4,28 +4,41 @@ Handles connection and query execution for Snowflake data warehouse
 """
 
 import os
+import time
 import pandas as pd
 import snowflake.connector
 from snowflake.connector import DictCursor
+from snowflake.connector.errors import NotSupportedError, ProgrammingError
 from dotenv import load_dotenv
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterator, List, Union
 import logging
 
+from query_cache import DEFAULT_CACHE_MAX_MB, DEFAULT_CACHE_TTL, QueryCache, is_cacheable
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class QueryTimeout(Exception):
+    """An async query ran past its timeout and was cancelled"""
+
+
 class SnowflakeConnector:
     """A class to manage Snowflake database connections and operations"""
     
-    def __init__(self, config: Optional[Dict[str, str]] = None):
+    def __init__(self, config: Optional[Dict[str, str]] = None, cache_dir: Optional[str] = None,
+                 cache_ttl: float = DEFAULT_CACHE_TTL, cache_max_mb: float = DEFAULT_CACHE_MAX_MB):
         """
         Initialize Snowflake connector
         
         Args:
             config: Dictionary with connection parameters. If None, loads from .env file
                    For SSO, include 'authenticator': 'externalbrowser'
+            cache_dir: Opt in to the on-disk result cache for query_to_dataframe/query_to_arrow
+                       (default: SNOWFLAKE_QUERY_CACHE_DIR, unset means no caching)
+            cache_ttl: Seconds a cached result stays valid
+            cache_max_mb: Cache size cap; least recently used results are evicted first
         """
         if config is None:
             load_dotenv()
@@ -54,6 +67,11 @@ class SnowflakeConnector:
         self.connection = None
         self.cursor = None
         
+        if cache_dir:
+            self.query_cache = QueryCache(cache_dir, ttl=cache_ttl, max_bytes=int(cache_max_mb * 2**20))
+        else:
+            self.query_cache = QueryCache.from_env()
+        
     def connect(self) -> bool:
         """
         Establish connection to Snowflake
@@ -122,17 +140,37 @@ class SnowflakeConnector:
             logger.error(f"Query execution failed: {e}")
             raise
     
-    def query_to_dataframe(self, query: str, params: Optional[tuple] = None) -> pd.DataFrame:
+    def query_to_dataframe(self, query: str, params: Optional[tuple] = None,
+                           use_arrow: bool = True, dtype_backend: Optional[str] = None,
+                           refresh: bool = False) -> pd.DataFrame:
         """
         Execute query and return results as pandas DataFrame
         
+        By default the result is fetched as Arrow record batches (fetch_pandas_all) and
+        converted column-wise, instead of building one Python object per cell first. Falls
+        back to fetchall() + tuples when pyarrow / the connector's pandas extra is missing or
+        the result isn't Arrow-formatted (e.g. SHOW / DESCRIBE).
+        
         Args:
             query: SQL query string
             params: Optional parameters for parameterized queries
+            use_arrow: Set False to force the tuple path
+            dtype_backend: 'pyarrow' for Arrow-backed pandas dtypes (pd.ArrowDtype columns,
+                           no copy into NumPy); default NumPy dtypes otherwise
+            refresh: With the result cache enabled, re-run the query instead of reading the cache
             
         Returns:
             pandas DataFrame with query results
         """
+        # Cache hits don't need a connection (no SSO prompt after a kernel restart)
+        cache_key = self._cache_key(query, params)
+        if cache_key and not refresh:
+            table = self.query_cache.get(cache_key)
+            if table is not None:
+                df = table.to_pandas(types_mapper=pd.ArrowDtype if dtype_backend == 'pyarrow' else None)
+                logger.info(f"Query result loaded from cache with shape {df.shape}")
+                return df
+        
         if not self.cursor or not self.connection:
             raise ConnectionError(
                 "Not connected to Snowflake. Please call connect() first.\n"
@@ -149,18 +187,333 @@ class SnowflakeConnector:
             else:
                 self.cursor.execute(query)
             
-            # Fetch results and column names
-            results = self.cursor.fetchall()
-            columns = [desc[0] for desc in self.cursor.description]
+            df = None
+            if use_arrow:
+                if dtype_backend == 'pyarrow':
+                    table = self._fetch_arrow(self.cursor)
+                    if table is not None:
+                        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+                else:
+                    df = self._fetch_pandas(self.cursor)
             
-            # Create DataFrame
-            df = pd.DataFrame(results, columns=columns)
+            if df is None:
+                # Fetch results and column names
+                results = self.cursor.fetchall()
+                columns = [desc[0] for desc in self.cursor.description]
+                
+                # Create DataFrame
+                df = pd.DataFrame(results, columns=columns)
+                if dtype_backend:
+                    df = df.convert_dtypes(dtype_backend=dtype_backend)
             logger.info(f"Query returned DataFrame with shape {df.shape}")
+            if cache_key:
+                self.query_cache.put_dataframe(cache_key, df, query)
             return df
         except Exception as e:
             logger.error(f"Failed to create DataFrame from query: {e}")
             raise
     
+    def query_to_arrow(self, query: str, params: Optional[tuple] = None, refresh: bool = False):
+        """
+        Execute query and return results as a pyarrow.Table
+        
+        Uses the connector's native Arrow fetch when available; otherwise builds the table
+        from fetched tuples. Requires pyarrow.
+        
+        Args:
+            query: SQL query string
+            params: Optional parameters for parameterized queries
+            refresh: With the result cache enabled, re-run the query instead of reading the cache
+            
+        Returns:
+            pyarrow.Table with query results
+        """
+        import pyarrow as pa
+        
+        cache_key = self._cache_key(query, params)
+        if cache_key and not refresh:
+            table = self.query_cache.get(cache_key)
+            if table is not None:
+                logger.info(f"Query result loaded from cache with {table.num_rows} rows")
+                return table
+        
+        self._require_connection()
+        cursor = self.connection.cursor()
+        try:
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            table = self._fetch_arrow(cursor)
+            if table is None:
+                results = cursor.fetchall()
+                columns = [desc[0] for desc in cursor.description]
+                table = pa.table({name: [row[i] for row in results] for i, name in enumerate(columns)})
+            logger.info(f"Query returned Arrow table with {table.num_rows} rows, {table.num_columns} columns")
+            if cache_key:
+                self.query_cache.put(cache_key, table, query)
+            return table
+        finally:
+            cursor.close()
+    
+    def _cache_key(self, query: str, params: Optional[tuple]) -> Optional[str]:
+        """
+        Result cache key; includes the session context that affects results. None when caching
+        is off or the query isn't a read-only SELECT / WITH statement
+        """
+        if self.query_cache is None or not is_cacheable(query):
+            return None
+        context = {name: self.config.get(name) for name in ('account', 'role', 'warehouse', 'database', 'schema')}
+        return QueryCache.key(query, params, context)
+    
+    @staticmethod
+    def _fetch_arrow(cursor):
+        """The whole result as a pyarrow.Table, or None when Arrow fetching isn't possible."""
+        if not hasattr(cursor, 'fetch_arrow_all'):
+            return None
+        try:
+            return cursor.fetch_arrow_all(force_return_table=True)
+        except (NotSupportedError, ProgrammingError, ImportError) as e:  # non-Arrow result / no pandas extra
+            logger.debug(f"Arrow fetch unavailable, using tuples: {e}")
+            return None
+    
+    @staticmethod
+    def _fetch_pandas(cursor) -> Optional[pd.DataFrame]:
+        """The whole result via fetch_pandas_all, or None when Arrow fetching isn't possible."""
+        if not hasattr(cursor, 'fetch_pandas_all'):
+            return None
+        try:
+            return cursor.fetch_pandas_all()
+        except (NotSupportedError, ProgrammingError, ImportError) as e:  # non-Arrow result / no pandas extra
+            logger.debug(f"Arrow fetch unavailable, using tuples: {e}")
+            return None
+    
+    def _require_connection(self):
+        if not self.connection:
+            raise ConnectionError(
+                "Not connected to Snowflake. Please call connect() first or use context manager."
+            )
+    
+    def iter_rows(self, query: str, params: Optional[tuple] = None,
+                  batch_size: int = 10000) -> Iterator[tuple]:
+        """
+        Execute a query and yield result rows, fetching at most batch_size rows at a time
+        
+        Only one batch is held in memory; the next is fetched when the caller asks for it.
+        Uses its own cursor (so other queries can run while iterating), closed as soon as the
+        iteration finishes, fails or is abandoned (break / generator close).
+        
+        Args:
+            query: SQL query string
+            params: Optional parameters for parameterized queries
+            batch_size: Rows per fetchmany call
+            
+        Yields:
+            Result rows as tuples
+        """
+        self._require_connection()
+        cursor = self.connection.cursor()
+        rows_out = 0
+        try:
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                rows_out += len(rows)
+                yield from rows
+            logger.info(f"Streamed {rows_out} rows")
+        finally:
+            cursor.close()
+    
+    def iter_dataframes(self, query: str, params: Optional[tuple] = None,
+                        batch_size: int = 100000) -> Iterator[pd.DataFrame]:
+        """
+        Execute a query and yield the result as a sequence of pandas DataFrames
+        
+        Uses the connector's Arrow result batches (fetch_pandas_batches) when the pandas
+        extra is installed; batch sizes then follow Snowflake's result chunks. Otherwise
+        falls back to fetchmany with batch_size rows per DataFrame. The cursor is closed
+        as soon as the iteration finishes or is abandoned.
+        
+        Args:
+            query: SQL query string
+            params: Optional parameters for parameterized queries
+            batch_size: Rows per DataFrame for the fallback path
+            
+        Yields:
+            pandas DataFrames with the query's columns
+        """
+        self._require_connection()
+        cursor = self.connection.cursor()
+        try:
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            
+            batches = None
+            if hasattr(cursor, 'fetch_pandas_batches'):
+                try:
+                    batches = cursor.fetch_pandas_batches()
+                except (NotSupportedError, ProgrammingError, ImportError) as e:  # non-Arrow result / no pandas extra
+                    logger.info(f"Arrow batches unavailable, falling back to fetchmany: {e}")
+            if batches is not None:
+                yield from batches
+                return
+            
+            columns = [desc[0] for desc in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield pd.DataFrame(rows, columns=columns)
+        finally:
+            cursor.close()
+    
+    def submit(self, query: str, params: Optional[tuple] = None) -> str:
+        """
+        Start a query without waiting for it (Snowflake async execution)
+        
+        Args:
+            query: SQL query string
+            params: Optional parameters for parameterized queries
+            
+        Returns:
+            Snowflake query id; pass it to fetch_result / cancel, or use run_many
+        """
+        self._require_connection()
+        cursor = self.connection.cursor()
+        try:
+            if params:
+                cursor.execute_async(query, params)
+            else:
+                cursor.execute_async(query)
+            logger.info(f"Submitted query {cursor.sfqid}")
+            return cursor.sfqid
+        finally:
+            cursor.close()
+    
+    def is_running(self, query_id: str) -> bool:
+        """True while a submitted query is queued or running (raises if it failed)"""
+        self._require_connection()
+        status = self.connection.get_query_status_throw_if_error(query_id)
+        return self.connection.is_still_running(status)
+    
+    def fetch_result(self, query_id: str, as_arrow: bool = False):
+        """
+        Results of a finished submitted query
+        
+        Args:
+            query_id: Id returned by submit()
+            as_arrow: Return a pyarrow.Table instead of a DataFrame
+            
+        Returns:
+            pandas DataFrame (or pyarrow.Table)
+        """
+        self._require_connection()
+        cursor = self.connection.cursor()
+        try:
+            cursor.get_results_from_sfqid(query_id)
+            if as_arrow:
+                result = self._fetch_arrow(cursor)
+                if result is None:
+                    import pyarrow as pa
+                    rows = cursor.fetchall()
+                    columns = [desc[0] for desc in cursor.description]
+                    result = pa.table({name: [row[i] for row in rows] for i, name in enumerate(columns)})
+                return result
+            df = self._fetch_pandas(cursor)
+            if df is None:
+                rows = cursor.fetchall()
+                df = pd.DataFrame(rows, columns=[desc[0] for desc in cursor.description])
+            return df
+        finally:
+            cursor.close()
+    
+    def cancel(self, query_id: str):
+        """Cancel a submitted query (no-op if it already finished)"""
+        self._require_connection()
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("SELECT SYSTEM$CANCEL_QUERY(%s)", (query_id,))
+            logger.info(f"Cancelled query {query_id}")
+        except Exception as e:
+            logger.warning(f"Could not cancel query {query_id}: {e}")
+        finally:
+            cursor.close()
+    
+    def run_many(self, queries: Union[List, Dict[str, Any]], timeout: Optional[float] = None,
+                 poll_interval: float = 0.25, return_exceptions: bool = False,
+                 as_arrow: bool = False) -> Union[List, Dict[str, Any]]:
+        """
+        Run independent queries concurrently on the warehouse and gather their results
+        
+        All queries are submitted up front, then polled together, so wall time approaches the
+        slowest query rather than the sum. Each result is fetched as soon as its query finishes.
+        
+        Args:
+            queries: List (or dict of name -> query) where each query is a SQL string,
+                     a (sql, params) tuple or a (sql, params, timeout) tuple
+            timeout: Default per-query timeout in seconds; a query past its timeout is
+                     cancelled and gets QueryTimeout
+            poll_interval: Initial seconds between status polls (backs off to 2s)
+            return_exceptions: Put exceptions in the results instead of raising the first one
+            as_arrow: Return pyarrow.Tables instead of DataFrames
+            
+        Returns:
+            Results in the same shape as `queries` (list or dict)
+        """
+        self._require_connection()
+        names = list(queries) if isinstance(queries, dict) else list(range(len(queries)))
+        specs = [queries[name] for name in names]
+        
+        pending = {}  # name -> (query id, deadline)
+        results: Dict[Any, Any] = {}
+        try:
+            for name, spec in zip(names, specs):
+                if isinstance(spec, str):
+                    sql, params, query_timeout = spec, None, timeout
+                else:
+                    sql, params, query_timeout = (tuple(spec) + (None, timeout))[:3]
+                    query_timeout = timeout if query_timeout is None else query_timeout
+                query_id = self.submit(sql, params)
+                pending[name] = (query_id, None if query_timeout is None else time.monotonic() + query_timeout)
+            
+            delay = poll_interval
+            while pending:
+                for name, (query_id, deadline) in list(pending.items()):
+                    try:
+                        if self.is_running(query_id):
+                            if deadline is not None and time.monotonic() > deadline:
+                                self.cancel(query_id)
+                                raise QueryTimeout(f"Query {query_id} timed out and was cancelled")
+                            continue
+                        results[name] = self.fetch_result(query_id, as_arrow=as_arrow)
+                    except Exception as e:
+                        del pending[name]
+                        if not return_exceptions:
+                            raise
+                        logger.error(f"Query {query_id} failed: {e}")
+                        results[name] = e
+                        continue
+                    del pending[name]
+                if pending:
+                    time.sleep(delay)
+                    delay = min(delay * 1.5, 2.0)
+        finally:
+            # On error / interrupt, don't leave queries burning warehouse credits
+            for query_id, _ in pending.values():
+                self.cancel(query_id)
+        
+        logger.info(f"Ran {len(specs)} queries concurrently")
+        if isinstance(queries, dict):
+            return {name: results[name] for name in names}
+        return [results[name] for name in names]
+    
     def execute_from_file(self, filepath: str) -> List[tuple]:
         """
         Execute SQL query from a file
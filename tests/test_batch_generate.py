@@ -0,0 +1,60 @@
+"""
+Chunk sources of batch_generate.py against a fake Snowflake cursor.
+
+  python -m pytest -q tests
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification_generator'))
+
+from batch_generate import stream_profiles_by_ids
+
+
+class ShuffledCursor:
+    """Answers IN queries with the matching rows in random order, as a warehouse may."""
+
+    def __init__(self, profiles, seed=7):
+        self.profiles = profiles
+        self.rng = random.Random(seed)
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.rows = [(int(p), self.profiles[int(p)]) for p in params if int(p) in self.profiles]
+        self.rng.shuffle(self.rows)
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+
+def test_chunks_follow_input_id_order():
+    profiles = {i: f'{{"id": {i}}}' for i in range(100) if i % 7}
+    ids = [str(i) for i in random.Random(3).sample(range(120), 120)]
+    chunks = list(stream_profiles_by_ids(FakeConnection(ShuffledCursor(profiles)), 'FAKE', ids, chunk_size=25))
+
+    assert [position["ids_consumed"] for _, position in chunks] == [25, 50, 75, 100, 120]
+    streamed = [consumer_id for rows, _ in chunks for consumer_id, _ in rows]
+    # Ids without a profile drop out; the rest keep their input order
+    assert streamed == [int(i) for i in ids if int(i) in profiles]
+
+
+def test_resume_skips_consumed_ids():
+    profiles = {i: '{}' for i in range(10)}
+    ids = [str(i) for i in reversed(range(10))]
+    chunks = list(stream_profiles_by_ids(FakeConnection(ShuffledCursor(profiles)), 'FAKE', ids, chunk_size=4,
+                                         skip_ids=4))
+    assert [row[0] for rows, _ in chunks for row in rows] == [5, 4, 3, 2, 1, 0]
+    assert chunks[-1][1] == {"ids_consumed": 10}
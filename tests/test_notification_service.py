@@ -0,0 +1,227 @@
+"""
+NotificationService against a slow fake warehouse: calls interleave, and bursts coalesce.
+
+  python -m pytest -q tests
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification_generator'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from connection_pool import SnowflakeConnectionPool
+from generation_memo import GenerationMemo
+from notification_generator import NotificationGenerator
+from notification_service import NotificationService
+from profile_features import decode_profile
+from synthetic_profiles import make_profiles
+
+LATENCY = 0.1
+CALLS = 8
+# Consumer id the fake warehouse fails on
+FAILING_ID = 999_999
+
+
+class FakeWarehouse:
+    """Connector for the pool: every query sleeps `latency` and is recorded in `queries`."""
+
+    def __init__(self, profiles, latency=LATENCY):
+        self.profiles = profiles
+        self.latency = latency
+        self.queries = []
+
+    def connect(self):
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, warehouse):
+        self.warehouse = warehouse
+
+    def cursor(self):
+        return FakeCursor(self.warehouse)
+
+    def is_closed(self):
+        return False
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, warehouse):
+        self.warehouse = warehouse
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.warehouse.queries.append(query)
+        time.sleep(self.warehouse.latency)
+        ids = [int(p) for p in params] if params else [int(query.rsplit('=', 1)[1])]
+        if FAILING_ID in ids:
+            raise RuntimeError("warehouse unavailable")
+        profiles = self.warehouse.profiles
+        self.rows = [(i, json.dumps(profiles[i])) for i in ids if 0 <= i < len(profiles)]
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+def make_service(concurrency=CALLS):
+    warehouse = FakeWarehouse(make_profiles(CALLS))
+    generator = NotificationGenerator()
+    pool = SnowflakeConnectionPool(warehouse.connect, min_size=0, max_size=concurrency)
+    service = NotificationService(generator, GenerationMemo(generator), pool,
+                                  max_concurrency=concurrency, table='FAKE')
+    return service, pool, warehouse
+
+
+def run_service(coro_fn, concurrency=CALLS):
+    """asyncio.run(coro_fn(service, warehouse)), closing the service and pool afterwards."""
+    service, pool, warehouse = make_service(concurrency)
+    try:
+        return asyncio.run(coro_fn(service, warehouse))
+    finally:
+        service.close()
+        pool.close()
+
+
+def test_concurrent_calls_interleave():
+    async def calls(service, warehouse):
+        start = time.perf_counter()
+        results = await asyncio.gather(*(service.generate_consumer_notifications(i) for i in range(CALLS)))
+        return results, time.perf_counter() - start
+
+    results, wall = run_service(calls)
+    assert [r["status"] for r in results] == ["success"] * CALLS
+    # Serially this would take CALLS * LATENCY
+    assert wall < CALLS * LATENCY / 2
+
+
+def test_validate_answers_while_fetches_are_in_flight():
+    async def calls(service, warehouse):
+        async def validate():
+            await asyncio.sleep(LATENCY / 4)
+            start = time.perf_counter()
+            result = service.validate_notification("Taco time", "Tacos and burritos from top Mexican spots near you")
+            return result, time.perf_counter() - start, service.metrics()["snowflake_io"]["in_flight"]
+
+        _, validated = await asyncio.gather(
+            asyncio.gather(*(service.generate_consumer_notifications(i) for i in range(CALLS))), validate())
+        return validated
+
+    result, seconds, in_flight = run_service(calls)
+    assert result["is_valid"]
+    assert in_flight > 0
+    assert seconds < LATENCY
+
+
+def test_burst_for_one_consumer_makes_one_query():
+    async def calls(service, warehouse):
+        results = await asyncio.gather(
+            *(service.generate_consumer_notifications(0, 80, 10) for _ in range(CALLS)),
+            *(service.generate_consumer_notifications("0", 90, 3) for _ in range(CALLS)),
+        )
+        return results, service.metrics()["coalescing"], len(warehouse.queries)
+
+    results, coalescing, queries = run_service(calls)
+    assert queries == 1
+    assert [r["status"] for r in results] == ["success"] * (2 * CALLS)
+    # Each caller gets its own consumer id back, as passed
+    assert [r["consumer_id"] for r in results] == [0] * CALLS + ["0"] * CALLS
+    assert coalescing["generation"]["coalesced"] == 2 * CALLS - 2
+
+
+def test_failing_burst_makes_one_query_and_reports_to_every_caller():
+    async def calls(service, warehouse):
+        results = await asyncio.gather(*(service.generate_consumer_notifications(FAILING_ID) for _ in range(CALLS)))
+        return results, len(warehouse.queries)
+
+    results, queries = run_service(calls)
+    assert queries == 1
+    assert [r["status"] for r in results] == ["error"] * CALLS
+    assert [r["message"] for r in results] == ["warehouse unavailable"] * CALLS
+
+
+def test_cancelled_first_caller_does_not_cancel_the_burst():
+    async def calls(service, warehouse):
+        first = asyncio.ensure_future(service.generate_consumer_notifications(0))
+        await asyncio.sleep(0)
+        rest = asyncio.gather(*(service.generate_consumer_notifications(0) for _ in range(CALLS - 1)))
+        await asyncio.sleep(LATENCY / 4)
+        first.cancel()
+        return await rest, len(warehouse.queries)
+
+    results, queries = run_service(calls)
+    assert queries == 1
+    assert [r["status"] for r in results] == ["success"] * (CALLS - 1)
+
+
+def test_repeat_and_stale_requests_are_served_from_the_profile_cache():
+    async def calls(service, warehouse):
+        await asyncio.gather(*(service.generate_consumer_notifications(i) for i in range(CALLS)))
+        before = len(warehouse.queries)
+        await asyncio.gather(*(service.generate_consumer_notifications(i) for i in range(CALLS)))
+        repeat_queries = len(warehouse.queries) - before
+
+        service.profile_cache.ttl = 0
+        start = time.perf_counter()
+        stale = await service.generate_consumer_notifications(0)
+        stale_seconds = time.perf_counter() - start
+        await asyncio.gather(*service._background)
+        return repeat_queries, stale, stale_seconds, service.profile_cache.stats()["refreshes"]
+
+    repeat_queries, stale, stale_seconds, refreshes = run_service(calls)
+    assert repeat_queries == 0
+    assert stale["status"] == "success"
+    assert stale_seconds < LATENCY
+    assert refreshes == 1
+
+
+def test_batch_matches_per_consumer_calls():
+    async def calls(service, warehouse):
+        single = await asyncio.gather(*(service.generate_consumer_notifications(i) for i in range(CALLS)))
+        service.invalidate_profiles()
+        service.source.queries.chunk_size = CALLS // 2
+        before = len(warehouse.queries)
+        batch = await service.generate_notifications_batch(list(range(CALLS)) + [CALLS + 1, "1; DROP TABLE x"])
+        return single, batch, len(warehouse.queries) - before
+
+    single, batch, queries = run_service(calls)
+    # CALLS + 1 valid ids (the malformed one is rejected up front) in chunks of CALLS // 2
+    assert queries == 3
+    assert batch["count"] == CALLS
+    assert batch["error_count"] == 2
+    assert [r["consumer_id"] for r in batch["results"]] == [str(i) for i in range(CALLS)]
+    assert [r["notifications"] for r in batch["results"]] == [r["notifications"] for r in single]
+
+
+def test_profile_summary_dietary_matches_the_stored_value():
+    def summary(overall):
+        return NotificationService.profile_summary(decode_profile(json.dumps({"overall_profile": overall})))
+
+    # Absent: 'none', as the original server reported it
+    assert summary({"cuisine_preferences": "Thai"})["dietary"] == 'none'
+    assert summary({"dietary_preferences": {}})["dietary"] == 'none'
+    # Present: as stored, including ''
+    assert summary({"dietary_preferences": {"preferred_dietary_preference": ""}})["dietary"] == ''
+    assert summary({"dietary_preferences": {"preferred_dietary_preference": "Vegan"}})["dietary"] == 'Vegan'
+
+
+def test_absent_dietary_preference_generates_like_an_empty_one():
+    generator = NotificationGenerator()
+    overall = {"cuisine_preferences": "Thai, Mexican", "food_preferences": "tacos, burgers, bacon",
+               "taste_preference": "spicy", "price_sensitivity": "value seeker"}
+    absent = generator.generate_notifications({"overall_profile": overall}, 70, 10)
+    empty = generator.generate_notifications(
+        {"overall_profile": {**overall, "dietary_preferences": {"preferred_dietary_preference": ""}}}, 70, 10)
+    assert absent and absent == empty
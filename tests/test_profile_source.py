@@ -0,0 +1,37 @@
+"""
+Snapshot building and lookups (profile_source.py).
+
+  python -m pytest -q tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification_generator'))
+
+from profile_features import ProfileFeatures, decode_profile
+from profile_source import SnapshotProfileSource, build_snapshot
+
+PROFILE = '{"overall_profile": {"cuisine_preferences": "Thai", "taste_preference": "spicy"}}'
+
+
+def test_snapshot_keeps_null_profile_rows(tmp_path):
+    path = str(tmp_path / "profiles.db")
+    assert build_snapshot([(1, PROFILE), (2, None), ("3", '{}')], path) == 3
+
+    source = SnapshotProfileSource(path)
+    try:
+        rows = dict(source.fetch_many([1, 2, 3, 4]))
+        assert source.fetch_one(2) == (2, None)
+    finally:
+        source.close()
+    assert rows == {1: PROFILE, 2: None, 3: '{}'}
+    assert decode_profile(rows[2]) == ProfileFeatures()
+    assert decode_profile(rows[1]).cuisine_preferences == "Thai"
+
+
+def test_dietary_preference_presence_survives_decoding():
+    absent = decode_profile('{"overall_profile": {"cuisine_preferences": "Thai"}}')
+    empty = decode_profile('{"overall_profile": {"dietary_preferences": {"preferred_dietary_preference": ""}}}')
+    assert absent.dietary is None
+    assert empty.dietary == ''